@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .codec import encode_payload, loads
+from .models import LLMPayload
+
+
+class AnnotationCache:
+    """Single-file SQLite store of LLM payloads, content-addressed by review text,
+    prompt, model, tag library fingerprint and request mode (single or batched)."""
+
+    def __init__(
+        self,
+        path: Path | str,
+        max_entries: int = 500_000,
+        max_age_days: float = 90.0,
+    ):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._max_entries = max_entries
+        self._max_age_seconds = max_age_days * 86400
+        self._lock = threading.Lock()
+        # Shard workers may share one cache file; wait for their write locks rather than fail.
+        self._conn = sqlite3.connect(str(self._path), timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS annotations (
+                cache_key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_annotations_last_used ON annotations (last_used_at)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evict()
+
+    @staticmethod
+    def make_key(review_en: str, prompt_text: str, model: str, library_fingerprint: str, batch: bool) -> str:
+        """``batch``: whether the run sends multi-review requests, whose system message
+        adds the batch instructions, so single and batched answers never share a key."""
+        digest = hashlib.sha256()
+        for part in (review_en, prompt_text, model, library_fingerprint, "batch" if batch else "single"):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM annotations WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self._max_age_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE annotations SET last_used_at = ? WHERE cache_key = ?", (now, key)
+            )
+            self.hits += 1
+        return loads(row[0])
+
+    def contains(self, key: str) -> bool:
+        """Like ``get`` but read-only: no hit/miss counting, no LRU touch."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at FROM annotations WHERE cache_key = ?", (key,)
+            ).fetchone()
+        return row is not None and time.time() - row[0] <= self._max_age_seconds
+
+    def put(self, key: str, payload: LLMPayload) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO annotations (cache_key, payload, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, encode_payload(payload), now, now),
+            )
+
+    def commit(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used ones above max_entries."""
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM annotations WHERE created_at < ?",
+                (time.time() - self._max_age_seconds,),
+            )
+            removed = cur.rowcount
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM annotations").fetchone()
+            overflow = count - self._max_entries
+            if overflow > 0:
+                cur = self._conn.execute(
+                    "DELETE FROM annotations WHERE cache_key IN ("
+                    "SELECT cache_key FROM annotations ORDER BY last_used_at LIMIT ?)",
+                    (overflow,),
+                )
+                removed += cur.rowcount
+            self._conn.commit()
+        if removed:
+            logging.info("Evicted %d entries from annotation cache %s", removed, self._path)
+        return removed
+
+    def close(self) -> None:
+        self.evict()
+        self._conn.close()
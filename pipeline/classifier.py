@@ -0,0 +1,392 @@
+from __future__ import annotations
+
+import logging
+import pickle
+import re
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .models import CandidateReview, LLMPayload, TagFragment
+
+try:  # Optional: only the local classifier fast path needs them.
+    import numpy as np
+    from scipy import sparse
+    from sklearn.dummy import DummyClassifier
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import LogisticRegression
+except ImportError:  # pragma: no cover - exercised only without the extras installed
+    np = None
+
+ARTIFACT_VERSION = 1
+ANNOTATOR = "classifier"
+# Deterministic split by review_id: buckets [0, 70) train, [70, 85) threshold calibration, [85, 100) test.
+_CALIBRATION_BUCKET = 70
+_TEST_BUCKET = 85
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("The local classifier needs numpy and scikit-learn: pip install numpy scikit-learn")
+
+
+def split_of(review_id: str) -> str:
+    bucket = zlib.crc32(review_id.encode("utf-8")) % 100
+    if bucket < _CALIBRATION_BUCKET:
+        return "train"
+    return "calibration" if bucket < _TEST_BUCKET else "test"
+
+
+@dataclass
+class TagMetrics:
+    support: int = 0
+    predicted: int = 0
+    correct: int = 0
+
+    @property
+    def precision(self) -> float:
+        return self.correct / self.predicted if self.predicted else 0.0
+
+    @property
+    def recall(self) -> float:
+        return self.correct / self.support if self.support else 0.0
+
+
+@dataclass
+class ClassifierEvaluation:
+    reviews: int = 0
+    auto_labelled: int = 0
+    exact_matches: int = 0
+    sentiment_matches: int = 0
+    per_tag: Dict[str, TagMetrics] = field(default_factory=dict)
+
+    @property
+    def coverage(self) -> float:
+        return self.auto_labelled / self.reviews if self.reviews else 0.0
+
+    @property
+    def exact_match_rate(self) -> float:
+        return self.exact_matches / self.auto_labelled if self.auto_labelled else 0.0
+
+    @property
+    def micro_precision(self) -> float:
+        predicted = sum(m.predicted for m in self.per_tag.values())
+        return sum(m.correct for m in self.per_tag.values()) / predicted if predicted else 0.0
+
+    def log(self) -> None:
+        logging.info(
+            "Classifier eval: %d reviews, %d auto-labelled (%.1f%% coverage); on those, "
+            "tag precision %.1f%%, exact tag set %.1f%%, sentiment %.1f%%",
+            self.reviews,
+            self.auto_labelled,
+            self.coverage * 100,
+            self.micro_precision * 100,
+            self.exact_match_rate * 100,
+            self.sentiment_matches / self.auto_labelled * 100 if self.auto_labelled else 0.0,
+        )
+        for code, metrics in sorted(self.per_tag.items(), key=lambda item: -item[1].support):
+            logging.info(
+                "  %-24s support %5d  auto %5d  precision %5.1f%%  recall %5.1f%%",
+                code,
+                metrics.support,
+                metrics.predicted,
+                metrics.precision * 100,
+                metrics.recall * 100,
+            )
+
+
+class TagClassifier:
+    """Hashed word/char n-gram features with one logistic regression per tag.
+
+    Each tag gets its own probability threshold, picked on a calibration split as the
+    lowest one that still reaches ``target_precision``; tags that never reach it are
+    never auto-labelled. A review is auto-labelled only when at least one tag clears
+    its threshold, every other tag stays below ``reject_probability`` and the
+    sentiment is at least ``min_sentiment_confidence`` sure. Everything else goes
+    to DeepSeek.
+    """
+
+    def __init__(
+        self,
+        tags: Sequence[str],
+        tag_names: Dict[str, str],
+        weights: Any,
+        bias: Any,
+        thresholds: Dict[str, float],
+        sentiment_model: Any,
+        n_features: int = 2**16,
+        reject_probability: float = 0.3,
+        min_sentiment_confidence: float = 0.7,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        _require_numpy()
+        self.tags = list(tags)
+        self.tag_names = dict(tag_names)
+        self.weights = weights
+        self.bias = bias
+        self.thresholds = dict(thresholds)
+        self.sentiment_model = sentiment_model
+        self.n_features = n_features
+        self.reject_probability = reject_probability
+        self.min_sentiment_confidence = min_sentiment_confidence
+        self.metadata = metadata or {}
+        self._vectorizers = _make_vectorizers(n_features)
+
+    # ------------------------------------------------------------------
+    # Training
+    # ------------------------------------------------------------------
+    @classmethod
+    def train(
+        cls,
+        payloads: Sequence[LLMPayload],
+        target_precision: float = 0.95,
+        min_support: int = 20,
+        regularization: float = 4.0,
+        n_features: int = 2**16,
+        tag_precision: Optional[Dict[str, float]] = None,
+    ) -> "TagClassifier":
+        """``tag_precision`` overrides ``target_precision`` for individual tag codes."""
+        _require_numpy()
+        tag_precision = tag_precision or {}
+        payloads = [p for p in payloads if p.annotator == "llm" and p.review_en]
+        train = [p for p in payloads if split_of(p.review_id) == "train"]
+        calibration = [p for p in payloads if split_of(p.review_id) == "calibration"]
+        if not train or not calibration:
+            raise ValueError(f"Not enough labelled reviews to train ({len(payloads)} usable)")
+
+        support: Dict[str, int] = {}
+        tag_names: Dict[str, str] = {}
+        for payload in train:
+            for tag in payload.tags:
+                support[tag.tag_code] = support.get(tag.tag_code, 0) + 1
+                tag_names[tag.tag_code] = tag.tag_name_cn
+        tags = sorted(code for code, count in support.items() if count >= min_support)
+        if not tags:
+            raise ValueError(f"No tag has at least {min_support} training examples")
+
+        vectorizers = _make_vectorizers(n_features)
+        x_train = _features(vectorizers, [p.review_en for p in train])
+        x_calib = _features(vectorizers, [p.review_en for p in calibration])
+        y_train = _label_matrix(train, tags)
+        y_calib = _label_matrix(calibration, tags)
+
+        weights = np.zeros((len(tags), x_train.shape[1]), dtype=np.float32)
+        bias = np.zeros(len(tags), dtype=np.float32)
+        for column, code in enumerate(tags):
+            if y_train[:, column].min() == 1:
+                # Present on every training review: nothing to separate, never auto-labelled.
+                bias[column] = -np.inf
+                continue
+            model = LogisticRegression(C=regularization, solver="liblinear", max_iter=200)
+            model.fit(x_train, y_train[:, column])
+            weights[column] = model.coef_[0]
+            bias[column] = model.intercept_[0]
+
+        probabilities = _sigmoid(x_calib @ weights.T + bias)
+        thresholds = {
+            code: _precision_threshold(
+                probabilities[:, column], y_calib[:, column], tag_precision.get(code, target_precision)
+            )
+            for column, code in enumerate(tags)
+        }
+        sentiments = [int(p.sentiment) for p in train]
+        if len(set(sentiments)) > 1:
+            sentiment_model = LogisticRegression(C=regularization, max_iter=500)
+        else:
+            sentiment_model = DummyClassifier(strategy="most_frequent")
+        sentiment_model.fit(x_train, sentiments)
+
+        enabled = sum(1 for value in thresholds.values() if value <= 1.0)
+        logging.info(
+            "Trained %d tag models on %d reviews (%d calibration); %d tags reach %.0f%% precision",
+            len(tags),
+            len(train),
+            len(calibration),
+            enabled,
+            target_precision * 100,
+        )
+        return cls(
+            tags,
+            {code: tag_names[code] for code in tags},
+            weights,
+            bias,
+            thresholds,
+            sentiment_model,
+            n_features=n_features,
+            metadata={
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "train_reviews": len(train),
+                "calibration_reviews": len(calibration),
+                "target_precision": target_precision,
+                "tag_precision": tag_precision,
+                "min_support": min_support,
+                "support": {code: support[code] for code in tags},
+            },
+        )
+
+    # ------------------------------------------------------------------
+    # Serving
+    # ------------------------------------------------------------------
+    def predict(
+        self,
+        reviews: Sequence[CandidateReview],
+        tag_library: Optional[Dict[str, Dict[str, str]]] = None,
+    ) -> List[Optional[LLMPayload]]:
+        """Payloads for the reviews the model is sure about, ``None`` for the rest.
+        With ``tag_library``, tags outside it are never auto-labelled."""
+        if not reviews:
+            return []
+        x = _features(self._vectorizers, [review.review_en for review in reviews])
+        probabilities = _sigmoid(x @ self.weights.T + self.bias)
+        sentiment_probabilities = self.sentiment_model.predict_proba(x)
+        sentiment_classes = self.sentiment_model.classes_
+        thresholds = np.array(
+            [
+                self.thresholds[code] if tag_library is None or code in tag_library else np.inf
+                for code in self.tags
+            ]
+        )
+        confident = probabilities >= thresholds
+        undecided = (probabilities >= self.reject_probability) & ~confident
+
+        results: List[Optional[LLMPayload]] = []
+        for row, review in enumerate(reviews):
+            sentiment_row = sentiment_probabilities[row]
+            if (
+                not confident[row].any()
+                or undecided[row].any()
+                or sentiment_row.max() < self.min_sentiment_confidence
+            ):
+                results.append(None)
+                continue
+            columns = np.flatnonzero(confident[row])
+            results.append(
+                LLMPayload(
+                    review_id=review.review_id,
+                    review_source=review.review_source,
+                    review_en=review.review_en,
+                    review_cn="",
+                    sentiment=int(sentiment_classes[sentiment_row.argmax()]),
+                    tags=[
+                        TagFragment(
+                            tag_code=self.tags[column],
+                            tag_name_cn=(tag_library or {}).get(self.tags[column], {}).get("tag_name_cn")
+                            or self.tag_names[self.tags[column]],
+                            evidence=self._evidence(review.review_en, column),
+                        )
+                        for column in columns
+                    ],
+                    annotator=ANNOTATOR,
+                )
+            )
+        return results
+
+    def evaluate(self, payloads: Sequence[LLMPayload]) -> ClassifierEvaluation:
+        """Compare auto-labels with the LLM's labels on the same reviews."""
+        result = ClassifierEvaluation(per_tag={code: TagMetrics() for code in self.tags})
+        predictions = self.predict(
+            [CandidateReview(p.review_id, p.review_source, p.review_en) for p in payloads]
+        )
+        for payload, predicted in zip(payloads, predictions):
+            result.reviews += 1
+            if predicted is None:
+                continue
+            result.auto_labelled += 1
+            expected = {tag.tag_code for tag in payload.tags}
+            got = {tag.tag_code for tag in predicted.tags}
+            result.exact_matches += expected == got
+            result.sentiment_matches += int(payload.sentiment) == predicted.sentiment
+            for code in self.tags:
+                metrics = result.per_tag[code]
+                metrics.support += code in expected
+                metrics.predicted += code in got
+                metrics.correct += code in expected and code in got
+        return result
+
+    def _evidence(self, text: str, column: int) -> str:
+        """The sentence that contributes most to the tag's score."""
+        sentences = [s.strip() for s in _SENTENCE_BREAK.split(text) if s.strip()]
+        if len(sentences) <= 1:
+            return text.strip()[:300]
+        scores = _features(self._vectorizers, sentences) @ self.weights[column]
+        return sentences[int(np.argmax(scores))][:300]
+
+    # ------------------------------------------------------------------
+    # Artifact
+    # ------------------------------------------------------------------
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        artifact = {
+            "version": ARTIFACT_VERSION,
+            "tags": self.tags,
+            "tag_names": self.tag_names,
+            "weights": self.weights,
+            "bias": self.bias,
+            "thresholds": self.thresholds,
+            "sentiment_model": self.sentiment_model,
+            "n_features": self.n_features,
+            "reject_probability": self.reject_probability,
+            "min_sentiment_confidence": self.min_sentiment_confidence,
+            "metadata": self.metadata,
+        }
+        with path.open("wb") as fp:
+            pickle.dump(artifact, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: Path) -> "TagClassifier":
+        """Load an artifact written by ``save``; pickle, so only load trusted files."""
+        _require_numpy()
+        with path.open("rb") as fp:
+            artifact = pickle.load(fp)
+        if artifact.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"{path}: unsupported classifier artifact version {artifact.get('version')}")
+        artifact.pop("version")
+        return cls(**artifact)
+
+    def set_thresholds(self, overrides: Dict[str, float]) -> None:
+        unknown = set(overrides) - set(self.thresholds)
+        if unknown:
+            raise ValueError(f"No model for tags: {', '.join(sorted(unknown))}")
+        self.thresholds.update(overrides)
+
+
+def _make_vectorizers(n_features: int) -> Tuple[Any, Any]:
+    _require_numpy()
+    return (
+        HashingVectorizer(n_features=n_features, ngram_range=(1, 2), alternate_sign=False),
+        HashingVectorizer(n_features=n_features, analyzer="char_wb", ngram_range=(3, 5), alternate_sign=False),
+    )
+
+
+def _features(vectorizers: Tuple[Any, Any], texts: Sequence[str]) -> Any:
+    return sparse.hstack([vectorizer.transform(texts) for vectorizer in vectorizers], format="csr")
+
+
+def _label_matrix(payloads: Sequence[LLMPayload], tags: Sequence[str]) -> Any:
+    column_of = {code: column for column, code in enumerate(tags)}
+    matrix = np.zeros((len(payloads), len(tags)), dtype=np.int8)
+    for row, payload in enumerate(payloads):
+        for tag in payload.tags:
+            column = column_of.get(tag.tag_code)
+            if column is not None:
+                matrix[row, column] = 1
+    return matrix
+
+
+def _sigmoid(scores: Any) -> Any:
+    return 1.0 / (1.0 + np.exp(-np.asarray(scores)))
+
+
+def _precision_threshold(probabilities: Any, labels: Any, target: float, min_predicted: int = 5) -> float:
+    """Lowest threshold whose predictions reach ``target`` precision; ``inf`` if none does."""
+    order = np.argsort(-probabilities)
+    hits = np.cumsum(labels[order])
+    counts = np.arange(1, len(order) + 1)
+    precision = hits / counts
+    ok = np.flatnonzero((precision >= target) & (counts >= min_predicted))
+    if not len(ok):
+        return float("inf")
+    return float(probabilities[order][ok[-1]])
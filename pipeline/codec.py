@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+try:  # Optional: several times faster than the stdlib on multi-million-line JSONL files.
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional extra
+    orjson = None
+
+from .models import CandidateReview, LLMPayload, TagFragment
+
+_SENTIMENTS = (-1, 0, 1)
+
+
+class PayloadError(ValueError):
+    """Raised when a JSON object does not match the LLMPayload schema."""
+
+
+# ----------------------------------------------------------------------
+# JSON backend. Both backends emit compact UTF-8 JSON (no spaces, no \u escapes
+# for Chinese), so output is byte-identical whichever one is installed. Used for
+# request bodies, Stream Load batches and JSONL files; payload text stored in
+# Doris keeps its original layout (see encode_payload).
+# ----------------------------------------------------------------------
+if orjson is not None:
+
+    def loads(data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+else:
+
+    def loads(data: str | bytes) -> Any:
+        return json.loads(data)
+
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return dumps(obj).encode("utf-8")
+
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+# ----------------------------------------------------------------------
+# Models <-> dicts
+# ----------------------------------------------------------------------
+def candidate_to_dict(review: CandidateReview) -> Dict[str, Any]:
+    return {"review_id": review.review_id, "review_source": review.review_source, "review_en": review.review_en}
+
+
+def candidate_from_dict(data: Dict[str, Any]) -> CandidateReview:
+    try:
+        return CandidateReview(str(data["review_id"]), int(data["review_source"]), str(data["review_en"]))
+    except (KeyError, TypeError, ValueError) as exc:
+        raise PayloadError(f"Invalid candidate {data.get('review_id')!r}: {exc!r}") from None
+
+
+def payload_to_dict(payload: LLMPayload) -> Dict[str, Any]:
+    data: Dict[str, Any] = {
+        "review_id": payload.review_id,
+        "review_source": payload.review_source,
+        "review_en": payload.review_en,
+        "review_cn": payload.review_cn,
+        "sentiment": payload.sentiment,
+        "tags": [
+            {"tag_code": tag.tag_code, "tag_name_cn": tag.tag_name_cn, "evidence": tag.evidence}
+            for tag in payload.tags
+        ],
+    }
+    # Omitted for LLM payloads so their serialization (and Stream Load labels) is unchanged.
+    if payload.annotator != "llm":
+        data["annotator"] = payload.annotator
+    return data
+
+
+def payload_from_dict(data: Any, review: Optional[CandidateReview] = None) -> LLMPayload:
+    """Validate and convert one payload object.
+
+    ``review`` supplies review_id/review_source/review_en when the object lacks them, which
+    is the case for LLM responses that only echo part of the input.
+    """
+    if not isinstance(data, dict):
+        raise PayloadError(f"Expected a JSON object, got {type(data).__name__}")
+    try:
+        if review is None:
+            review_id, review_source, review_en = data["review_id"], data["review_source"], data["review_en"]
+        else:
+            review_id = data.get("review_id", review.review_id)
+            review_source = data.get("review_source", review.review_source)
+            review_en = data.get("review_en", review.review_en)
+        sentiment = int(data.get("sentiment") or 0)
+        raw_tags = data.get("tags") or []
+        if not isinstance(raw_tags, list):
+            raise TypeError(f"tags must be a list, got {type(raw_tags).__name__}")
+        tags = [
+            TagFragment(item["tag_code"], item.get("tag_name_cn") or "", item.get("evidence") or "")
+            for item in raw_tags
+        ]
+    except (KeyError, TypeError, ValueError) as exc:
+        raise PayloadError(f"Invalid payload for review {data.get('review_id')!r}: {exc!r}") from None
+    if sentiment not in _SENTIMENTS:
+        raise PayloadError(f"Invalid sentiment {sentiment!r} for review {review_id!r}")
+    return LLMPayload(
+        review_id=str(review_id),
+        review_source=int(review_source),
+        review_en=review_en,
+        review_cn=data.get("review_cn") or "",
+        sentiment=sentiment,
+        tags=tags,
+        annotator=sys.intern(data.get("annotator") or "llm"),
+    )
+
+
+# ----------------------------------------------------------------------
+# Models <-> text
+# ----------------------------------------------------------------------
+def encode_payload(payload: LLMPayload) -> str:
+    """Payload text as stored in return_fact_llm.payload (and the journal and cache):
+    json.dumps with its default ", " / ": " separators, as every row was written
+    before this codec, so the column keeps a single layout."""
+    return json.dumps(payload_to_dict(payload), ensure_ascii=False)
+
+
+def decode_payload(data: str | bytes, review: Optional[CandidateReview] = None) -> LLMPayload:
+    return payload_from_dict(loads(data), review)
+
+
+# ----------------------------------------------------------------------
+# JSONL files. Read and written as bytes: orjson parses bytes without a decode pass.
+# ----------------------------------------------------------------------
+def iter_jsonl(path: Path) -> Iterator[Any]:
+    with path.open("rb") as fp:
+        for line in fp:
+            if line.strip():
+                yield loads(line)
+
+
+def write_jsonl(path: Path, records: Iterable[Any]) -> int:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with path.open("wb") as fp:
+        for record in records:
+            fp.write(dumps_bytes(record) + b"\n")
+            count += 1
+    return count
+
+
+def read_payloads(path: Path) -> Iterator[LLMPayload]:
+    return (payload_from_dict(obj) for obj in iter_jsonl(path))
+
+
+def write_payloads(path: Path, payloads: Iterable[LLMPayload]) -> int:
+    return write_jsonl(path, (payload_to_dict(payload) for payload in payloads))
+
+
+def read_candidates(path: Path) -> Iterator[CandidateReview]:
+    return (candidate_from_dict(obj) for obj in iter_jsonl(path))
+
+
+def write_candidates(path: Path, reviews: Iterable[CandidateReview]) -> int:
+    return write_jsonl(path, (candidate_to_dict(review) for review in reviews))
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import itertools
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Sequence
+
+try:  # Optional: only needed for .parquet / .arrow intermediates.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is an optional extra
+    pa = None
+
+from .models import CandidateReview, LLMPayload, TagFragment
+from .sharding import Shard
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+ROW_GROUP_SIZE = 65_536
+
+
+def is_columnar(path: Path) -> bool:
+    """Parquet or Arrow IPC, chosen by file extension; anything else is JSONL."""
+    return path.suffix.lower() in PARQUET_SUFFIXES + ARROW_SUFFIXES
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError("Parquet/Arrow intermediates need pyarrow: pip install pyarrow")
+
+
+def candidate_schema() -> "pa.Schema":
+    _require_pyarrow()
+    return pa.schema(
+        [
+            pa.field("review_id", pa.string(), nullable=False),
+            pa.field("review_source", pa.int32()),
+            pa.field("review_en", pa.string()),
+        ]
+    )
+
+
+def payload_schema() -> "pa.Schema":
+    _require_pyarrow()
+    tag = pa.struct(
+        [
+            pa.field("tag_code", pa.string()),
+            pa.field("tag_name_cn", pa.string()),
+            pa.field("evidence", pa.string()),
+        ]
+    )
+    return pa.schema(
+        [
+            pa.field("review_id", pa.string(), nullable=False),
+            pa.field("review_source", pa.int32()),
+            pa.field("review_en", pa.string()),
+            pa.field("review_cn", pa.string()),
+            pa.field("sentiment", pa.int8()),
+            pa.field("tags", pa.list_(tag)),
+            pa.field("annotator", pa.string()),
+        ]
+    )
+
+
+# ----------------------------------------------------------------------
+# Writers: one row group / record batch per ROW_GROUP_SIZE rows, so neither side
+# ever holds the whole file.
+# ----------------------------------------------------------------------
+class _BatchWriter:
+    def __init__(self, path: Path, schema: "pa.Schema"):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._schema = schema
+        if path.suffix.lower() in PARQUET_SUFFIXES:
+            # Dictionary encoding collapses the few hundred distinct tag codes/names.
+            self._writer = pq.ParquetWriter(str(path), schema, compression="zstd", use_dictionary=True)
+        else:
+            # Uncompressed IPC so readers can memory-map batches without copying.
+            self._sink = pa.OSFile(str(path), "wb")
+            self._writer = pa.ipc.new_file(self._sink, schema)
+
+    def write(self, columns: dict) -> None:
+        self._writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+        if hasattr(self, "_sink"):
+            self._sink.close()
+
+
+def _write_rows(path: Path, schema: "pa.Schema", rows: Iterable[Any], to_columns) -> int:
+    writer = _BatchWriter(path, schema)
+    count = 0
+    try:
+        iterator = iter(rows)
+        while True:
+            chunk = list(itertools.islice(iterator, ROW_GROUP_SIZE))
+            if not chunk:
+                break
+            writer.write(to_columns(chunk))
+            count += len(chunk)
+    finally:
+        writer.close()
+    return count
+
+
+def _candidate_columns(chunk: Sequence[CandidateReview]) -> dict:
+    return {
+        "review_id": [c.review_id for c in chunk],
+        "review_source": [c.review_source for c in chunk],
+        "review_en": [c.review_en for c in chunk],
+    }
+
+
+def _payload_columns(chunk: Sequence[LLMPayload]) -> dict:
+    return {
+        "review_id": [p.review_id for p in chunk],
+        "review_source": [p.review_source for p in chunk],
+        "review_en": [p.review_en for p in chunk],
+        "review_cn": [p.review_cn for p in chunk],
+        "sentiment": [p.sentiment for p in chunk],
+        "tags": [
+            [{"tag_code": t.tag_code, "tag_name_cn": t.tag_name_cn, "evidence": t.evidence} for t in p.tags]
+            for p in chunk
+        ],
+        "annotator": [p.annotator for p in chunk],
+    }
+
+
+def write_candidates(path: Path, reviews: Iterable[CandidateReview]) -> int:
+    return _write_rows(path, candidate_schema(), reviews, _candidate_columns)
+
+
+def write_payloads(path: Path, payloads: Iterable[LLMPayload]) -> int:
+    return _write_rows(path, payload_schema(), payloads, _payload_columns)
+
+
+# ----------------------------------------------------------------------
+# Readers
+# ----------------------------------------------------------------------
+def iter_batches(path: Path, batch_size: int = ROW_GROUP_SIZE) -> Iterator["pa.RecordBatch"]:
+    """Stream record batches; Arrow IPC files are memory-mapped, not copied."""
+    _require_pyarrow()
+    if path.suffix.lower() in PARQUET_SUFFIXES:
+        yield from pq.ParquetFile(str(path)).iter_batches(batch_size=batch_size)
+        return
+    with pa.memory_map(str(path), "r") as source:
+        reader = pa.ipc.open_file(source)
+        for index in range(reader.num_record_batches):
+            yield reader.get_batch(index)
+
+
+def _column(batch: "pa.RecordBatch", name: str, default: Any) -> List[Any]:
+    index = batch.schema.get_field_index(name)
+    if index < 0:
+        return [default] * batch.num_rows
+    return batch.column(index).to_pylist()
+
+
+def _take(batch: "pa.RecordBatch", shard: Optional[Shard]) -> Optional["pa.RecordBatch"]:
+    """The rows of ``batch`` that ``shard`` owns, decided from review_id alone so the
+    other columns of skipped rows are never turned into Python objects."""
+    if shard is None:
+        return batch
+    rows = [row for row, review_id in enumerate(_column(batch, "review_id", None)) if shard.owns(review_id)]
+    return batch.take(pa.array(rows, type=pa.int64())) if rows else None
+
+
+def read_candidates(path: Path, shard: Optional[Shard] = None) -> Iterator[CandidateReview]:
+    """Candidates from a columnar file, lazily, only those ``shard`` owns."""
+    for batch in iter_batches(path):
+        batch = _take(batch, shard)
+        if batch is None:
+            continue
+        for review_id, review_source, review_en in zip(
+            _column(batch, "review_id", None),
+            _column(batch, "review_source", 0),
+            _column(batch, "review_en", ""),
+        ):
+            yield CandidateReview(review_id, review_source, review_en or "")
+
+
+def read_payloads(path: Path, shard: Optional[Shard] = None) -> Iterator[LLMPayload]:
+    """Payloads from a columnar file, lazily, only those ``shard`` owns."""
+    for batch in iter_batches(path):
+        batch = _take(batch, shard)
+        if batch is None:
+            continue
+        for review_id, review_source, review_en, review_cn, sentiment, tags, annotator in zip(
+            _column(batch, "review_id", None),
+            _column(batch, "review_source", 0),
+            _column(batch, "review_en", ""),
+            _column(batch, "review_cn", ""),
+            _column(batch, "sentiment", 0),
+            _column(batch, "tags", None),
+            _column(batch, "annotator", "llm"),
+        ):
+            yield LLMPayload(
+                review_id=review_id,
+                review_source=review_source,
+                review_en=review_en or "",
+                review_cn=review_cn or "",
+                sentiment=sentiment or 0,
+                tags=[
+                    TagFragment(tag["tag_code"], tag["tag_name_cn"] or "", tag["evidence"] or "")
+                    for tag in tags or ()
+                ],
+                annotator=annotator or "llm",
+            )
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class AdaptiveLimiter:
+    """AIMD in-flight limit: halve on throttling or latency spikes, +1 per healthy window."""
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        latency_spike_factor: float = 3.0,
+        min_spike_seconds: float = 1.0,
+        warmup_samples: int = 5,
+        cooldown_seconds: float = 2.0,
+    ):
+        if max_limit < 1:
+            raise ValueError("max_limit must be >= 1")
+        self._max = max_limit
+        self._min = max(1, min(min_limit, max_limit))
+        self._limit = max_limit
+        self._in_flight = 0
+        self._healthy_streak = 0
+        self._latency_ewma: Optional[float] = None
+        self._samples = 0
+        self._spike_factor = latency_spike_factor
+        self._min_spike = min_spike_seconds
+        self._warmup = warmup_samples
+        self._cooldown = cooldown_seconds
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= self._limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, latency: float, congested: bool = False) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            spike = (
+                self._latency_ewma is not None
+                and self._samples >= self._warmup
+                and latency > self._latency_ewma * self._spike_factor
+                and latency - self._latency_ewma > self._min_spike
+            )
+            if not congested:
+                # Spikes feed the baseline too: a lasting shift (longer prompts, a slower
+                # upstream) stops looking like a spike after a few samples instead of
+                # halving the limit down to min_limit for the rest of the run.
+                self._observe_latency(latency)
+            if congested or spike:
+                self._decrease(reason="throttled" if congested else f"latency spike {latency:.2f}s")
+            else:
+                self._healthy_streak += 1
+                # One full window of healthy calls earns one more slot.
+                if self._healthy_streak >= self._limit and self._limit < self._max:
+                    self._limit += 1
+                    self._healthy_streak = 0
+                    logging.debug("Concurrency limit raised to %d", self._limit)
+            self._cond.notify_all()
+
+    def _observe_latency(self, latency: float) -> None:
+        self._samples += 1
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma = 0.8 * self._latency_ewma + 0.2 * latency
+
+    def _decrease(self, reason: str) -> None:
+        self._healthy_streak = 0
+        now = time.monotonic()
+        # A burst of failures from the same window should only count once.
+        if now - self._last_decrease < self._cooldown:
+            return
+        self._last_decrease = now
+        new_limit = max(self._min, self._limit // 2)
+        if new_limit != self._limit:
+            logging.info("Concurrency limit lowered %d -> %d (%s)", self._limit, new_limit, reason)
+        self._limit = new_limit
+
+
+def run_adaptive(
+    items: Sequence[T],
+    func: Callable[[T], R],
+    max_concurrency: int = 1,
+    is_congestion: Callable[[BaseException], bool] = lambda exc: False,
+    max_retries: int = 3,
+    backoff_seconds: float = 1.0,
+    on_result: Optional[Callable[[int, Optional[R]], None]] = None,
+    describe: Callable[[T], str] = str,
+    before: Optional[Callable[[T], None]] = None,
+) -> List[Optional[R]]:
+    """Run ``func`` over ``items`` with an adaptive in-flight limit.
+
+    Results are returned in input order. A failing item yields ``None`` and is
+    logged, so one bad item never aborts the batch. ``on_result`` runs on the
+    calling thread as items complete, which keeps non thread-safe resources
+    (e.g. the Doris connection) out of the worker threads. ``before`` runs on the
+    worker ahead of each attempt, outside the limiter slot and its latency timing,
+    for waits that say nothing about the upstream (e.g. a token budget).
+    """
+    results: List[Optional[R]] = [None] * len(items)
+    if not items:
+        return results
+    limiter = AdaptiveLimiter(max_limit=max(1, max_concurrency))
+
+    def _run(item: T) -> R:
+        attempt = 0
+        while True:
+            if before is not None:
+                before(item)
+            limiter.acquire()
+            started = time.monotonic()
+            try:
+                result = func(item)
+            except Exception as exc:
+                congested = is_congestion(exc)
+                limiter.release(time.monotonic() - started, congested=congested)
+                if not congested or attempt >= max_retries:
+                    raise
+                delay = backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+                attempt += 1
+                logging.info(
+                    "Retrying %s in %.1fs after %s (attempt %d/%d)",
+                    describe(item),
+                    delay,
+                    exc,
+                    attempt,
+                    max_retries,
+                )
+                time.sleep(delay)
+                continue
+            limiter.release(time.monotonic() - started)
+            return result
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        futures = {pool.submit(_run, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as exc:
+                logging.warning("Failed to process %s: %s", describe(items[index]), exc)
+            if on_result:
+                on_result(index, results[index])
+    return results
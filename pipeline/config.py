@@ -14,6 +14,7 @@ class DorisConfig:
     database: str
     username: str
     password: str
+    http_port: int = 8030
 
 
 @dataclass
@@ -22,6 +23,15 @@ class DeepSeekConfig:
     api_key: str
     model: str
     timeout: int = 30
+    max_retries: int = 3
+    pool_size: int = 16
+    breaker_threshold: int = 5
+    breaker_reset_seconds: float = 30.0
+    # Per million tokens, used by --plan; cached input is the prefix-cache hit price.
+    input_price_per_million: float = 0.28
+    cached_input_price_per_million: float = 0.028
+    output_price_per_million: float = 0.42
+    price_currency: str = "USD"
 
 
 @dataclass
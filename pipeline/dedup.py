@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import unicodedata
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Sequence
+
+from .models import CandidateReview, LLMPayload
+
+_WS_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_NUM_PERM = 64
+_MERSENNE = (1 << 61) - 1
+# Annotator of near-duplicate members labelled from their group representative.
+DEDUP_ANNOTATOR = "dedup"
+
+
+@dataclass
+class DuplicateGroup:
+    representative: CandidateReview
+    members: List[CandidateReview] = field(default_factory=list)
+
+
+def normalize_text(text: str) -> str:
+    """Case/width/punctuation-insensitive form used for duplicate detection."""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = _PUNCT_RE.sub(" ", text)
+    return _WS_RE.sub(" ", text).strip()
+
+
+def group_duplicates(
+    candidates: Sequence[CandidateReview], threshold: float = 0.9
+) -> List[DuplicateGroup]:
+    """Group exact and near-duplicate reviews.
+
+    Exact duplicates share a normalized-text hash. Near duplicates are found with
+    MinHash over word 3-shingles plus LSH banding, then confirmed by the estimated
+    Jaccard similarity against ``threshold``; ``threshold >= 1`` disables the
+    near-duplicate pass. Groups keep input order, and the first member is the
+    representative.
+    """
+    exact: Dict[str, DuplicateGroup] = {}
+    groups: List[DuplicateGroup] = []
+    normalized: List[str] = []
+    for review in candidates:
+        norm = normalize_text(review.review_en)
+        key = hashlib.sha1(norm.encode("utf-8")).hexdigest()
+        group = exact.get(key)
+        if group is None:
+            group = DuplicateGroup(representative=review)
+            exact[key] = group
+            groups.append(group)
+            normalized.append(norm)
+        group.members.append(review)
+    if threshold >= 1 or len(groups) < 2:
+        return groups
+
+    signatures = [_minhash(_shingles(text)) for text in normalized]
+    bands, rows = _band_layout(threshold)
+    parent = list(range(len(groups)))
+
+    def _find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        buckets: Dict[tuple, int] = {}
+        for index, signature in enumerate(signatures):
+            if signature is None:
+                continue
+            bucket = tuple(signature[band * rows : (band + 1) * rows])
+            other = buckets.setdefault(bucket, index)
+            if other == index:
+                continue
+            root_a, root_b = _find(other), _find(index)
+            if root_a != root_b and _similarity(signatures[other], signature) >= threshold:
+                # Keep the earliest group as root so representatives stay stable.
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    merged: Dict[int, DuplicateGroup] = {}
+    result: List[DuplicateGroup] = []
+    for index, group in enumerate(groups):
+        root = _find(index)
+        if root == index:
+            merged[index] = group
+            result.append(group)
+        else:
+            merged[root].members.extend(group.members)
+    return result
+
+
+def expand_group_payload(payload: LLMPayload, member: CandidateReview) -> LLMPayload:
+    """Carry the representative's annotation over to another member of its group.
+
+    Exact duplicates get a full copy. A near duplicate keeps the sentiment and tags, but
+    not the translation, and keeps a tag's evidence only where it occurs in the member's
+    own text; it is marked ``annotator="dedup"`` so it is not mistaken for LLM output.
+    """
+    member_text = normalize_text(member.review_en)
+    if member_text == normalize_text(payload.review_en):
+        review_cn, tags, annotator = payload.review_cn, list(payload.tags), payload.annotator
+    else:
+        review_cn = ""
+        tags = [
+            replace(tag, evidence=tag.evidence if normalize_text(tag.evidence) in member_text else "")
+            for tag in payload.tags
+        ]
+        annotator = DEDUP_ANNOTATOR if payload.annotator == "llm" else payload.annotator
+    return LLMPayload(
+        review_id=member.review_id,
+        review_source=member.review_source,
+        review_en=member.review_en,
+        review_cn=review_cn,
+        sentiment=payload.sentiment,
+        tags=tags,
+        annotator=annotator,
+    )
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = text.split()
+    if len(words) < size:
+        return {text} if text else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def _minhash(shingles: set) -> List[int] | None:
+    if not shingles:
+        return None
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles]
+    return [min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def _similarity(left: List[int], right: List[int]) -> float:
+    return sum(1 for a, b in zip(left, right) if a == b) / _NUM_PERM
+
+
+def _band_layout(threshold: float) -> tuple:
+    """Pick (bands, rows) whose LSH S-curve midpoint sits just below ``threshold``."""
+    best = (16, 4)
+    best_gap = float("inf")
+    for rows in range(1, _NUM_PERM + 1):
+        if _NUM_PERM % rows:
+            continue
+        bands = _NUM_PERM // rows
+        midpoint = (1 / bands) ** (1 / rows)
+        gap = threshold - midpoint
+        if 0 <= gap < best_gap:
+            best, best_gap = (bands, rows), gap
+    return best
+
+
+def _make_permutations() -> List[tuple]:
+    seed = hashlib.sha256(b"amz-return-analytics-minhash").digest()
+    perms = []
+    for i in range(_NUM_PERM):
+        block = hashlib.sha256(seed + i.to_bytes(2, "big")).digest()
+        a = int.from_bytes(block[:8], "big") % (_MERSENNE - 1) + 1
+        b = int.from_bytes(block[8:16], "big") % _MERSENNE
+        perms.append((a, b))
+    return perms
+
+
+_PERMUTATIONS = _make_permutations()
@@ -1,12 +1,21 @@
 from __future__ import annotations
 
+import hashlib
 import json
-from typing import Callable, Dict, List, Optional
+import logging
+import threading
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 import requests
 
+from .codec import dumps, loads, payload_from_dict
 from .config import DeepSeekConfig
-from .models import CandidateReview, LLMPayload, TagFragment
+from .metrics import METRICS
+from .models import CandidateReview, LLMPayload
+from .tag_library import serialize_tag_library, tag_library_fingerprint
+from .transport import CircuitBreaker, CircuitOpenError, HttpTransport
 
 DEFAULT_INSTRUCTIONS = (
     "你是一名亚马逊美国站的退货分析专家，请严格按照 schema 输出 JSON，字段为："
@@ -14,6 +23,48 @@ DEFAULT_INSTRUCTIONS = (
     "tags[{tag_code, tag_name_cn, evidence}]。仅可使用 tag_library 中的标签。"
 )
 
+BATCH_INSTRUCTIONS = (
+    "\n\n【批量模式】用户消息中的 reviews 数组包含多条留言，请逐条独立打标，"
+    "输出 JSON 对象 {\"results\": [...]}，数组中每个元素为一条留言的完整结果（字段同上），"
+    "review_id 必须与输入一致，不得遗漏或合并。"
+)
+
+
+@dataclass
+class UsageStats:
+    """Token counters accumulated from the ``usage`` block of each completion."""
+
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cache_hit_tokens: int = 0
+    cache_miss_tokens: int = 0
+
+    def add_usage(self, usage: Dict[str, Any]) -> None:
+        self.requests += 1
+        prompt = int(usage.get("prompt_tokens") or 0)
+        self.prompt_tokens += prompt
+        self.completion_tokens += int(usage.get("completion_tokens") or 0)
+        # DeepSeek reports prompt_cache_hit/miss_tokens; OpenAI-style APIs nest cached_tokens.
+        if "prompt_cache_hit_tokens" in usage:
+            hit = int(usage.get("prompt_cache_hit_tokens") or 0)
+            miss = int(usage.get("prompt_cache_miss_tokens") or prompt - hit)
+        else:
+            hit = int((usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0)
+            miss = prompt - hit
+        self.cache_hit_tokens += hit
+        self.cache_miss_tokens += miss
+
+    def __sub__(self, other: "UsageStats") -> "UsageStats":
+        return UsageStats(
+            **{f.name: getattr(self, f.name) - getattr(other, f.name) for f in fields(self)}
+        )
+
+    @property
+    def cache_hit_rate(self) -> float:
+        total = self.cache_hit_tokens + self.cache_miss_tokens
+        return self.cache_hit_tokens / total if total else 0.0
+
 
 class DeepSeekClient:
     """Minimal wrapper for invoking DeepSeek chat completions."""
@@ -23,6 +74,28 @@ class DeepSeekClient:
         self._api_key = config.api_key
         self._model = config.model
         self._timeout = config.timeout
+        self._transport = HttpTransport(
+            pool_size=config.pool_size,
+            max_retries=config.max_retries,
+            breaker=CircuitBreaker(config.breaker_threshold, config.breaker_reset_seconds),
+        )
+        self._usage = UsageStats()
+        self._usage_lock = threading.Lock()
+        # (id(tag_library), instructions, batch) -> (tag_library, serialized system message).
+        # Holding the library keeps its id() from being reused while cached.
+        self._system_messages: Dict[Tuple[int, str, bool], Tuple[Dict[str, Dict[str, str]], str]] = {}
+        self._system_lock = threading.Lock()
+
+    @property
+    def model(self) -> str:
+        return self._model
+
+    def close(self) -> None:
+        self._transport.close()
+
+    def usage_snapshot(self) -> UsageStats:
+        with self._usage_lock:
+            return UsageStats(**{f.name: getattr(self._usage, f.name) for f in fields(self._usage)})
 
     def annotate(
         self,
@@ -31,55 +104,213 @@ class DeepSeekClient:
         prompt_text: Optional[str] = None,
         on_request: Optional[Callable[[Dict[str, object]], None]] = None,
     ) -> LLMPayload:
-        url = f"{self._base_url}/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self._api_key}",
-            "Content-Type": "application/json",
-        }
-        instructions = prompt_text.strip() if prompt_text else DEFAULT_INSTRUCTIONS
-        system_payload = {
-            "role": "return_analyst",
-            "instructions": instructions,
-            "tag_library": _format_tag_library(tag_library),
-        }
         user_payload = {
             "review_id": review.review_id,
             "review_source": review.review_source,
             "review_en": review.review_en,
         }
+        system_message = self.system_message(tag_library, prompt_text)
+        payload_dict = self._complete(system_message, user_payload, on_request)
+        return payload_from_dict(payload_dict, review)
+
+    def annotate_batch(
+        self,
+        reviews: Sequence[CandidateReview],
+        tag_library: Dict[str, Dict[str, str]],
+        prompt_text: Optional[str] = None,
+        on_request: Optional[Callable[[Dict[str, object]], None]] = None,
+    ) -> List[Optional[LLMPayload]]:
+        """Label several reviews with one completion sharing a single tag_library.
+
+        Items missing from (or malformed in) the response are retried one by one
+        via ``annotate``; an item that still fails comes back as ``None``.
+        """
+        if len(reviews) == 1:
+            return [self.annotate(reviews[0], tag_library, prompt_text, on_request)]
+        system_message = self.system_message(tag_library, prompt_text, batch=True)
+        user_payload = {
+            "reviews": [
+                {
+                    "review_id": review.review_id,
+                    "review_source": review.review_source,
+                    "review_en": review.review_en,
+                }
+                for review in reviews
+            ]
+        }
+        try:
+            response = self._complete(system_message, user_payload, on_request)
+        except ValueError as exc:
+            logging.warning("Unparseable batch response (%s); retrying %d reviews individually", exc, len(reviews))
+            response = {}
+        if isinstance(response, dict):
+            response = response.get("results", response.get("reviews", []))
+        by_id: Dict[str, Dict[str, Any]] = {}
+        if isinstance(response, list):
+            for item in response:
+                if isinstance(item, dict):
+                    by_id[str(item.get("review_id"))] = item
+
+        results: List[Optional[LLMPayload]] = []
+        for review in reviews:
+            item = by_id.get(str(review.review_id))
+            payload = None
+            if item is not None:
+                try:
+                    payload = payload_from_dict(item, review)
+                except ValueError:
+                    payload = None
+            if payload is None:
+                logging.info("Batch result missing or malformed for review %s; retrying alone", review.review_id)
+                try:
+                    payload = self.annotate(review, tag_library, prompt_text, on_request)
+                except Exception as exc:
+                    logging.warning("Failed to annotate review %s: %s", review.review_id, exc)
+            results.append(payload)
+        return results
+
+    def system_message(
+        self,
+        tag_library: Dict[str, Dict[str, str]],
+        prompt_text: Optional[str] = None,
+        batch: bool = False,
+    ) -> str:
+        """Serialized system message, built once per (prompt, tag library) and reused
+        byte-for-byte so the provider-side prompt prefix cache keeps hitting."""
+        instructions = prompt_text.strip() if prompt_text else DEFAULT_INSTRUCTIONS
+        key = (id(tag_library), instructions, batch)
+        with self._system_lock:
+            cached = self._system_messages.get(key)
+            if cached is None:
+                if batch:
+                    instructions += BATCH_INSTRUCTIONS
+                cached = (tag_library, build_system_message(instructions, tag_library))
+                self._system_messages[key] = cached
+        return cached[1]
+
+    def _complete(
+        self,
+        system_message: str,
+        user_payload: Dict[str, object],
+        on_request: Optional[Callable[[Dict[str, object]], None]],
+    ) -> Any:
+        url = f"{self._base_url}/chat/completions"
+        headers = {
+            "Authorization": f"Bearer {self._api_key}",
+            "Content-Type": "application/json",
+        }
         body: Dict[str, object] = {
             "model": self._model,
             "messages": [
-                {"role": "system", "content": json.dumps(system_payload, ensure_ascii=False)},
-                {"role": "user", "content": json.dumps(user_payload, ensure_ascii=False)},
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": dumps(user_payload)},
             ],
             "response_format": {"type": "json_object"},
         }
         if on_request:
             on_request(body)
-        resp = requests.post(url, headers=headers, json=body, timeout=self._timeout)
-        print("DeepSeek status:", resp.status_code)
-        print("DeepSeek body preview:", resp.text[:500])
-        resp.raise_for_status()
-        data = resp.json()
+        started = time.perf_counter()
+        try:
+            resp = self._transport.post_json(url, headers, body, self._timeout)
+        except Exception:
+            METRICS.inc("llm_requests_total", outcome="error")
+            raise
+        finally:
+            METRICS.observe("llm_request_seconds", time.perf_counter() - started)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("DeepSeek status=%s body preview: %s", resp.status_code, resp.text[:500])
+        started = time.perf_counter()
+        data = loads(resp.content)
+        usage = data.get("usage")
+        if usage:
+            with self._usage_lock:
+                self._usage.add_usage(usage)
+            _record_usage(usage)
         content = _strip_json_fence(data["choices"][0]["message"]["content"])
-        payload_dict = json.loads(content)
-        tags = [
-            TagFragment(
-                tag_code=item["tag_code"],
-                tag_name_cn=item["tag_name_cn"],
-                evidence=item["evidence"],
-            )
-            for item in payload_dict.get("tags", [])
-        ]
-        return LLMPayload(
-            review_id=payload_dict.get("review_id", review.review_id),
-            review_source=payload_dict.get("review_source", review.review_source),
-            review_en=payload_dict.get("review_en", review.review_en),
-            review_cn=payload_dict.get("review_cn", ""),
-            sentiment=payload_dict.get("sentiment", 0),
-            tags=tags,
-        )
+        try:
+            result = loads(content)
+        except ValueError:
+            METRICS.inc("llm_requests_total", outcome="unparseable")
+            raise
+        finally:
+            METRICS.observe("json_decode_seconds", time.perf_counter() - started, source="llm_response")
+        METRICS.inc("llm_requests_total", outcome="ok")
+        return result
+
+
+def build_system_message(instructions: str, tag_library: Dict[str, Dict[str, str]]) -> str:
+    # Same bytes as json.dumps({"role", "instructions", "tag_library"}) with compact
+    # separators, but splices in the library serialization a TagLibrary already carries.
+    return (
+        '{"role":"return_analyst","instructions":'
+        + json.dumps(instructions, ensure_ascii=False)
+        + ',"tag_library":'
+        + serialize_tag_library(tag_library)
+        + "}"
+    )
+
+
+def prompt_fingerprint(prompt_text: Optional[str], tag_library: Dict[str, Dict[str, str]]) -> str:
+    """Fingerprint of everything in the system message, for the status ledger."""
+    instructions = prompt_text.strip() if prompt_text else DEFAULT_INSTRUCTIONS
+    digest = hashlib.sha256(instructions.encode("utf-8"))
+    digest.update(tag_library_fingerprint(tag_library).encode("ascii"))
+    return digest.hexdigest()[:16]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: ~4 characters per token for English review text."""
+    return len(text) // 4 + 1
+
+
+def pack_batches(
+    reviews: Sequence[CandidateReview],
+    max_batch_size: int,
+    token_budget: int,
+    cost: Optional[Callable[[CandidateReview], int]] = None,
+) -> List[List[CandidateReview]]:
+    """Group reviews into batches of at most ``max_batch_size`` items and ``token_budget``
+    estimated tokens (a single oversized review still gets its own batch). ``cost``
+    defaults to the review's input tokens."""
+    batches: List[List[CandidateReview]] = []
+    current: List[CandidateReview] = []
+    current_tokens = 0
+    for review in reviews:
+        # review_en dominates; the per-item JSON keys add a small constant.
+        tokens = cost(review) if cost else estimate_tokens(review.review_en) + 20
+        if current and (
+            len(current) >= max_batch_size or current_tokens + tokens > token_budget
+        ):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(review)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def is_congestion_error(exc: BaseException) -> bool:
+    """True for failures that signal an overloaded API (429, 5xx, timeouts)."""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, (requests.Timeout, requests.ConnectionError))
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """True for failures of the service rather than of the review: congestion or an
+    open circuit breaker. Recorded in the ledger without using up an attempt."""
+    return isinstance(exc, CircuitOpenError) or is_congestion_error(exc)
+
+
+def _record_usage(usage: Dict[str, Any]) -> None:
+    single = UsageStats()
+    single.add_usage(usage)
+    METRICS.inc("llm_prompt_tokens_total", single.prompt_tokens)
+    METRICS.inc("llm_completion_tokens_total", single.completion_tokens)
+    METRICS.inc("llm_cache_hit_tokens_total", single.cache_hit_tokens)
+    METRICS.inc("llm_cache_miss_tokens_total", single.cache_miss_tokens)
 
 
 def _strip_json_fence(text: str) -> str:
@@ -94,18 +325,3 @@ def _strip_json_fence(text: str) -> str:
             lines = lines[:-1]
         stripped = "\n".join(lines).strip()
     return stripped
-
-
-def _format_tag_library(tag_library: Dict[str, Dict[str, str]]) -> List[Dict[str, str]]:
-    result: List[Dict[str, str]] = []
-    for code, meta in tag_library.items():
-        result.append(
-            {
-                "tag_code": code,
-                "tag_name_cn": meta.get("tag_name_cn", ""),
-                "category_name_cn": meta.get("category_name_cn", ""),
-                "definition": meta.get("definition", ""),
-                "boundary_note": meta.get("boundary_note", ""),
-            }
-        )
-    return result
@@ -1,12 +1,92 @@
 from __future__ import annotations
 
-import json
-from typing import Any, Dict, List
+import re
+import time
+import uuid
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Sequence, Tuple, TypeVar
 
 import pymysql
 
+from .codec import decode_payload, encode_payload
 from .config import DorisConfig
+from .ledger import UNCOUNTED_STATUSES
+from .metrics import METRICS
 from .models import CandidateReview, LLMPayload, TagFragment
+from .sharding import Shard
+
+T = TypeVar("T")
+
+# Labelled reviews' country / fasin / review_date (see schema.sql/return_tag_rollup.sql):
+# copied per parse batch from the view over the external sources into a local table,
+# which the rollup group lookup and rebuild join instead of the view.
+ROLLUP_ATTR_VIEW = "view_return_review_attr"
+ROLLUP_ATTR_TABLE = "return_review_attr"
+ROLLUP_TABLES = ("return_tag_rollup_weekly", "return_review_rollup_weekly")
+
+_ROLLUP_GROUP = (
+    "(coalesce(a.country, '') = %s AND coalesce(a.fasin, '') = %s "
+    "AND a.review_date >= %s AND a.review_date < %s)"
+)
+
+# Stale (review_id, tag_code) keys of a push-down parse, staged per run for DELETE ... USING.
+STALE_DETAILS_TABLE = "return_fact_details_stale"
+
+# return_fact_llm payloads exploded to DETAIL_COLUMNS order, mirroring detail_rows():
+# explode_json_array_json_outer yields one NULL tag for an empty or missing tags
+# array, which becomes the NO_TAG placeholder row.
+_EXPLODED_DETAILS = """
+SELECT l.review_id,
+       coalesce(get_json_string(exploded_tag, '$.tag_code'), 'NO_TAG') AS tag_code,
+       get_json_int(l.payload, '$.review_source') AS review_source,
+       get_json_string(l.payload, '$.review_en') AS review_en,
+       coalesce(get_json_string(l.payload, '$.review_cn'), '') AS review_cn,
+       coalesce(get_json_int(l.payload, '$.sentiment'), 0) AS sentiment,
+       coalesce(get_json_string(exploded_tag, '$.tag_name_cn'), '') AS tag_name_cn,
+       coalesce(get_json_string(exploded_tag, '$.evidence'), '') AS evidence
+FROM return_fact_llm l
+LATERAL VIEW explode_json_array_json_outer(coalesce(json_extract(l.payload, '$.tags'), '[]')) t AS exploded_tag
+{where}
+"""
+
+_WRITE_TARGET = re.compile(r"^\s*(?:INSERT\s+INTO|DELETE\s+FROM|UPDATE)\s+`?(\w+)", re.IGNORECASE)
+
+DETAIL_COLUMNS = (
+    "review_id",
+    "tag_code",
+    "review_source",
+    "review_en",
+    "review_cn",
+    "sentiment",
+    "tag_name_cn",
+    "evidence",
+)
+
+
+def record_statement(sql: str, seconds: float, rows: int) -> None:
+    """Statement latency by verb, plus rows affected per table for writes."""
+    verb = sql.lstrip().split(None, 1)[0].upper()
+    METRICS.observe("db_statement_seconds", seconds, verb=verb)
+    match = _WRITE_TARGET.match(sql)
+    if match and rows and rows > 0:
+        METRICS.inc("db_rows_written_total", rows, table=match.group(1), verb=verb)
+
+
+class _MeteredCursorMixin:
+    # pymysql's executemany goes through execute, so this sees every statement sent.
+    def execute(self, query: str, args: Any = None) -> int:
+        started = time.perf_counter()
+        rows = super().execute(query, args)
+        record_statement(query, time.perf_counter() - started, rows)
+        return rows
+
+
+class MeteredDictCursor(_MeteredCursorMixin, pymysql.cursors.DictCursor):
+    pass
+
+
+class MeteredSSDictCursor(_MeteredCursorMixin, pymysql.cursors.SSDictCursor):
+    pass
 
 
 class DorisClient:
@@ -19,7 +99,7 @@ class DorisClient:
             user=config.username,
             password=config.password,
             database=config.database,
-            cursorclass=pymysql.cursors.DictCursor,
+            cursorclass=MeteredDictCursor,
             autocommit=True,
         )
 
@@ -27,7 +107,11 @@ class DorisClient:
     # Candidate stage
     # ------------------------------------------------------------------
     def fetch_candidates(
-        self, limit: int = 200, country: str | None = None, fasin: str | None = None
+        self,
+        limit: int = 200,
+        country: str | None = None,
+        fasin: str | None = None,
+        shard: Shard | None = None,
     ) -> List[CandidateReview]:
         sql = """
         SELECT review_id, review_source, review_en
@@ -41,6 +125,10 @@ class DorisClient:
         if fasin:
             conditions.append("fasin = %s")
             params.append(fasin)
+        if shard:
+            condition, shard_params = shard.sql_condition()
+            conditions.append(condition)
+            params.extend(shard_params)
         if conditions:
             sql += " WHERE " + " AND ".join(conditions)
         sql += " ORDER BY review_date DESC LIMIT %s"
@@ -58,103 +146,330 @@ class DorisClient:
             for row in rows
         ]
 
+    def iter_candidates(
+        self,
+        page_size: int = 1000,
+        country: str | None = None,
+        fasin: str | None = None,
+        after: Tuple[str | None, str] | None = None,
+        limit: int | None = None,
+        shard: Shard | None = None,
+    ) -> Iterator[List[CandidateReview]]:
+        """Page through the whole snapshot with keyset pagination on (review_date, review_id).
+
+        Each page is read through an unbuffered server-side cursor and yielded as a
+        list once the cursor is closed, so the connection is free for writes between
+        pages and memory is bounded by ``page_size``. ``after`` resumes strictly after
+        a previously seen key; NULL review_dates sort last under DESC and are paged
+        by review_id alone.
+        """
+        base_conditions = []
+        base_params: List[Any] = []
+        if country:
+            base_conditions.append("country = %s")
+            base_params.append(country)
+        if fasin:
+            base_conditions.append("fasin = %s")
+            base_params.append(fasin)
+        if shard:
+            condition, shard_params = shard.sql_condition()
+            base_conditions.append(condition)
+            base_params.extend(shard_params)
+        remaining = limit
+        key = after
+        while remaining is None or remaining > 0:
+            conditions = list(base_conditions)
+            params = list(base_params)
+            if key is not None:
+                last_date, last_id = key
+                if last_date is None:
+                    conditions.append("review_date IS NULL AND review_id < %s")
+                    params.append(last_id)
+                else:
+                    conditions.append(
+                        "(review_date < %s OR (review_date = %s AND review_id < %s) OR review_date IS NULL)"
+                    )
+                    params.extend([last_date, last_date, last_id])
+            sql = """
+            SELECT review_id, review_source, review_en, review_date
+            FROM view_return_review_snapshot
+            """
+            if conditions:
+                sql += " WHERE " + " AND ".join(conditions)
+            size = page_size if remaining is None else min(page_size, remaining)
+            sql += " ORDER BY review_date DESC, review_id DESC LIMIT %s"
+            params.append(size)
+
+            page: List[CandidateReview] = []
+            with self._conn.cursor(MeteredSSDictCursor) as cur:
+                cur.execute(sql, params)
+                for row in cur:
+                    review_date = row["review_date"]
+                    page.append(
+                        CandidateReview(
+                            review_id=row["review_id"],
+                            review_source=row["review_source"],
+                            review_en=row["review_en"],
+                            review_date=None if review_date is None else str(review_date),
+                        )
+                    )
+            if not page:
+                return
+            yield page
+            if len(page) < size:
+                return
+            key = (page[-1].review_date, page[-1].review_id)
+            if remaining is not None:
+                remaining -= len(page)
+
     # ------------------------------------------------------------------
     # Raw payload stage
     # ------------------------------------------------------------------
-    def upsert_return_fact_llm(self, payload: LLMPayload) -> None:
-        delete_sql = "DELETE FROM return_fact_llm WHERE review_id = %s"
-        insert_sql = """
-        INSERT INTO return_fact_llm (review_id, payload)
-        VALUES (%s, %s)
+    def upsert_return_fact_llm_bulk(self, payloads: Sequence[LLMPayload], batch_size: int = 500) -> int:
+        """Write payloads with one multi-row INSERT per batch.
+
+        return_fact_llm is a Unique Key table on review_id, so re-inserting a key
+        replaces the row; no per-review DELETE is needed.
         """
-        json_payload = payload.to_json()
+        written = 0
         with self._conn.cursor() as cur:
-            cur.execute(delete_sql, (payload.review_id,))
-            cur.execute(insert_sql, (payload.review_id, json_payload))
+            for chunk in chunks(last_per_key(payloads, lambda p: p.review_id), batch_size):
+                sql = "INSERT INTO return_fact_llm (review_id, payload) VALUES " + ",".join(
+                    ["(%s,%s)"] * len(chunk)
+                )
+                params: List[Any] = []
+                for payload in chunk:
+                    params.extend((payload.review_id, encode_payload(payload)))
+                cur.execute(sql, params)
+                written += len(chunk)
+        return written
 
-    def fetch_payloads(self, limit: int = 200) -> List[LLMPayload]:
-        sql = """
-        SELECT payload
-        FROM return_fact_llm
-        ORDER BY created_at DESC
-        LIMIT %s
-        """
+    def fetch_payloads(
+        self,
+        limit: int = 200,
+        shard: Shard | None = None,
+        since: str | None = None,
+        review_id_from: str | None = None,
+        review_id_to: str | None = None,
+    ) -> List[LLMPayload]:
+        conditions, params = _payload_scope(shard, since, review_id_from, review_id_to)
+        sql = f"SELECT payload FROM return_fact_llm {_where(conditions)}"
+        sql += " ORDER BY created_at DESC LIMIT %s"
+        params.append(limit)
         with self._conn.cursor() as cur:
-            cur.execute(sql, (limit,))
+            cur.execute(sql, params)
             rows = cur.fetchall()
-        payloads: List[LLMPayload] = []
-        for row in rows:
-            payload_dict = json.loads(row["payload"])
-            tags = [
-                TagFragment(
-                    tag_code=item["tag_code"],
-                    tag_name_cn=item["tag_name_cn"],
-                    evidence=item["evidence"],
+        with METRICS.timer("json_decode_seconds", source="return_fact_llm"):
+            return [decode_payload(row["payload"]) for row in rows]
+
+    # ------------------------------------------------------------------
+    # Fact details stage
+    # ------------------------------------------------------------------
+    def insert_return_fact_details_bulk(self, payloads: Sequence[LLMPayload], batch_size: int = 500) -> int:
+        """Write detail rows for many payloads with a few multi-row statements per batch.
+
+        return_fact_details is a Unique Key table on (review_id, tag_code), so the
+        INSERT replaces existing rows in place. Only tags that disappeared since the
+        last parse are deleted, with at most one DELETE per batch (usually none).
+        """
+        written = 0
+        with self._conn.cursor() as cur:
+            for chunk in chunks(last_per_key(payloads, lambda p: p.review_id), batch_size):
+                rows = [row for payload in chunk for row in detail_rows(payload)]
+                new_keys = {(row[0], row[1]) for row in rows}
+                self._delete_stale_details(cur, [payload.review_id for payload in chunk], new_keys)
+                sql = f"INSERT INTO return_fact_details ({', '.join(DETAIL_COLUMNS)}) VALUES " + ",".join(
+                    ["(%s,%s,%s,%s,%s,%s,%s,%s)"] * len(rows)
                 )
-                for item in payload_dict.get("tags", [])
-            ]
-            payloads.append(
-                LLMPayload(
-                    review_id=payload_dict["review_id"],
-                    review_source=payload_dict["review_source"],
-                    review_en=payload_dict["review_en"],
-                    review_cn=payload_dict.get("review_cn", ""),
-                    sentiment=payload_dict.get("sentiment", 0),
-                    tags=tags,
+                cur.execute(sql, [value for row in rows for value in row])
+                written += len(rows)
+        return written
+
+    def delete_stale_fact_details(self, review_ids: Sequence[str], keep_keys: set) -> int:
+        """Delete detail rows of ``review_ids`` whose (review_id, tag_code) is not in ``keep_keys``."""
+        with self._conn.cursor() as cur:
+            return self._delete_stale_details(cur, review_ids, keep_keys)
+
+    def explode_return_fact_details(
+        self,
+        shard: Shard | None = None,
+        since: str | None = None,
+        review_id_from: str | None = None,
+        review_id_to: str | None = None,
+    ) -> Tuple[int, int]:
+        """Parse stored payloads into return_fact_details inside Doris.
+
+        One INSERT ... SELECT explodes ``$.tags`` of every return_fact_llm row in scope
+        (created_at >= ``since``, review_id in [``review_id_from``, ``review_id_to``],
+        ``shard``) with the same NO_TAG placeholder as ``detail_rows``.
+
+        Tags of the scope that are no longer in their payload are then found with one
+        anti-join, staged under a run id in ``STALE_DETAILS_TABLE`` and removed with
+        ``DELETE ... USING`` (Doris rejects subqueries in a DELETE's WHERE; the USING
+        form needs Doris 2.0+ and a merge-on-write Unique Key table, see
+        schema.sql/return_fact_details_stale.sql). Returns (rows written, stale rows deleted).
+        """
+        conditions, params = _payload_scope(shard, since, review_id_from, review_id_to, alias="l")
+        exploded = _EXPLODED_DETAILS.format(where=_where(conditions))
+        run_id = uuid.uuid4().hex
+        with self._conn.cursor() as cur:
+            written = cur.execute(
+                f"INSERT INTO return_fact_details ({', '.join(DETAIL_COLUMNS)}) {exploded}", params
+            )
+            stale = cur.execute(
+                f"""
+                INSERT INTO {STALE_DETAILS_TABLE} (run_id, review_id, tag_code)
+                SELECT %s, d.review_id, d.tag_code
+                FROM return_fact_details d
+                JOIN (SELECT l.review_id FROM return_fact_llm l {_where(conditions)}) p
+                    ON p.review_id = d.review_id
+                LEFT JOIN ({exploded}) x ON x.review_id = d.review_id AND x.tag_code = d.tag_code
+                WHERE x.review_id IS NULL
+                """,
+                [run_id] + params + params,
+            )
+            if stale:
+                cur.execute(
+                    f"""
+                    DELETE FROM return_fact_details USING {STALE_DETAILS_TABLE} s
+                    WHERE s.run_id = %s
+                      AND return_fact_details.review_id = s.review_id
+                      AND return_fact_details.tag_code = s.tag_code
+                    """,
+                    (run_id,),
                 )
+            cur.execute(f"DELETE FROM {STALE_DETAILS_TABLE} WHERE run_id = %s", (run_id,))
+        return written, stale
+
+    def payload_scope_summary(
+        self,
+        shard: Shard | None = None,
+        since: str | None = None,
+        review_id_from: str | None = None,
+        review_id_to: str | None = None,
+    ) -> Dict[str, Any]:
+        """Payload count and max(created_at) in scope; the latter is the next ``since``."""
+        conditions, params = _payload_scope(shard, since, review_id_from, review_id_to)
+        with self._conn.cursor() as cur:
+            cur.execute(
+                f"SELECT count(*) AS payloads, max(created_at) AS watermark FROM return_fact_llm "
+                f"{_where(conditions)}",
+                params,
             )
-        return payloads
+            row = cur.fetchall()[0]
+        return {"payloads": int(row["payloads"] or 0), "watermark": row["watermark"]}
+
+    def fetch_payload_review_ids(
+        self,
+        shard: Shard | None = None,
+        since: str | None = None,
+        review_id_from: str | None = None,
+        review_id_to: str | None = None,
+    ) -> List[str]:
+        conditions, params = _payload_scope(shard, since, review_id_from, review_id_to)
+        with self._conn.cursor() as cur:
+            cur.execute(f"SELECT review_id FROM return_fact_llm {_where(conditions)}", params)
+            return [row["review_id"] for row in cur.fetchall()]
+
+    def fetch_fact_details(self, review_ids: Sequence[str]) -> List[Tuple[Any, ...]]:
+        """return_fact_details rows of ``review_ids`` as ``detail_rows`` tuples."""
+        if not review_ids:
+            return []
+        with self._conn.cursor() as cur:
+            cur.execute(
+                f"SELECT {', '.join(DETAIL_COLUMNS)} FROM return_fact_details WHERE review_id IN ("
+                + ",".join(["%s"] * len(review_ids))
+                + ")",
+                list(review_ids),
+            )
+            return [tuple(row[column] for column in DETAIL_COLUMNS) for row in cur.fetchall()]
+
+    @staticmethod
+    def _delete_stale_details(cur, review_ids: Sequence[str], keep_keys: set) -> int:
+        if not review_ids:
+            return 0
+        cur.execute(
+            "SELECT review_id, tag_code FROM return_fact_details WHERE review_id IN ("
+            + ",".join(["%s"] * len(review_ids))
+            + ")",
+            list(review_ids),
+        )
+        stale = [
+            (row["review_id"], row["tag_code"])
+            for row in cur.fetchall()
+            if (row["review_id"], row["tag_code"]) not in keep_keys
+        ]
+        if stale:
+            cur.execute(
+                "DELETE FROM return_fact_details WHERE "
+                + " OR ".join(["(review_id = %s AND tag_code = %s)"] * len(stale)),
+                [value for key in stale for value in key],
+            )
+        return len(stale)
 
     # ------------------------------------------------------------------
-    # Fact details stage
+    # Status ledger
     # ------------------------------------------------------------------
-    def insert_return_fact_details(self, payload: LLMPayload) -> None:
+    def upsert_llm_status_bulk(
+        self,
+        entries: Sequence[Tuple[str, str]],
+        model: str = "",
+        prompt_fingerprint: str = "",
+        batch_size: int = 500,
+    ) -> int:
+        """Record (review_id, status) pairs in return_llm_status, bumping attempt_count
+        (except for UNCOUNTED_STATUSES such as transient request errors).
+
+        One INSERT ... SELECT per batch joins the new statuses against the current
+        ledger so the attempt counter increments without a read round trip.
+        """
+        written = 0
+        with self._conn.cursor() as cur:
+            for chunk in chunks(last_per_key(entries, lambda e: e[0]), batch_size):
+                values = " UNION ALL ".join(["SELECT %s AS review_id, %s AS status, %s AS counted"] * len(chunk))
+                sql = f"""
+                INSERT INTO return_llm_status
+                    (review_id, status, attempt_count, model, prompt_fingerprint, updated_at)
+                SELECT v.review_id, v.status, coalesce(s.attempt_count, 0) + v.counted, %s, %s, now()
+                FROM ({values}) v
+                LEFT JOIN return_llm_status s ON s.review_id = v.review_id
+                """
+                params: List[Any] = [model, prompt_fingerprint]
+                for review_id, status in chunk:
+                    params.extend((review_id, status, 0 if status in UNCOUNTED_STATUSES else 1))
+                cur.execute(sql, params)
+                written += len(chunk)
+        return written
+
+    def backfill_llm_status(self) -> int:
+        """One-shot: derive ledger rows for payloads stored before the ledger existed."""
         sql = """
-        INSERT INTO return_fact_details (
+        INSERT INTO return_llm_status
+            (review_id, status, attempt_count, model, prompt_fingerprint, updated_at)
+        SELECT
             review_id,
-            tag_code,
-            review_source,
-            review_en,
-            review_cn,
-            sentiment,
-            tag_name_cn,
-            evidence
-        )
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-        """
-        rows = []
-        if payload.tags:
-            rows = [
-                (
-                    payload.review_id,
-                    tag.tag_code,
-                    payload.review_source,
-                    payload.review_en,
-                    payload.review_cn,
-                    payload.sentiment,
-                    tag.tag_name_cn,
-                    tag.evidence,
-                )
-                for tag in payload.tags
-            ]
-        else:
-            # 无标签时也保留一行记录，tag_code 置为占位符，便于追踪空结果。
-            rows.append(
-                (
-                    payload.review_id,
-                    "NO_TAG",
-                    payload.review_source,
-                    payload.review_en,
-                    payload.review_cn,
-                    payload.sentiment,
-                    "",
-                    "",
-                )
-            )
+            CASE
+                WHEN coalesce(get_json_string(payload, '$.review_cn'), '') = '' THEN 'empty_cn'
+                WHEN coalesce(json_length(payload, '$.tags'), 0) = 0 THEN 'empty_tags'
+                ELSE 'ok'
+            END,
+            1, '', '', now()
+        FROM return_fact_llm
+        WHERE review_id NOT IN (SELECT review_id FROM return_llm_status)
+        """
+        with self._conn.cursor() as cur:
+            return cur.execute(sql)
+
+    def reset_llm_status_attempts(self, max_attempts: int) -> int:
+        """Zero attempt_count of empty/failed reviews that reached ``max_attempts``, so
+        the snapshot view offers them to the LLM again."""
+        sql = """
+        UPDATE return_llm_status
+        SET attempt_count = 0, updated_at = now()
+        WHERE status NOT IN ('ok', 'auto') AND attempt_count >= %s
+        """
         with self._conn.cursor() as cur:
-            # Remove existing tags for this review_id to simulate upsert behavior.
-            cur.execute("DELETE FROM return_fact_details WHERE review_id = %s", (payload.review_id,))
-            cur.executemany(sql, rows)
+            return cur.execute(sql, (max_attempts,))
 
     # ------------------------------------------------------------------
     # Dimension helpers
@@ -162,35 +477,463 @@ class DorisClient:
     def fetch_dim_tag_map(
         self, filters: List[Dict[str, Any]] | None = None
     ) -> Dict[str, Dict[str, str]]:
+        conditions, params = _dim_tag_conditions(filters)
+        sql = """
+        SELECT
+            tag_code,
+            tag_name_cn,
+            category_name_cn,
+            definition,
+            boundary_note
+        FROM return_dim_tag
+        WHERE is_active = 1
+        """ + "".join(f" AND {condition}" for condition in conditions)
         with self._conn.cursor() as cur:
-            sql = """
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+        return {row["tag_code"]: row for row in rows}
+
+    def probe_dim_tag(self, filters: List[Dict[str, Any]] | None = None) -> Dict[str, Any]:
+        """Cheap change probe over the filtered dimension, active or not: any insert,
+        (de)activation, version bump or updated_at change alters the result."""
+        conditions, params = _dim_tag_conditions(filters)
+        sql = """
+        SELECT
+            COUNT(*) AS tags,
+            SUM(is_active) AS active,
+            SUM(version) AS versions,
+            MAX(updated_at) AS updated_at
+        FROM return_dim_tag
+        """
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        with self._conn.cursor() as cur:
+            cur.execute(sql, params)
+            row = cur.fetchall()[0]
+        return {
+            "tags": int(row["tags"] or 0),
+            "active": int(row["active"] or 0),
+            "versions": int(row["versions"] or 0),
+            "updated_at": None if row["updated_at"] is None else str(row["updated_at"]),
+        }
+
+    def fetch_labelled_payloads(self, limit: int = 200_000) -> List[LLMPayload]:
+        """Rebuild LLM payloads from return_fact_details as classifier training data.
+
+        Rows the local classifier produced itself (ledger status ``auto``) are skipped
+        so the model never trains on its own output. At most ``limit`` detail rows are
+        read; a review cut off by the limit is dropped rather than half-labelled.
+        """
+        sql = """
+        SELECT d.review_id, d.review_source, d.review_en, d.review_cn, d.sentiment,
+               d.tag_code, d.tag_name_cn, d.evidence
+        FROM return_fact_details d
+        LEFT JOIN return_llm_status s ON s.review_id = d.review_id
+        WHERE s.status IS NULL OR s.status <> 'auto'
+        ORDER BY d.review_id
+        LIMIT %s
+        """
+        with self._conn.cursor() as cur:
+            cur.execute(sql, (limit,))
+            rows = cur.fetchall()
+        if len(rows) >= limit and rows:
+            last_id = rows[-1]["review_id"]
+            rows = [row for row in rows if row["review_id"] != last_id]
+        payloads: Dict[str, LLMPayload] = {}
+        for row in rows:
+            payload = payloads.get(row["review_id"])
+            if payload is None:
+                payload = LLMPayload(
+                    review_id=row["review_id"],
+                    review_source=row["review_source"],
+                    review_en=row["review_en"],
+                    review_cn=row["review_cn"] or "",
+                    sentiment=row["sentiment"] or 0,
+                    tags=[],
+                )
+                payloads[row["review_id"]] = payload
+            if row["tag_code"] != "NO_TAG":
+                payload.tags.append(TagFragment(row["tag_code"], row["tag_name_cn"] or "", row["evidence"] or ""))
+        return list(payloads.values())
+
+    def fetch_tag_evidence(self, per_tag: int = 200) -> List[Tuple[str, str, str]]:
+        """(review_id, tag_code, evidence) samples from return_fact_details, at most
+        ``per_tag`` per tag, used to give tags English vocabulary for retrieval."""
+        sql = """
+        SELECT review_id, tag_code, evidence
+        FROM (
             SELECT
+                review_id,
                 tag_code,
-                tag_name_cn,
-                category_name_cn,
-                definition,
-                boundary_note
-            FROM return_dim_tag
-            WHERE is_active = 1
-            """
-            params = []
-            if filters:
-                for f in filters:
-                    field = f.get("field")
-                    operator = f.get("operator", "eq").lower()
-                    value = f.get("value")
-                    if operator != "eq":
-                        raise ValueError(f"Unsupported operator: {operator}")
-                    if field == "applicable_scope":
-                        # Always include shared tags alongside the specific scope.
-                        sql += " AND (applicable_scope = %s OR applicable_scope = %s)"
-                        params.extend([value, "共享"])
-                    else:
-                        sql += f" AND {field} = %s"
-                        params.append(value)
+                evidence,
+                row_number() OVER (PARTITION BY tag_code ORDER BY review_id DESC) AS rn
+            FROM return_fact_details
+            WHERE tag_code <> 'NO_TAG' AND evidence IS NOT NULL AND evidence <> ''
+        ) t
+        WHERE rn <= %s
+        """
+        with self._conn.cursor() as cur:
+            cur.execute(sql, (per_tag,))
+            rows = cur.fetchall()
+        return [(row["review_id"], row["tag_code"], row["evidence"]) for row in rows]
+
+    # ------------------------------------------------------------------
+    # Tag rollups
+    # ------------------------------------------------------------------
+    def sync_review_attrs(
+        self, review_ids: Sequence[str] | None = None, since: str | None = None, batch_size: int = 500
+    ) -> int:
+        """Copy the attributes of ``review_ids`` (or of every parsed review, optionally
+        from ``since``, when None) from view_return_review_attr into return_review_attr.
+
+        The view unions external tables; filtering it by review_id here keeps each
+        parse batch from re-evaluating the whole union in the rollup queries.
+        """
+        insert = f"""
+        INSERT INTO {ROLLUP_ATTR_TABLE} (review_id, review_source, country, fasin, review_date, updated_at)
+        SELECT v.review_id, v.review_source, v.country, v.fasin, v.review_date, now()
+        FROM {ROLLUP_ATTR_VIEW} v
+        """
+        written = 0
+        with self._conn.cursor() as cur:
+            if review_ids is None:
+                sql = insert + " WHERE v.review_id IN (SELECT review_id FROM return_fact_details)"
+                params: List[Any] = []
+                if since:
+                    sql += " AND v.review_date >= %s"
+                    params.append(since)
+                return cur.execute(sql, params)
+            for chunk in chunks(sorted(set(review_ids)), batch_size):
+                written += cur.execute(
+                    insert + " WHERE v.review_id IN (" + ",".join(["%s"] * len(chunk)) + ")", chunk
+                )
+        return written
+
+    def rollup_groups(
+        self, review_ids: Sequence[str] | None = None, since: str | None = None
+    ) -> List[Tuple[str, str, str]]:
+        """(country, fasin, week_start) groups holding ``review_ids``, or every group
+        with parsed details (optionally from ``since``) when ``review_ids`` is None.
+        Reads return_review_attr; run ``sync_review_attrs`` for the same reviews first."""
+        sql = f"""
+        SELECT DISTINCT coalesce(a.country, '') AS country, coalesce(a.fasin, '') AS fasin,
+               to_monday(a.review_date) AS week_start
+        FROM {ROLLUP_ATTR_TABLE} a
+        """
+        params: List[Any] = []
+        if review_ids is None:
+            sql += " WHERE a.review_id IN (SELECT review_id FROM return_fact_details)"
+        elif not review_ids:
+            return []
+        else:
+            sql += " WHERE a.review_id IN (" + ",".join(["%s"] * len(review_ids)) + ")"
+            params.extend(review_ids)
+        sql += " AND a.review_date IS NOT NULL"
+        if since:
+            sql += " AND a.review_date >= %s"
+            params.append(since)
+        with self._conn.cursor() as cur:
             cur.execute(sql, params)
             rows = cur.fetchall()
-        return {row["tag_code"]: row for row in rows}
+        return [(row["country"], row["fasin"], str(row["week_start"])[:10]) for row in rows]
+
+    def rebuild_rollup_groups(self, groups: Sequence[Tuple[str, str, str]], batch_size: int = 200) -> int:
+        """Recompute both rollup tables for whole (country, fasin, week_start) groups.
+
+        A group's rows are deleted and re-aggregated from return_fact_details, so tags
+        that vanished on re-parse drop out. Cost follows the groups touched, not the
+        size of the detail table.
+        """
+        rebuilt = 0
+        with self._conn.cursor() as cur:
+            for chunk in chunks(sorted(set(groups)), batch_size):
+                delete_condition = " OR ".join(["(country = %s AND fasin = %s AND week_start = %s)"] * len(chunk))
+                delete_params = [value for group in chunk for value in group]
+                for table in ROLLUP_TABLES:
+                    cur.execute(f"DELETE FROM {table} WHERE {delete_condition}", delete_params)
+                condition = " OR ".join([_ROLLUP_GROUP] * len(chunk))
+                params: List[Any] = []
+                for country, fasin, week_start in chunk:
+                    params.extend((country, fasin, week_start, _next_week(week_start)))
+                cur.execute(
+                    f"""
+                    INSERT INTO return_tag_rollup_weekly
+                        (country, fasin, week_start, review_source, tag_code, tag_name_cn,
+                         category_name_cn, reviews, negative_reviews, updated_at)
+                    SELECT coalesce(a.country, ''), coalesce(a.fasin, ''), to_monday(a.review_date),
+                           d.review_source, d.tag_code, max(d.tag_name_cn), max(t.category_name_cn),
+                           count(DISTINCT d.review_id),
+                           count(DISTINCT CASE WHEN d.sentiment = -1 THEN d.review_id END), now()
+                    FROM return_fact_details d
+                    JOIN {ROLLUP_ATTR_TABLE} a ON a.review_id = d.review_id AND a.review_source = d.review_source
+                    LEFT JOIN (
+                        SELECT tag_code, max(category_name_cn) AS category_name_cn
+                        FROM return_dim_tag GROUP BY tag_code
+                    ) t ON t.tag_code = d.tag_code
+                    WHERE d.tag_code <> 'NO_TAG' AND ({condition})
+                    GROUP BY coalesce(a.country, ''), coalesce(a.fasin, ''), to_monday(a.review_date),
+                             d.review_source, d.tag_code
+                    """,
+                    params,
+                )
+                cur.execute(
+                    f"""
+                    INSERT INTO return_review_rollup_weekly
+                        (country, fasin, week_start, review_source, reviews, tagged_reviews,
+                         negative_reviews, updated_at)
+                    SELECT coalesce(a.country, ''), coalesce(a.fasin, ''), to_monday(a.review_date),
+                           d.review_source, count(DISTINCT d.review_id),
+                           count(DISTINCT CASE WHEN d.tag_code <> 'NO_TAG' THEN d.review_id END),
+                           count(DISTINCT CASE WHEN d.sentiment = -1 THEN d.review_id END), now()
+                    FROM return_fact_details d
+                    JOIN {ROLLUP_ATTR_TABLE} a ON a.review_id = d.review_id AND a.review_source = d.review_source
+                    WHERE {condition}
+                    GROUP BY coalesce(a.country, ''), coalesce(a.fasin, ''), to_monday(a.review_date),
+                             d.review_source
+                    """,
+                    params,
+                )
+                rebuilt += len(chunk)
+        return rebuilt
+
+    def refresh_tag_rollups(self, review_ids: Sequence[str], batch_size: int = 200) -> int:
+        """Bring the rollups up to date for freshly parsed ``review_ids``."""
+        self.sync_review_attrs(review_ids)
+        return self.rebuild_rollup_groups(self.rollup_groups(review_ids), batch_size=batch_size)
+
+    def rollup_top_tags(
+        self,
+        country: str | None = None,
+        fasin: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        review_source: int | None = None,
+        category: str | None = None,
+        by: str = "tag",
+        limit: int = 10,
+    ) -> List[Dict[str, Any]]:
+        """Most frequent tags (or categories) with their share of parsed reviews.
+
+        ``share`` is reviews carrying the tag / parsed reviews under the same filters;
+        with ``by="category"`` a review is counted once per matching tag.
+        """
+        if by not in ("tag", "category"):
+            raise ValueError(f"Unsupported rollup grouping: {by}")
+        conditions, params = _rollup_conditions(country, fasin, since, until, review_source)
+        tag_conditions = list(conditions)
+        tag_params = list(params)
+        if category:
+            tag_conditions.append("category_name_cn = %s")
+            tag_params.append(category)
+        if by == "tag":
+            columns = "tag_code, max(tag_name_cn) AS tag_name_cn, max(category_name_cn) AS category_name_cn"
+            group = "tag_code"
+        else:
+            columns = group = "category_name_cn"
+        sql = f"""
+        SELECT {columns}, sum(reviews) AS reviews, sum(negative_reviews) AS negative_reviews
+        FROM return_tag_rollup_weekly
+        {_where(tag_conditions)}
+        GROUP BY {group}
+        ORDER BY reviews DESC, {group}
+        LIMIT %s
+        """
+        with self._conn.cursor() as cur:
+            cur.execute(sql, tag_params + [limit])
+            rows = cur.fetchall()
+            cur.execute(
+                f"SELECT sum(reviews) AS reviews FROM return_review_rollup_weekly {_where(conditions)}", params
+            )
+            total = int(cur.fetchall()[0]["reviews"] or 0)
+        for row in rows:
+            row["reviews"] = int(row["reviews"])
+            row["negative_reviews"] = int(row["negative_reviews"])
+            row["share"] = row["reviews"] / total if total else 0.0
+        return rows
+
+    def rollup_tag_trend(
+        self,
+        tag_code: str | None = None,
+        category: str | None = None,
+        country: str | None = None,
+        fasin: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        review_source: int | None = None,
+    ) -> List[Dict[str, Any]]:
+        """Weekly reviews carrying ``tag_code`` (or any tag of ``category``; any tag at
+        all when neither is given) next to the parsed reviews of that week."""
+        conditions, params = _rollup_conditions(country, fasin, since, until, review_source)
+        tag_conditions = list(conditions)
+        tag_params = list(params)
+        if tag_code:
+            tag_conditions.append("tag_code = %s")
+            tag_params.append(tag_code)
+        if category:
+            tag_conditions.append("category_name_cn = %s")
+            tag_params.append(category)
+        hits: Dict[str, Dict[str, Any]] = {}
+        with self._conn.cursor() as cur:
+            if tag_code or category:
+                cur.execute(
+                    f"""
+                    SELECT week_start, sum(reviews) AS reviews, sum(negative_reviews) AS negative_reviews
+                    FROM return_tag_rollup_weekly {_where(tag_conditions)}
+                    GROUP BY week_start
+                    """,
+                    tag_params,
+                )
+                hits = {str(row["week_start"])[:10]: row for row in cur.fetchall()}
+            cur.execute(
+                f"""
+                SELECT week_start, sum(reviews) AS reviews, sum(tagged_reviews) AS tagged_reviews,
+                       sum(negative_reviews) AS negative_reviews
+                FROM return_review_rollup_weekly {_where(conditions)}
+                GROUP BY week_start
+                ORDER BY week_start
+                """,
+                params,
+            )
+            totals = cur.fetchall()
+        trend = []
+        for row in totals:
+            week_start = str(row["week_start"])[:10]
+            parsed = int(row["reviews"] or 0)
+            # Without a tag filter, count reviews with any tag once rather than per tag.
+            hit = hits.get(week_start, {}) if tag_code or category else {
+                "reviews": row["tagged_reviews"],
+                "negative_reviews": row["negative_reviews"],
+            }
+            reviews = int(hit.get("reviews") or 0)
+            trend.append(
+                {
+                    "week_start": week_start,
+                    "reviews": reviews,
+                    "negative_reviews": int(hit.get("negative_reviews") or 0),
+                    "parsed_reviews": parsed,
+                    "share": reviews / parsed if parsed else 0.0,
+                }
+            )
+        return trend
 
     def close(self) -> None:
         self._conn.close()
+
+
+def _dim_tag_conditions(filters: List[Dict[str, Any]] | None) -> Tuple[List[str], List[Any]]:
+    """SQL conditions for the tag filters from config/tag_filters.yaml."""
+    conditions: List[str] = []
+    params: List[Any] = []
+    for f in filters or []:
+        field = f.get("field")
+        operator = f.get("operator", "eq").lower()
+        value = f.get("value")
+        if operator != "eq":
+            raise ValueError(f"Unsupported operator: {operator}")
+        if field == "applicable_scope":
+            # Always include shared tags alongside the specific scope.
+            conditions.append("(applicable_scope = %s OR applicable_scope = %s)")
+            params.extend([value, "共享"])
+        else:
+            conditions.append(f"{field} = %s")
+            params.append(value)
+    return conditions, params
+
+
+def _rollup_conditions(
+    country: str | None,
+    fasin: str | None,
+    since: str | None,
+    until: str | None,
+    review_source: int | None,
+) -> Tuple[List[str], List[Any]]:
+    conditions: List[str] = []
+    params: List[Any] = []
+    for column, operator, value in (
+        ("country", "=", country),
+        ("fasin", "=", fasin),
+        ("week_start", ">=", since),
+        ("week_start", "<=", until),
+        ("review_source", "=", review_source),
+    ):
+        if value is not None and value != "":
+            conditions.append(f"{column} {operator} %s")
+            params.append(value)
+    return conditions, params
+
+
+def _payload_scope(
+    shard: Shard | None,
+    since: str | None,
+    review_id_from: str | None,
+    review_id_to: str | None,
+    alias: str = "",
+) -> Tuple[List[str], List[Any]]:
+    prefix = f"{alias}." if alias else ""
+    conditions: List[str] = []
+    params: List[Any] = []
+    if shard:
+        condition, params = shard.sql_condition(f"{prefix}review_id")
+        conditions.append(condition)
+    for column, operator, value in (
+        ("created_at", ">=", since),
+        ("review_id", ">=", review_id_from),
+        ("review_id", "<=", review_id_to),
+    ):
+        if value:
+            conditions.append(f"{prefix}{column} {operator} %s")
+            params.append(value)
+    return conditions, params
+
+
+def _where(conditions: Sequence[str]) -> str:
+    return "WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+def _next_week(week_start: str) -> str:
+    return (date.fromisoformat(week_start) + timedelta(days=7)).isoformat()
+
+
+def detail_rows(payload: LLMPayload) -> List[Tuple[Any, ...]]:
+    if payload.tags:
+        return [
+            (
+                payload.review_id,
+                tag.tag_code,
+                payload.review_source,
+                payload.review_en,
+                payload.review_cn,
+                payload.sentiment,
+                tag.tag_name_cn,
+                tag.evidence,
+            )
+            for tag in payload.tags
+        ]
+    # 无标签时也保留一行记录，tag_code 置为占位符，便于追踪空结果。
+    return [
+        (
+            payload.review_id,
+            "NO_TAG",
+            payload.review_source,
+            payload.review_en,
+            payload.review_cn,
+            payload.sentiment,
+            "",
+            "",
+        )
+    ]
+
+
+def last_per_key(items: Sequence[T], key) -> List[T]:
+    """Keep the last item per key: rows sharing a Unique Key in one load have no defined winner."""
+    latest: Dict[Any, T] = {}
+    for item in items:
+        latest.pop(key(item), None)
+        latest[key(item)] = item
+    return list(latest.values())
+
+
+def chunks(items: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    size = max(1, size)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
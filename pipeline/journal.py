@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import secrets
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from .codec import decode_payload, encode_payload, loads
+from .models import LLMPayload
+
+
+class RunJournal:
+    """Crash-safe record of an LLM run under ``<root>/<run_id>/``.
+
+    ``payloads.jsonl`` is appended as reviews complete and ``checkpoint.json`` is
+    rewritten atomically on every flush. Writes are buffered and flushed (with one
+    fsync) every ``flush_every`` payloads or ``flush_seconds``, so journaling costs
+    far less than one fsync per review. A torn last line from a crash is cut off
+    when the journal is opened; only ``resume`` reads the earlier review_ids back.
+    """
+
+    def __init__(
+        self,
+        root: Path | str,
+        run_id: str,
+        flush_every: int = 200,
+        flush_seconds: float = 5.0,
+        resume: bool = False,
+    ):
+        self.run_id = run_id
+        self._dir = Path(root) / run_id
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._journal_path = self._dir / "payloads.jsonl"
+        self._checkpoint_path = self._dir / "checkpoint.json"
+        self._flush_every = flush_every
+        self._flush_seconds = flush_seconds
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        self._checkpoint: Dict[str, Any] = self._read_checkpoint()
+        self._checkpoint["status"] = "running"
+        self._repair_tail()
+        self.completed: Set[str] = self._read_review_ids() if resume else set()
+        self._fp = self._journal_path.open("a", encoding="utf-8")
+
+    @staticmethod
+    def new_run_id() -> str:
+        return f"{datetime.now():%Y%m%d-%H%M%S}-{secrets.token_hex(2)}"
+
+    @property
+    def resume_key(self) -> Optional[tuple]:
+        key = self._checkpoint.get("resume_key")
+        return tuple(key) if key else None
+
+    def append(self, payload: LLMPayload) -> None:
+        self._buffer.append(encode_payload(payload) + "\n")
+        self.completed.add(payload.review_id)
+        if len(self._buffer) >= self._flush_every or time.monotonic() - self._last_flush >= self._flush_seconds:
+            self.flush()
+
+    def mark_resume_key(self, key: Optional[tuple]) -> None:
+        """Record that every candidate up to ``key`` (keyset order) has been handled."""
+        self._checkpoint["resume_key"] = list(key) if key else None
+        self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._fp.write("".join(self._buffer))
+            self._buffer.clear()
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._checkpoint.update(
+            run_id=self.run_id,
+            completed=len(self.completed),
+            updated_at=datetime.now().isoformat(timespec="seconds"),
+        )
+        tmp = self._checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._checkpoint, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self._checkpoint_path)
+        self._last_flush = time.monotonic()
+
+    def iter_payloads(self) -> Iterator[LLMPayload]:
+        if not self._journal_path.exists():
+            return
+        with self._journal_path.open("rb") as fp:
+            for line_no, line in enumerate(fp, start=1):
+                try:
+                    payload = decode_payload(line)
+                except ValueError:
+                    logging.warning("Ignoring torn journal line %d in %s", line_no, self._journal_path)
+                    continue
+                yield payload
+
+    def close(self, finished: bool = False) -> None:
+        self._checkpoint["status"] = "finished" if finished else "interrupted"
+        self.flush()
+        self._fp.close()
+
+    def _repair_tail(self, block_size: int = 64 * 1024) -> None:
+        """Cut a torn last line left by a crash so new appends start on a clean line.
+
+        Scans backwards from the end block by block, so only the torn line is read.
+        """
+        if not self._journal_path.exists():
+            return
+        with self._journal_path.open("rb+") as fp:
+            fp.seek(0, os.SEEK_END)
+            size = fp.tell()
+            if size == 0:
+                return
+            fp.seek(size - 1)
+            if fp.read(1) == b"\n":
+                return
+            keep = 0
+            end = size
+            while end > 0:
+                start = max(0, end - block_size)
+                fp.seek(start)
+                newline = fp.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    keep = start + newline + 1
+                    break
+                end = start
+            fp.truncate(keep)
+        logging.warning("Dropped %d bytes of torn journal tail in %s", size - keep, self._journal_path)
+
+    def _read_review_ids(self) -> Set[str]:
+        """review_ids already journaled, read line by line without building payloads."""
+        review_ids: Set[str] = set()
+        if not self._journal_path.exists():
+            return review_ids
+        with self._journal_path.open("rb") as fp:
+            for line_no, line in enumerate(fp, start=1):
+                try:
+                    review_ids.add(str(loads(line)["review_id"]))
+                except (ValueError, KeyError, TypeError):
+                    logging.warning("Ignoring unreadable journal line %d in %s", line_no, self._journal_path)
+        return review_ids
+
+    def _read_checkpoint(self) -> Dict[str, Any]:
+        if not self._checkpoint_path.exists():
+            return {}
+        return json.loads(self._checkpoint_path.read_text(encoding="utf-8"))
+
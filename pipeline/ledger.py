@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from .models import LLMPayload
+
+STATUS_OK = "ok"
+STATUS_EMPTY_TAGS = "empty_tags"
+STATUS_EMPTY_CN = "empty_cn"
+STATUS_FAILED = "failed"
+# The request failed for a transient reason (circuit open, timeout, 429/5xx after the
+# transport's retries). Re-selected like failed, but does not use up an attempt.
+STATUS_ERROR = "error"
+# Labelled locally, by the classifier fast path or from a near-duplicate review:
+# tags only, no translation. Not retried.
+STATUS_AUTO = "auto"
+# Statuses recorded without incrementing attempt_count.
+UNCOUNTED_STATUSES = frozenset({STATUS_ERROR})
+# view_return_review_snapshot re-selects empty/failed reviews while attempt_count is
+# below this. The view repeats it as a literal; test/check_ledger.py compares the two.
+MAX_ATTEMPTS = 3
+
+
+@dataclass
+class LedgerStamp:
+    """Who produced the annotations being recorded in return_llm_status."""
+
+    model: str = ""
+    prompt_fingerprint: str = ""
+
+
+def payload_status(payload: LLMPayload) -> str:
+    """Same buckets the snapshot view used to derive from payload LIKE patterns."""
+    if payload.annotator == "classifier":
+        return STATUS_AUTO
+    if payload.annotator == "dedup":
+        return STATUS_AUTO if payload.tags else STATUS_EMPTY_TAGS
+    if not payload.review_cn:
+        return STATUS_EMPTY_CN
+    if not payload.tags:
+        return STATUS_EMPTY_TAGS
+    return STATUS_OK
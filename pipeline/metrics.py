@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Upper bounds in seconds, shared by every histogram so snapshots merge bucket by bucket.
+BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def series(name: str, labels: Dict[str, object]) -> str:
+    """Prometheus series key, e.g. ``llm_requests_total{outcome="ok"}``."""
+    if not labels:
+        return name
+    inner = ",".join(f"{key}={_quote(value)}" for key, value in sorted(labels.items()))
+    return f"{name}{{{inner}}}"
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _quote(value: object) -> str:
+    return '"' + _escape(value) + '"'
+
+
+def _split(key: str) -> Tuple[str, str]:
+    name, _, rest = key.partition("{")
+    return name, rest[:-1] if rest else ""
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (``BUCKETS`` plus +Inf)."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate by linear interpolation inside the bucket holding the q-th sample."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else lower * 2 or 1.0
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return BUCKETS[-1]
+
+    def to_dict(self) -> Dict[str, object]:
+        p50, p95, p99 = (self.quantile(q) for q in (0.5, 0.95, 0.99))
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "p50": None if p50 is None else round(p50, 4),
+            "p95": None if p95 is None else round(p95, 4),
+            "p99": None if p99 is None else round(p99, 4),
+            "buckets": list(self.counts),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> "Histogram":
+        histogram = cls()
+        histogram.counts = list(data["buckets"])
+        histogram.total = float(data["sum"])
+        histogram.count = int(data["count"])
+        return histogram
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.count += other.count
+
+
+class Metrics:
+    """Thread-safe counters and latency histograms for one run.
+
+    The pipeline records into the module-level ``METRICS`` registry, the way it logs
+    through the root logger, so clients and steps need no extra plumbing. A snapshot
+    goes into the JSON run report; ``write_prometheus`` renders the node exporter
+    textfile format.
+    """
+
+    def __init__(self) -> None:
+        self._counters: Dict[str, float] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels: object) -> None:
+        key = series(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: object) -> None:
+        key = series(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels: object) -> Iterator[None]:
+        """Observe the wall time of the ``with`` body into histogram ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            return {
+                "counters": dict(sorted(self._counters.items())),
+                "histograms": {key: h.to_dict() for key, h in sorted(self._histograms.items())},
+            }
+
+    @staticmethod
+    def merge_snapshots(snapshots: Iterable[Dict[str, Dict[str, object]]]) -> Dict[str, Dict[str, object]]:
+        counters: Dict[str, float] = {}
+        histograms: Dict[str, Histogram] = {}
+        for snapshot in snapshots:
+            for key, value in (snapshot.get("counters") or {}).items():
+                counters[key] = counters.get(key, 0) + value
+            for key, data in (snapshot.get("histograms") or {}).items():
+                histogram = Histogram.from_dict(data)
+                if key in histograms:
+                    histograms[key].merge(histogram)
+                else:
+                    histograms[key] = histogram
+        return {
+            "counters": dict(sorted(counters.items())),
+            "histograms": {key: h.to_dict() for key, h in sorted(histograms.items())},
+        }
+
+
+METRICS = Metrics()
+
+
+def render_prometheus(
+    snapshot: Dict[str, Dict[str, object]],
+    prefix: str = "amz_return_",
+    extra_labels: Optional[Dict[str, object]] = None,
+) -> str:
+    """Prometheus text exposition format for a ``Metrics`` snapshot."""
+    extra = ",".join(f"{key}={_quote(value)}" for key, value in sorted((extra_labels or {}).items()))
+
+    def _key(name: str, labels: str, more: str = "") -> str:
+        parts = ",".join(part for part in (labels, extra, more) if part)
+        return f"{prefix}{name}{{{parts}}}" if parts else f"{prefix}{name}"
+
+    lines: List[str] = []
+    typed = set()
+    for key, value in snapshot.get("counters", {}).items():
+        name, labels = _split(key)
+        if name not in typed:
+            lines.append(f"# TYPE {prefix}{name} counter")
+            typed.add(name)
+        lines.append(f"{_key(name, labels)} {value:g}")
+    for key, data in snapshot.get("histograms", {}).items():
+        name, labels = _split(key)
+        if name not in typed:
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, count in zip(list(BUCKETS) + ["+Inf"], data["buckets"]):
+            cumulative += count
+            le = bound if isinstance(bound, str) else f"{bound:g}"
+            lines.append(f"{_key(name + '_bucket', labels, 'le=' + _quote(le))} {cumulative}")
+        lines.append(f"{_key(name + '_sum', labels)} {data['sum']:g}")
+        lines.append(f"{_key(name + '_count', labels)} {data['count']}")
+    lines.append(f"# TYPE {prefix}last_run_timestamp_seconds gauge")
+    lines.append(f"{_key('last_run_timestamp_seconds', '')} {time.time():.0f}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: Path, snapshot: Dict[str, Dict[str, object]], **kwargs: object) -> None:
+    """Write atomically: the textfile collector must never read a half-written file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(render_prometheus(snapshot, **kwargs), encoding="utf-8")
+    os.replace(tmp, path)
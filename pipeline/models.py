@@ -1,26 +1,34 @@
 from __future__ import annotations
 
-import json
+import sys
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 
-@dataclass
+# Slotted: a reparse can hold millions of these in memory at once.
+@dataclass(slots=True)
 class CandidateReview:
     review_id: str
     review_source: int
     review_en: str
+    # Populated by the paged reader; (review_date, review_id) is the keyset resume key.
+    review_date: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class TagFragment:
     tag_code: str
     tag_name_cn: str
     evidence: str
 
+    def __post_init__(self) -> None:
+        # A few hundred codes/names repeat across millions of tags; keep one copy of each.
+        self.tag_code = sys.intern(self.tag_code)
+        self.tag_name_cn = sys.intern(self.tag_name_cn)
 
-@dataclass
+
+@dataclass(slots=True)
 class LLMPayload:
     review_id: str
     review_source: int
@@ -28,26 +36,15 @@ class LLMPayload:
     review_cn: str
     sentiment: int
     tags: List[TagFragment]
+    # "llm" for DeepSeek output; the local classifier fast path sets "classifier", and
+    # near-duplicate members labelled from their group representative get "dedup".
+    annotator: str = "llm"
 
     def to_json(self) -> str:
-        return json.dumps(
-            {
-                "review_id": self.review_id,
-                "review_source": self.review_source,
-                "review_en": self.review_en,
-                "review_cn": self.review_cn,
-                "sentiment": self.sentiment,
-                "tags": [
-                    {
-                        "tag_code": tag.tag_code,
-                        "tag_name_cn": tag.tag_name_cn,
-                        "evidence": tag.evidence,
-                    }
-                    for tag in self.tags
-                ],
-            },
-            ensure_ascii=False,
-        )
+        # Deferred: the codec module imports this one.
+        from .codec import encode_payload
+
+        return encode_payload(self)
 
 
 @dataclass
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Set, Tuple
+
+try:  # Optional: only needed for .zst request logs.
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is an optional extra
+    zstandard = None
+
+from .codec import dumps, loads
+
+_COMPRESSIONS = (".gz", ".zst")
+
+
+def _split(path: Path) -> Tuple[Path, str, str]:
+    """``runs/requests.jsonl.gz`` -> (``runs/requests``, ``.jsonl``, ``.gz``)."""
+    name = path.name
+    compression = next((suffix for suffix in _COMPRESSIONS if name.endswith(suffix)), "")
+    name = name[: len(name) - len(compression)]
+    extension = ".jsonl" if name.endswith(".jsonl") else ""
+    return path.with_name(name[: len(name) - len(extension)]), extension, compression
+
+
+def _segments(path: Path) -> List[Tuple[int, Path]]:
+    prefix, extension, compression = _split(path)
+    pattern = re.compile(re.escape(prefix.name) + r"\.(\d{5})" + re.escape(extension + compression) + "$")
+    found = []
+    if prefix.parent.is_dir():
+        for candidate in prefix.parent.iterdir():
+            match = pattern.match(candidate.name)
+            if match:
+                found.append((int(match.group(1)), candidate))
+    return sorted(found)
+
+
+def segment_paths(path: Path) -> List[Path]:
+    """Existing segments of the log at ``path``, oldest first."""
+    return [segment for _, segment in _segments(path)]
+
+
+def _open_writer(raw: BinaryIO, compression: str) -> BinaryIO:
+    if compression == ".gz":
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+    if compression == ".zst":
+        if zstandard is None:
+            raise RuntimeError("zstd request logs need zstandard: pip install zstandard")
+        return zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+    return raw
+
+
+def _open_reader(path: Path) -> BinaryIO:
+    if path.name.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("zstd request logs need zstandard: pip install zstandard")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(path.open("rb"), closefd=True))
+    return path.open("rb")
+
+
+class RequestLog:
+    """Append-only log of the request bodies sent to DeepSeek.
+
+    The system message (instructions + tag library) is the bulk of every body and
+    rarely changes, so each distinct one is written once per segment as a
+    ``{"type": "system", "hash": ...}`` record and requests refer to it by hash.
+    Lines are buffered and written through gzip (``.gz``) or zstd (``.zst``) when the
+    path ends that way. A new segment ``<name>.NNNNN.jsonl[.gz]`` starts for every
+    ``RequestLog`` and whenever the current one reaches ``max_bytes`` on disk; each
+    segment carries its own system records, so old ones can be deleted freely.
+    Use ``iter_requests`` (or ``scripts.rehydrate_requests``) to get full bodies back.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = 256 * 1024 * 1024, buffer_bytes: int = 1024 * 1024):
+        self._path = path
+        self._prefix, self._extension, self._compression = _split(path)
+        self._max_bytes = max_bytes
+        self._buffer_bytes = buffer_bytes
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self._defined: Set[str] = set()
+        # id(system message) -> (message, hash); holding the message keeps its id() unique.
+        self._digests: Dict[int, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        existing = _segments(path)
+        self._index = existing[-1][0] if existing else 0
+        self.requests = 0
+        self._open_segment()
+
+    @property
+    def segment(self) -> Path:
+        return self._segment
+
+    def __call__(self, body: Dict[str, Any]) -> None:
+        self.write(body)
+
+    def write(self, body: Dict[str, Any]) -> None:
+        messages = []
+        systems = []
+        for message in body.get("messages") or []:
+            if message.get("role") == "system":
+                digest = self._digest(message["content"])
+                systems.append((digest, message["content"]))
+                messages.append({"role": "system", "ref": digest})
+            else:
+                messages.append(message)
+        line = dumps({"type": "request", "ts": round(time.time(), 3), "body": {**body, "messages": messages}})
+        with self._lock:
+            for digest, content in systems:
+                if digest not in self._defined:
+                    self._append(dumps({"type": "system", "hash": digest, "content": content}))
+                    self._defined.add(digest)
+            self._append(line)
+            self.requests += 1
+            if self._buffered >= self._buffer_bytes:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked(rotate=False)
+            self._close_segment()
+
+    def _digest(self, content: str) -> str:
+        cached = self._digests.get(id(content))
+        if cached is None or cached[0] is not content:
+            cached = (content, hashlib.sha256(content.encode("utf-8")).hexdigest()[:16])
+            self._digests[id(content)] = cached
+        return cached[1]
+
+    def _append(self, line: str) -> None:
+        self._buffer.append(line + "\n")
+        self._buffered += len(line) + 1
+
+    def _flush_locked(self, rotate: bool = True) -> None:
+        if self._buffer:
+            self._writer.write("".join(self._buffer).encode("utf-8"))
+            self._buffer.clear()
+            self._buffered = 0
+            self._writer.flush()
+        if rotate and self._raw.tell() >= self._max_bytes:
+            self._close_segment()
+            self._open_segment()
+
+    def _open_segment(self) -> None:
+        self._index += 1
+        self._segment = self._prefix.with_name(
+            f"{self._prefix.name}.{self._index:05d}{self._extension}{self._compression}"
+        )
+        self._segment.parent.mkdir(parents=True, exist_ok=True)
+        self._raw = self._segment.open("wb")
+        self._writer = _open_writer(self._raw, self._compression)
+        self._defined.clear()
+
+    def _close_segment(self) -> None:
+        if self._writer is not self._raw:
+            self._writer.close()
+        self._raw.close()
+
+
+def iter_requests(path: Path) -> Iterator[Dict[str, Any]]:
+    """Full request bodies from a log written by ``RequestLog``, in write order.
+
+    ``path`` is either the path given to ``RequestLog`` (all its segments are read) or
+    a single segment. Plain JSONL logs from before the compact format are passed through.
+    """
+    paths = segment_paths(path) if not path.exists() else [path]
+    for segment in paths:
+        systems: Dict[str, str] = {}
+        with _open_reader(segment) as fp:
+            for record in _records(fp, segment):
+                kind = record.get("type")
+                if kind == "system":
+                    systems[record["hash"]] = record["content"]
+                elif kind == "request":
+                    body = record["body"]
+                    body["messages"] = [
+                        {"role": "system", "content": systems[message["ref"]]} if "ref" in message else message
+                        for message in body.get("messages") or []
+                    ]
+                    yield body
+                else:
+                    yield record
+
+
+def _records(fp: BinaryIO, segment: Path) -> Iterator[Dict[str, Any]]:
+    # A segment cut short by a crash ends mid-line or without its compression trailer.
+    try:
+        for line in fp:
+            if line.strip():
+                yield loads(line)
+    except (EOFError, ValueError) as exc:
+        logging.warning("Request log %s ends early (%s); the rest of it is skipped", segment, exc)
+
+
+def request_review_ids(body: Dict[str, Any]) -> List[str]:
+    """review_ids carried in a request's user message (single or batch form)."""
+    for message in body.get("messages") or []:
+        if message.get("role") == "user":
+            try:
+                content = loads(message["content"])
+            except ValueError:
+                return []
+            items = content.get("reviews") if isinstance(content, dict) and "reviews" in content else [content]
+            return [str(item.get("review_id")) for item in items if isinstance(item, dict)]
+    return []
+
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+from .deepseek_client import UsageStats
+from .metrics import Metrics
+
+# Histograms summed into the "time by stage" log line.
+_TIMING_SERIES = (
+    "stage_seconds",
+    "llm_request_seconds",
+    "db_statement_seconds",
+    "stream_load_seconds",
+    "json_decode_seconds",
+    "streaming_chunk_seconds",
+)
+
+
+@dataclass
+class RunReport:
+    """Per-invocation summary written by ``--run-report`` and merged across shards."""
+
+    step: str
+    shard: str = ""
+    run_id: str = ""
+    candidates: int = 0
+    payloads: int = 0
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cache_hit_tokens: int = 0
+    wall_seconds: float = 0.0
+    # ``Metrics.snapshot()``: counters and latency histograms keyed by Prometheus series.
+    metrics: Dict[str, Any] = field(default_factory=dict)
+
+    def add_usage(self, usage: UsageStats) -> None:
+        self.requests += usage.requests
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.cache_hit_tokens += usage.cache_hit_tokens
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(asdict(self), ensure_ascii=False, indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "RunReport":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+    @classmethod
+    def merge(cls, reports: Iterable["RunReport"]) -> "RunReport":
+        """Sum the counters; shards run side by side, so wall time is the slowest one."""
+        reports = list(reports)
+        merged = cls(
+            step=",".join(sorted({report.step for report in reports})),
+            shard=",".join(report.shard for report in reports if report.shard),
+        )
+        merged.metrics = Metrics.merge_snapshots(report.metrics for report in reports)
+        for report in reports:
+            for f in fields(cls):
+                if f.name in ("step", "shard", "run_id", "metrics"):
+                    continue
+                if f.name == "wall_seconds":
+                    merged.wall_seconds = max(merged.wall_seconds, report.wall_seconds)
+                else:
+                    setattr(merged, f.name, getattr(merged, f.name) + getattr(report, f.name))
+        return merged
+
+    def log(self) -> None:
+        logging.info(
+            "Run report [%s%s]: %d candidates, %d payloads, %d requests, %d prompt tokens "
+            "(%d cache hit), %d completion tokens in %.1fs",
+            self.step,
+            f" shard {self.shard}" if self.shard else "",
+            self.candidates,
+            self.payloads,
+            self.requests,
+            self.prompt_tokens,
+            self.cache_hit_tokens,
+            self.completion_tokens,
+            self.wall_seconds,
+        )
+        stages = {
+            key: data["sum"]
+            for key, data in self.metrics.get("histograms", {}).items()
+            if key.startswith(_TIMING_SERIES)
+        }
+        if stages:
+            logging.info(
+                "Time by stage (overlaps under concurrency): %s",
+                ", ".join(f"{key} {seconds:.1f}s" for key, seconds in sorted(stages.items(), key=lambda kv: -kv[1])),
+            )
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import logging
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Sequence
+
+from .config import DeepSeekConfig
+from .deepseek_client import pack_batches
+from .models import CandidateReview
+
+_CJK = "\u3400-\u9fff\uf900-\ufaff"
+# Word pieces, single CJK characters, and individual punctuation marks.
+_TOKEN_PATTERN = re.compile(rf"[{_CJK}]|[^\s\W{_CJK}]+|[^\s\w]")
+_CJK_CHAR = re.compile(rf"[{_CJK}]")
+
+
+def count_tokens(text: str) -> int:
+    """Local BPE approximation: short words are one token, long words split every ~6
+    characters, CJK characters cost ~0.6 tokens and punctuation one each."""
+    total = 0.0
+    for piece in _TOKEN_PATTERN.findall(text):
+        if _CJK_CHAR.match(piece):
+            total += 0.6
+        elif piece[0].isalnum() or piece[0] == "_":
+            total += 1 + (len(piece) - 1) // 6
+        else:
+            total += 1
+    return math.ceil(total)
+
+
+@dataclass
+class TokenEstimate:
+    input_tokens: int
+    output_tokens: int
+
+    @property
+    def total(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
+@dataclass
+class TokenModel:
+    """Per-review token estimate. The response echoes review_en and adds a Chinese
+    translation plus tags, so output grows roughly twice as fast as the review."""
+
+    item_overhead: int = 20
+    output_ratio: float = 2.0
+    output_overhead: int = 100
+
+    def estimate(self, review: CandidateReview) -> TokenEstimate:
+        text_tokens = count_tokens(review.review_en)
+        return TokenEstimate(
+            input_tokens=text_tokens + self.item_overhead,
+            output_tokens=int(text_tokens * self.output_ratio) + self.output_overhead,
+        )
+
+
+class TokenRateLimiter:
+    """Token bucket over estimated tokens per minute, shared by the worker threads."""
+
+    def __init__(self, tokens_per_minute: int):
+        self._capacity = float(tokens_per_minute)
+        self._available = float(tokens_per_minute)
+        self._rate = tokens_per_minute / 60.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> float:
+        """Block until ``tokens`` fit in the current minute; returns the seconds waited.
+        A request larger than the whole budget waits for a full bucket."""
+        needed = min(float(tokens), self._capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._available = min(self._capacity, self._available + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._available >= needed:
+                    self._available -= needed
+                    return waited
+                delay = (needed - self._available) / self._rate
+            time.sleep(delay)
+            waited += delay
+
+
+@dataclass
+class RunPlan:
+    """Pre-run estimate of one LLM run, printed by ``--plan``."""
+
+    reviews: int = 0
+    deduplicated: int = 0
+    cached: int = 0
+    classified: int = 0
+    requests: int = 0
+    system_tokens: int = 0
+    input_tokens: int = 0
+    cached_input_tokens: int = 0
+    output_tokens: int = 0
+    request_seconds: float = 0.0
+
+    def add(self, other: "RunPlan") -> None:
+        for name in (
+            "reviews",
+            "deduplicated",
+            "cached",
+            "classified",
+            "requests",
+            "input_tokens",
+            "cached_input_tokens",
+            "output_tokens",
+            "request_seconds",
+        ):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.system_tokens = max(self.system_tokens, other.system_tokens)
+
+    def cost(self, input_price: float, cached_input_price: float, output_price: float) -> float:
+        """Prices are per million tokens; the repeated system prefix is billed as cache hits."""
+        miss = self.input_tokens - self.cached_input_tokens
+        return (
+            miss * input_price + self.cached_input_tokens * cached_input_price + self.output_tokens * output_price
+        ) / 1_000_000
+
+    def wall_seconds(self, concurrency: int, tokens_per_minute: int | None) -> float:
+        seconds = self.request_seconds / max(1, concurrency)
+        if tokens_per_minute:
+            seconds = max(seconds, 60.0 * (self.input_tokens + self.output_tokens) / tokens_per_minute)
+        return seconds
+
+    def log(self, config: DeepSeekConfig, concurrency: int, tokens_per_minute: int | None) -> None:
+        cost = self.cost(
+            config.input_price_per_million,
+            config.cached_input_price_per_million,
+            config.output_price_per_million,
+        )
+        logging.info(
+            "Plan: %d reviews (%d merged as duplicates, %d cached, %d auto-labelled locally) -> %d requests",
+            self.reviews,
+            self.deduplicated,
+            self.cached,
+            self.classified,
+            self.requests,
+        )
+        logging.info(
+            "Plan: ~%d input tokens (%d system prefix per request, ~%d prefix-cache hits), ~%d output tokens",
+            self.input_tokens,
+            self.system_tokens,
+            self.cached_input_tokens,
+            self.output_tokens,
+        )
+        logging.info(
+            "Plan: estimated cost %.4f %s, estimated time %.1f min (concurrency=%d, tokens/min=%s)",
+            cost,
+            config.price_currency,
+            self.wall_seconds(concurrency, tokens_per_minute) / 60,
+            concurrency,
+            tokens_per_minute or "unlimited",
+        )
+
+
+class TokenScheduler:
+    """Packs reviews into requests under a per-request token budget and paces requests
+    under a per-minute budget, using local estimates of input and output tokens."""
+
+    def __init__(
+        self,
+        max_batch_size: int = 1,
+        request_token_budget: int = 8000,
+        tokens_per_minute: int | None = None,
+        model: TokenModel | None = None,
+        latency_seconds: float = 1.5,
+        output_tokens_per_second: float = 40.0,
+    ):
+        self.max_batch_size = max(1, max_batch_size)
+        self.request_token_budget = request_token_budget
+        self.tokens_per_minute = tokens_per_minute
+        self.model = model or TokenModel()
+        self._latency = latency_seconds
+        self._output_rate = output_tokens_per_second
+        self._limiter = TokenRateLimiter(tokens_per_minute) if tokens_per_minute else None
+
+    def pack(self, reviews: Sequence[CandidateReview]) -> List[List[CandidateReview]]:
+        return pack_batches(
+            reviews,
+            self.max_batch_size,
+            self.request_token_budget,
+            cost=lambda review: self.model.estimate(review).total,
+        )
+
+    def request_tokens(self, batch: Sequence[CandidateReview], system_tokens: int) -> int:
+        return system_tokens + sum(self.model.estimate(review).total for review in batch)
+
+    def wait_for_budget(self, batch: Sequence[CandidateReview], system_tokens: int) -> None:
+        if self._limiter is None:
+            return
+        waited = self._limiter.acquire(self.request_tokens(batch, system_tokens))
+        if waited > 0.5:
+            logging.debug("Waited %.1fs for the per-minute token budget", waited)
+
+    def plan(self, batches: Sequence[Sequence[CandidateReview]], system_tokens: int) -> RunPlan:
+        plan = RunPlan(requests=len(batches), system_tokens=system_tokens)
+        for batch in batches:
+            estimates = [self.model.estimate(review) for review in batch]
+            output = sum(e.output_tokens for e in estimates)
+            plan.input_tokens += system_tokens + sum(e.input_tokens for e in estimates)
+            plan.output_tokens += output
+            plan.request_seconds += self._latency + output / self._output_rate
+        # The byte-identical system message is served from the prefix cache after the first call.
+        plan.cached_input_tokens = system_tokens * max(0, len(batches) - 1)
+        return plan
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import zlib
+from dataclasses import dataclass
+from typing import Any, List, Tuple
+
+
+def shard_of(review_id: str, count: int) -> int:
+    """Stable shard for ``review_id``; matches ``MOD(crc32(review_id), count)`` in Doris."""
+    return zlib.crc32(review_id.encode("utf-8")) % count
+
+
+@dataclass(frozen=True)
+class Shard:
+    """One slice ``index`` (0-based) of ``count`` disjoint partitions of review_id."""
+
+    index: int
+    count: int
+
+    def __post_init__(self) -> None:
+        if self.count < 1 or not 0 <= self.index < self.count:
+            raise ValueError(f"Invalid shard {self.index}/{self.count}: need 0 <= i < N")
+
+    @classmethod
+    def parse(cls, text: str) -> "Shard":
+        """Parse ``"i/N"`` as used by ``--shard``."""
+        try:
+            index, count = (int(part) for part in text.split("/"))
+        except ValueError:
+            raise ValueError(f"Expected --shard as 'i/N' (e.g. 0/4), got {text!r}") from None
+        return cls(index, count)
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def owns(self, review_id: str) -> bool:
+        return shard_of(review_id, self.count) == self.index
+
+    def sql_condition(self, column: str = "review_id") -> Tuple[str, List[Any]]:
+        return f"MOD(crc32({column}), %s) = %s", [self.count, self.index]
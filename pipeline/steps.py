@@ -1,84 +1,602 @@
 from __future__ import annotations
 
-import json
 import logging
-from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Protocol, Sequence, Tuple, TypeVar
 
-from .deepseek_client import DeepSeekClient
-from .doris_client import DorisClient
+from .annotation_cache import AnnotationCache
+from .concurrency import run_adaptive
+from .deepseek_client import (
+    DeepSeekClient,
+    is_congestion_error,
+    is_transient_error,
+    pack_batches,
+    prompt_fingerprint,
+    tag_library_fingerprint,
+)
+from .classifier import TagClassifier
+from .codec import payload_from_dict
+from .dedup import DuplicateGroup, expand_group_payload, group_duplicates
+from .doris_client import DorisClient, detail_rows
+from .journal import RunJournal
+from .ledger import MAX_ATTEMPTS, STATUS_ERROR, STATUS_FAILED, LedgerStamp, payload_status
+from .metrics import METRICS
 from .models import CandidateReview, LLMPayload
+from .request_log import RequestLog
+from .scheduler import RunPlan, TokenScheduler, count_tokens
+from .sharding import Shard
+from .tag_pruning import PruneEvaluation, TagPruner
+
+T = TypeVar("T")
+
+
+class PayloadWriter(Protocol):
+    """Write path shared by DorisClient (SQL) and StreamLoadWriter (HTTP Stream Load)."""
+
+    def upsert_return_fact_llm_bulk(self, payloads: Sequence[LLMPayload], batch_size: int = ...) -> int:
+        ...
+
+    def insert_return_fact_details_bulk(self, payloads: Sequence[LLMPayload], batch_size: int = ...) -> int:
+        ...
 
 
 def step_fetch_candidates(
-    doris: DorisClient, limit: int, country: str | None = None, fasin: str | None = None
+    doris: DorisClient,
+    limit: int,
+    country: str | None = None,
+    fasin: str | None = None,
+    shard: Shard | None = None,
 ) -> List[CandidateReview]:
-    candidates = doris.fetch_candidates(limit=limit, country=country, fasin=fasin)
+    candidates = doris.fetch_candidates(limit=limit, country=country, fasin=fasin, shard=shard)
     logging.info(
-        "Fetched %d candidates from view_return_review_snapshot (country=%s, fasin=%s)",
+        "Fetched %d candidates from view_return_review_snapshot (country=%s, fasin=%s, shard=%s)",
         len(candidates),
         country or "-",
         fasin or "-",
+        shard or "-",
     )
     return candidates
 
 
+def step_stream_candidates(
+    doris: DorisClient,
+    page_size: int,
+    limit: int | None = None,
+    country: str | None = None,
+    fasin: str | None = None,
+    after: tuple | None = None,
+    shard: Shard | None = None,
+) -> Iterator[List[CandidateReview]]:
+    total = 0
+    last_key = after
+    for page in doris.iter_candidates(
+        page_size=page_size, country=country, fasin=fasin, after=after, limit=limit, shard=shard
+    ):
+        total += len(page)
+        last_key = (page[-1].review_date, page[-1].review_id)
+        logging.info(
+            "Fetched page of %d candidates (%d total, resume key %s)",
+            len(page),
+            total,
+            format_resume_key(last_key),
+        )
+        yield page
+    logging.info(
+        "Finished paging view_return_review_snapshot: %d candidates; resume key %s",
+        total,
+        format_resume_key(last_key),
+    )
+
+
+def format_resume_key(key: tuple | None) -> str:
+    if key is None:
+        return "-"
+    review_date, review_id = key
+    return f"{review_date or ''},{review_id}"
+
+
+def parse_resume_key(text: str) -> tuple:
+    """Inverse of ``format_resume_key``: "2025-10-12 00:00:00,R384TSBX2ZQOS"."""
+    review_date, sep, review_id = text.rpartition(",")
+    if not sep or not review_id:
+        raise ValueError(f"Invalid resume key {text!r}; expected '<review_date>,<review_id>'")
+    return (review_date or None, review_id)
+
+
+def step_dedup_candidates(
+    candidates: Iterable[CandidateReview], threshold: float = 0.9
+) -> List[DuplicateGroup]:
+    reviews = list(candidates)
+    groups = group_duplicates(reviews, threshold=threshold)
+    logging.info(
+        "Collapsed %d candidates into %d groups (threshold=%.2f), saving %d LLM calls",
+        len(reviews),
+        len(groups),
+        threshold,
+        len(reviews) - len(groups),
+    )
+    return groups
+
+
 def step_call_llm(
     candidates: Iterable[CandidateReview],
     deepseek: DeepSeekClient,
     doris: DorisClient,
     tag_library: Dict[str, Dict[str, str]],
     prompt_text: Optional[str],
-    request_log_path: Optional[Path] = None,
+    request_log: Optional[RequestLog] = None,
     write_to_db: bool = True,
+    concurrency: int = 1,
+    batch_size: int = 1,
+    batch_token_budget: int = 4000,
+    cache: Optional[AnnotationCache] = None,
+    cache_only: bool = False,
+    dedup_threshold: Optional[float] = None,
+    write_batch_size: int = 500,
+    writer: Optional[PayloadWriter] = None,
+    journal: Optional[RunJournal] = None,
+    scheduler: Optional[TokenScheduler] = None,
+    pruner: Optional[TagPruner] = None,
+    classifier: Optional[TagClassifier] = None,
+    failures: Optional[List[Tuple[str, str]]] = None,
 ) -> List[LLMPayload]:
+    """Annotate ``candidates``; reviews that got no annotation despite being sent to
+    the LLM are appended to ``failures`` as (review_id, status) when given, and
+    recorded in return_llm_status when ``write_to_db``. The status is ``error`` when
+    the request failed for a transient reason, which does not use up an attempt,
+    and ``failed`` otherwise."""
     if not tag_library:
         raise ValueError("tag_library is empty; fetch return_dim_tag before calling LLM.")
-    payloads: List[LLMPayload] = []
-    log_fp = None
-    if request_log_path:
-        request_log_path.parent.mkdir(parents=True, exist_ok=True)
-        log_fp = request_log_path.open("a", encoding="utf-8")
+    reviews = list(candidates)
+    if journal is not None:
+        before = len(reviews)
+        reviews = [review for review in reviews if review.review_id not in journal.completed]
+        if before != len(reviews):
+            logging.info("Run %s: skipping %d reviews already journaled", journal.run_id, before - len(reviews))
+    if dedup_threshold is not None:
+        with METRICS.timer("stage_seconds", stage="dedup"):
+            groups = step_dedup_candidates(reviews, dedup_threshold)
+    else:
+        groups = [DuplicateGroup(representative=review, members=[review]) for review in reviews]
+    position_of = {id(review): position for position, review in enumerate(reviews)}
+    final: List[Optional[LLMPayload]] = [None] * len(reviews)
+    resolved: List[Optional[LLMPayload]] = [None] * len(groups)
+    writer = writer or doris
+    write_buffer: List[LLMPayload] = []
+    stored = 0
 
-        def _logger(body: Dict[str, object]) -> None:
-            log_fp.write(json.dumps(body, ensure_ascii=False) + "\n")
+    stamp = LedgerStamp(deepseek.model, prompt_fingerprint(prompt_text, tag_library))
 
-    else:
-        _logger = None
+    def _flush() -> None:
+        nonlocal stored
+        if write_buffer:
+            with METRICS.timer("stage_seconds", stage="write_raw"):
+                stored += writer.upsert_return_fact_llm_bulk(write_buffer, batch_size=write_batch_size)
+                record_status(doris, write_buffer, stamp, batch_size=write_batch_size)
+            write_buffer.clear()
+
+    def _emit(group_index: int, payload: LLMPayload) -> None:
+        resolved[group_index] = payload
+        group = groups[group_index]
+        for member in group.members:
+            member_payload = payload if member is group.representative else expand_group_payload(payload, member)
+            final[position_of[id(member)]] = member_payload
+            if journal is not None:
+                journal.append(member_payload)
+            if write_to_db:
+                write_buffer.append(member_payload)
+        if len(write_buffer) >= write_batch_size:
+            _flush()
+
+    cache_keys: List[str] = []
+    if cache is not None:
+        cache_started = time.perf_counter()
+        fingerprint = tag_library_fingerprint(tag_library)
+        if pruner is not None:
+            fingerprint += pruner.signature
+        batch_mode = (scheduler.max_batch_size if scheduler is not None else batch_size) > 1
+        cache_keys = [
+            AnnotationCache.make_key(
+                group.representative.review_en, prompt_text or "", deepseek.model, fingerprint, batch_mode
+            )
+            for group in groups
+        ]
+        for index, group in enumerate(groups):
+            cached = cache.get(cache_keys[index])
+            if cached is not None:
+                review = group.representative
+                # Content-addressed: the same text may belong to another review_id.
+                cached.update(
+                    review_id=review.review_id,
+                    review_source=review.review_source,
+                    review_en=review.review_en,
+                )
+                _emit(index, payload_from_dict(cached, review))
+        METRICS.observe("stage_seconds", time.perf_counter() - cache_started, stage="cache")
+    pending = [index for index, payload in enumerate(resolved) if payload is None]
+    if cache is not None:
+        logging.info("Annotation cache: %d hits, %d misses", len(groups) - len(pending), len(pending))
+        METRICS.inc("annotations_total", len(groups) - len(pending), source="cache")
+    if classifier is not None and pending:
+        with METRICS.timer("stage_seconds", stage="classifier"):
+            predictions = classifier.predict([groups[index].representative for index in pending], tag_library)
+        for group_index, payload in zip(pending, predictions):
+            if payload is not None:
+                _emit(group_index, payload)
+        before = len(pending)
+        pending = [index for index in pending if resolved[index] is None]
+        METRICS.inc("annotations_total", before - len(pending), source="classifier")
+        logging.info(
+            "Local classifier auto-labelled %d of %d reviews; %d left for DeepSeek",
+            before - len(pending),
+            before,
+            len(pending),
+        )
+    if cache_only and pending:
+        logging.info("--cache-only: skipping %d reviews without a cached annotation", len(pending))
+        pending = []
+
+    usage_before = deepseek.usage_snapshot()
+    runs = _library_runs(groups, pending, tag_library, pruner)
+    # Packing follows the run order, so pending must too for the offsets below.
+    pending = [index for _, indices in runs for index in indices]
+    batches: List[List[CandidateReview]] = []
+    library_of: Dict[int, Dict[str, Dict[str, str]]] = {}
+    system_tokens: Dict[Tuple[int, bool], int] = {}
+    for library, indices in runs:
+        representatives = [groups[index].representative for index in indices]
+        if scheduler is not None:
+            packed = scheduler.pack(representatives)
+            for batched_request in (False, True):
+                system_tokens[(id(library), batched_request)] = count_tokens(
+                    deepseek.system_message(library, prompt_text, batch=batched_request)
+                )
+        else:
+            packed = pack_batches(representatives, max(1, batch_size), batch_token_budget)
+        for batch in packed:
+            library_of[id(batch)] = library
+        batches.extend(packed)
+    batch_offsets: List[int] = []
+    offset = 0
+    for batch in batches:
+        batch_offsets.append(offset)
+        offset += len(batch)
+    if len(batches) != len(pending):
+        logging.info("Packed %d reviews into %d requests", len(pending), len(batches))
+
+    transient: set = set()
+
+    def _annotate(batch: List[CandidateReview]) -> List[Optional[LLMPayload]]:
+        try:
+            return deepseek.annotate_batch(batch, library_of[id(batch)], prompt_text, on_request=request_log)
+        except Exception as exc:
+            if is_transient_error(exc):
+                transient.update(review.review_id for review in batch)
+            raise
+
+    def _wait_for_budget(batch: List[CandidateReview]) -> None:
+        # Runs before the limiter slot is taken, so a budget wait never reads as API latency.
+        scheduler.wait_for_budget(batch, system_tokens[(id(library_of[id(batch)]), len(batch) > 1)])
 
-    for review in candidates:
-        payload = deepseek.annotate(review, tag_library, prompt_text, on_request=_logger)
+    def _on_result(batch_index: int, batch_payloads: Optional[List[Optional[LLMPayload]]]) -> None:
+        # Runs on the calling thread, so the Doris connection and cache are never shared.
+        if batch_payloads is None:
+            return
+        start = batch_offsets[batch_index]
+        for group_index, payload in zip(pending[start : start + len(batch_payloads)], batch_payloads):
+            if payload is None:
+                continue
+            if cache is not None:
+                cache.put(cache_keys[group_index], payload)
+            _emit(group_index, payload)
+
+    try:
+        # Includes the raw writes flushed from _on_result; write_raw is also timed on its own.
+        with METRICS.timer("stage_seconds", stage="llm"):
+            run_adaptive(
+                batches,
+                _annotate,
+                max_concurrency=concurrency,
+                is_congestion=is_congestion_error,
+                # HttpTransport already retries 429/5xx/timeouts with Retry-After aware
+                # backoff; retrying here too multiplied the attempts per item. The limiter
+                # still sees the final congestion error and the retry-inflated latency.
+                max_retries=0,
+                on_result=_on_result,
+                before=_wait_for_budget if scheduler is not None else None,
+                describe=lambda batch: (
+                    f"review {batch[0].review_id}"
+                    if len(batch) == 1
+                    else f"batch of {len(batch)} starting at review {batch[0].review_id}"
+                ),
+            )
+    finally:
+        if request_log is not None:
+            request_log.flush()
+        if cache is not None:
+            cache.commit()
         if write_to_db:
-            doris.upsert_return_fact_llm(payload)
-        payloads.append(payload)
+            _flush()
+        if journal is not None:
+            journal.flush()
+    payloads = [payload for payload in final if payload is not None]
+    unresolved = sum(1 for group_index in pending if resolved[group_index] is None)
+    METRICS.inc("annotations_total", len(pending) - unresolved, source="llm")
+    METRICS.inc("annotations_total", unresolved, source="failed")
 
+    unannotated = [
+        (
+            member.review_id,
+            STATUS_ERROR if groups[group_index].representative.review_id in transient else STATUS_FAILED,
+        )
+        for group_index in pending
+        if resolved[group_index] is None
+        for member in groups[group_index].members
+    ]
+    if failures is not None:
+        failures.extend(unannotated)
+    if write_to_db and unannotated:
+        doris.upsert_llm_status_bulk(
+            unannotated,
+            stamp.model,
+            stamp.prompt_fingerprint,
+            batch_size=write_batch_size,
+        )
+    failed = len(reviews) - len(payloads)
+    if failed:
+        logging.warning("%d of %d reviews have no annotation and were skipped", failed, len(reviews))
     if write_to_db:
-        logging.info("Stored %d payloads into return_fact_llm", len(payloads))
-    if log_fp:
-        log_fp.close()
+        logging.info("Stored %d payloads into return_fact_llm", stored)
+    usage = deepseek.usage_snapshot() - usage_before
+    logging.info(
+        "DeepSeek usage: %d requests, %d prompt tokens (%d cache hit, %.1f%%), %d completion tokens",
+        usage.requests,
+        usage.prompt_tokens,
+        usage.cache_hit_tokens,
+        usage.cache_hit_rate * 100,
+        usage.completion_tokens,
+    )
     return payloads
 
 
+def step_plan_llm(
+    candidates: Iterable[CandidateReview],
+    deepseek: DeepSeekClient,
+    tag_library: Dict[str, Dict[str, str]],
+    prompt_text: Optional[str],
+    scheduler: TokenScheduler,
+    cache: Optional[AnnotationCache] = None,
+    dedup_threshold: Optional[float] = None,
+    pruner: Optional[TagPruner] = None,
+    classifier: Optional[TagClassifier] = None,
+) -> RunPlan:
+    """Dry run of ``step_call_llm``: same dedup, cache lookup and packing, no API call."""
+    reviews = list(candidates)
+    if dedup_threshold is not None:
+        groups = group_duplicates(reviews, threshold=dedup_threshold)
+    else:
+        groups = [DuplicateGroup(representative=review, members=[review]) for review in reviews]
+    pending = list(range(len(groups)))
+    if cache is not None:
+        fingerprint = tag_library_fingerprint(tag_library)
+        if pruner is not None:
+            fingerprint += pruner.signature
+        pending = [
+            index
+            for index in pending
+            if not cache.contains(
+                AnnotationCache.make_key(
+                    groups[index].representative.review_en,
+                    prompt_text or "",
+                    deepseek.model,
+                    fingerprint,
+                    scheduler.max_batch_size > 1,
+                )
+            )
+        ]
+    cached = len(groups) - len(pending)
+    classified = 0
+    if classifier is not None and pending:
+        predictions = classifier.predict([groups[index].representative for index in pending], tag_library)
+        classified = sum(payload is not None for payload in predictions)
+        pending = [index for index, payload in zip(pending, predictions) if payload is None]
+    plan = RunPlan()
+    for library, indices in _library_runs(groups, pending, tag_library, pruner):
+        batches = scheduler.pack([groups[index].representative for index in indices])
+        system_tokens = count_tokens(
+            deepseek.system_message(library, prompt_text, batch=scheduler.max_batch_size > 1)
+        )
+        plan.add(scheduler.plan(batches, system_tokens))
+    plan.reviews = len(reviews)
+    plan.deduplicated = len(reviews) - len(groups)
+    plan.cached = cached
+    plan.classified = classified
+    return plan
+
+
+def _library_runs(
+    groups: Sequence[DuplicateGroup],
+    pending: Sequence[int],
+    tag_library: Dict[str, Dict[str, str]],
+    pruner: Optional[TagPruner],
+) -> List[Tuple[Dict[str, Dict[str, str]], List[int]]]:
+    """Split pending groups by the (possibly pruned) tag library their prompt carries;
+    one request shares one library, so only reviews in the same run are packed together."""
+    if pruner is None or not pending:
+        return [(tag_library, list(pending))]
+    runs: Dict[int, Tuple[Dict[str, Dict[str, str]], List[int]]] = {}
+    for index in pending:
+        library = pruner.prune(groups[index].representative.review_en)
+        runs.setdefault(id(library), (library, []))[1].append(index)
+    logging.info(
+        "Tag pruning: %d reviews over %d distinct libraries, mean %.1f of %d tags per prompt",
+        len(pending),
+        len(runs),
+        sum(len(library) * len(indices) for library, indices in runs.values()) / len(pending),
+        len(tag_library),
+    )
+    return list(runs.values())
+
+
+def step_evaluate_pruning(pruner: TagPruner, payloads: Sequence[LLMPayload]) -> PruneEvaluation:
+    result = pruner.evaluate(payloads)
+    logging.info(
+        "Pruning eval (top_k=%d, margin=%.2f) over %d reviews: tag recall %.2f%% (%d of %d assigned tags dropped), "
+        "%.2f%% of reviews keep all their tags",
+        pruner.top_k,
+        pruner.margin,
+        result.reviews,
+        result.tag_recall * 100,
+        result.dropped_tags,
+        result.assigned_tags,
+        result.review_recall * 100,
+    )
+    logging.info(
+        "Pruning eval: mean %.1f of %d tags per prompt",
+        result.mean_pruned_size,
+        result.library_size,
+    )
+    return result
+
+
 def step_parse_payloads(
     doris: DorisClient,
     payloads: Iterable[LLMPayload] | None = None,
     limit_from_db: int = 200,
-) -> None:
+    batch_size: int = 500,
+    writer: Optional[PayloadWriter] = None,
+    shard: Shard | None = None,
+    refresh_rollups: bool = False,
+) -> int:
+    writer = writer or doris
     if payloads is None:
-        payloads = doris.fetch_payloads(limit=limit_from_db)
+        payloads = doris.fetch_payloads(limit=limit_from_db, shard=shard)
         logging.info("Fetched %d payloads from return_fact_llm", len(payloads))
     count = 0
-    for payload in payloads:
-        doris.insert_return_fact_details(payload)
-        count += 1
-    logging.info("Inserted/updated %d rows into return_fact_details", count)
+    rows = 0
+    groups = 0
+    for batch in batched(payloads, batch_size):
+        with METRICS.timer("stage_seconds", stage="write_details"):
+            rows += writer.insert_return_fact_details_bulk(batch, batch_size=batch_size)
+        if refresh_rollups:
+            groups += step_refresh_rollups(doris, batch)
+        count += len(batch)
+    logging.info("Inserted/updated %d rows for %d payloads into return_fact_details", rows, count)
+    if refresh_rollups:
+        logging.info("Refreshed %d rollup groups", groups)
+    return count
+
+
+def step_parse_pushdown(
+    doris: DorisClient,
+    shard: Shard | None = None,
+    since: str | None = None,
+    review_id_from: str | None = None,
+    review_id_to: str | None = None,
+    refresh_rollups: bool = False,
+    verify_sample: int = 0,
+    batch_size: int = 500,
+) -> int:
+    """Parse every stored payload in scope inside Doris instead of round-tripping it.
+
+    ``verify_sample`` payloads of the scope are then re-parsed by the Python path and
+    compared with what Doris wrote.
+    """
+    scope = dict(shard=shard, since=since, review_id_from=review_id_from, review_id_to=review_id_to)
+    # Taken before the write: payloads stored meanwhile are picked up by the next run.
+    summary = doris.payload_scope_summary(**scope)
+    with METRICS.timer("stage_seconds", stage="write_details"):
+        written, deleted = doris.explode_return_fact_details(**scope)
+    logging.info(
+        "Exploded %d payloads into %d return_fact_details rows inside Doris (%d stale rows deleted)",
+        summary["payloads"],
+        written,
+        deleted,
+    )
+    if summary["watermark"] is not None:
+        logging.info("Next incremental parse: --parse-since '%s'", summary["watermark"])
+    if refresh_rollups:
+        review_ids = doris.fetch_payload_review_ids(**scope)
+        with METRICS.timer("stage_seconds", stage="rollup"):
+            groups = sum(doris.refresh_tag_rollups(batch) for batch in batched(review_ids, batch_size))
+        logging.info("Refreshed %d rollup groups", groups)
+    if verify_sample:
+        step_verify_details(doris, doris.fetch_payloads(limit=verify_sample, **scope))
+    return summary["payloads"]
+
+
+def step_verify_details(doris: DorisClient, payloads: Sequence[LLMPayload]) -> int:
+    """Compare return_fact_details with the rows the Python parse path derives from
+    ``payloads``; returns the number of (review_id, tag_code) keys that differ."""
+    expected = {row[:2]: row for payload in payloads for row in detail_rows(payload)}
+    actual = {row[:2]: row for row in doris.fetch_fact_details([payload.review_id for payload in payloads])}
+
+    def _text(row: Tuple | None) -> Tuple | None:
+        return None if row is None else tuple("" if value is None else str(value) for value in row)
+
+    mismatched = sorted(
+        key for key in expected.keys() | actual.keys() if _text(expected.get(key)) != _text(actual.get(key))
+    )
+    if mismatched:
+        logging.warning(
+            "return_fact_details differs from the Python parse for %d of %d keys, e.g. %s",
+            len(mismatched),
+            len(expected),
+            ", ".join(f"{review_id}/{tag_code}" for review_id, tag_code in mismatched[:5]),
+        )
+    else:
+        logging.info("return_fact_details matches the Python parse for %d sampled payloads", len(payloads))
+    return len(mismatched)
+
+
+def step_refresh_rollups(doris: DorisClient, payloads: Sequence[LLMPayload]) -> int:
+    """Re-aggregate the tag rollup groups touched by freshly parsed ``payloads``."""
+    with METRICS.timer("stage_seconds", stage="rollup"):
+        return doris.refresh_tag_rollups([payload.review_id for payload in payloads])
 
 
 def step_write_raw_from_cache(
-    doris: DorisClient, payloads: Iterable[LLMPayload]
-) -> None:
+    doris: DorisClient,
+    payloads: Iterable[LLMPayload],
+    batch_size: int = 500,
+    writer: Optional[PayloadWriter] = None,
+    stamp: Optional[LedgerStamp] = None,
+) -> int:
+    writer = writer or doris
     count = 0
-    for payload in payloads:
-        doris.upsert_return_fact_llm(payload)
-        count += 1
+    for batch in batched(payloads, batch_size):
+        count += writer.upsert_return_fact_llm_bulk(batch, batch_size=batch_size)
+        record_status(doris, batch, stamp or LedgerStamp(), batch_size=batch_size)
     logging.info("Upserted %d payloads into return_fact_llm from cache", count)
+    return count
+
+
+def record_status(
+    doris: DorisClient, payloads: Sequence[LLMPayload], stamp: LedgerStamp, batch_size: int = 500
+) -> int:
+    """Mirror freshly written return_fact_llm rows into the return_llm_status ledger."""
+    return doris.upsert_llm_status_bulk(
+        [(payload.review_id, payload_status(payload)) for payload in payloads],
+        stamp.model,
+        stamp.prompt_fingerprint,
+        batch_size=batch_size,
+    )
+
+
+def step_backfill_status(doris: DorisClient, reset_attempts: bool = False) -> None:
+    count = doris.backfill_llm_status()
+    logging.info("Backfilled %d rows into return_llm_status from return_fact_llm", count)
+    if reset_attempts:
+        count = doris.reset_llm_status_attempts(MAX_ATTEMPTS)
+        logging.info("Reset attempt_count of %d empty/failed reviews that reached %d attempts", count, MAX_ATTEMPTS)
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    batch: List[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import urljoin
+
+import requests
+
+from .codec import dumps_bytes, encode_payload
+from .config import DorisConfig
+from .doris_client import DETAIL_COLUMNS, DorisClient, chunks, detail_rows, last_per_key
+from .metrics import METRICS
+from .models import LLMPayload
+
+# "Publish Timeout" means the data is committed but not yet visible; Doris will publish it.
+_OK_STATUSES = {"Success", "Publish Timeout"}
+
+
+class StreamLoadError(RuntimeError):
+    """Raised when Doris rejects a Stream Load batch."""
+
+
+class StreamLoadWriter:
+    """Writes return_fact_llm / return_fact_details through Doris HTTP Stream Load.
+
+    Each batch is shipped as a JSON array under a label derived from ``label_scope``
+    (the run id) and the content hash. Retries, and a resumed run re-sending a batch
+    it had already committed before a crash, reproduce the label, so Doris
+    deduplicates them server-side; a new run gets new labels, so loading the same
+    content again (e.g. rows rewritten back after a change) is not dropped.
+    Exposes the same bulk methods as ``DorisClient`` and can be swapped in for it
+    on the write path.
+    """
+
+    def __init__(
+        self,
+        config: DorisConfig,
+        base_url: Optional[str] = None,
+        doris: Optional[DorisClient] = None,
+        timeout: int = 600,
+        max_retries: int = 3,
+        label_prefix: str = "amz_return",
+        label_scope: str = "",
+    ):
+        self._base_url = (base_url or f"http://{config.host}:{config.http_port}").rstrip("/")
+        self._database = config.database
+        self._auth = (config.username, config.password)
+        self._doris = doris
+        self._timeout = timeout
+        self._max_retries = max_retries
+        self._label_prefix = label_prefix
+        # Labels allow [-_A-Za-z0-9:] and at most 128 characters.
+        self._label_scope = re.sub(r"[^-_A-Za-z0-9:]", "_", label_scope)[:48]
+        self._session = requests.Session()
+
+    def upsert_return_fact_llm_bulk(self, payloads: Sequence[LLMPayload], batch_size: int = 5000) -> int:
+        written = 0
+        for chunk in chunks(last_per_key(payloads, lambda p: p.review_id), batch_size):
+            rows = [{"review_id": payload.review_id, "payload": encode_payload(payload)} for payload in chunk]
+            self.load("return_fact_llm", ["review_id", "payload"], rows)
+            written += len(rows)
+        return written
+
+    def insert_return_fact_details_bulk(self, payloads: Sequence[LLMPayload], batch_size: int = 5000) -> int:
+        """Stream Load replaces rows by Unique Key; tags that vanished since the last
+        parse are removed through the SQL client when one is attached."""
+        written = 0
+        for chunk in chunks(last_per_key(payloads, lambda p: p.review_id), batch_size):
+            rows = [dict(zip(DETAIL_COLUMNS, row)) for payload in chunk for row in detail_rows(payload)]
+            if self._doris is not None:
+                self._doris.delete_stale_fact_details(
+                    [payload.review_id for payload in chunk],
+                    {(row["review_id"], row["tag_code"]) for row in rows},
+                )
+            self.load("return_fact_details", list(DETAIL_COLUMNS), rows)
+            written += len(rows)
+        return written
+
+    def load(self, table: str, columns: List[str], rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        body = dumps_bytes(rows)
+        label = self.make_label(table, body)
+        headers = {
+            "label": label,
+            "format": "json",
+            "strip_outer_array": "true",
+            "columns": ",".join(columns),
+            "max_filter_ratio": "0",
+            "Expect": "100-continue",
+            "Content-Type": "application/json; charset=utf-8",
+        }
+        url = f"{self._base_url}/api/{self._database}/{table}/_stream_load"
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                result = self._put(url, headers, body)
+            except (requests.Timeout, requests.ConnectionError, requests.HTTPError) as exc:
+                client_error = (
+                    isinstance(exc, requests.HTTPError)
+                    and exc.response is not None
+                    and exc.response.status_code < 500
+                )
+                if client_error or attempt >= self._max_retries:
+                    raise StreamLoadError(f"Stream Load {label} failed: {exc}") from exc
+                attempt += 1
+                delay = 2 ** attempt
+                METRICS.inc("stream_load_retries_total", table=table)
+                logging.info("Retrying Stream Load %s in %ds after %s", label, delay, exc)
+                time.sleep(delay)
+                continue
+            METRICS.observe("stream_load_seconds", time.perf_counter() - started, table=table)
+            status = result.get("Status")
+            if status in _OK_STATUSES:
+                loaded = int(result.get("NumberLoadedRows", len(rows)))
+                METRICS.inc("db_rows_written_total", loaded, table=table, verb="STREAM_LOAD")
+                METRICS.inc("stream_load_bytes_total", len(body), table=table)
+                logging.info("Stream Load %s into %s: %s rows loaded", label, table, loaded)
+                return result
+            if status == "Label Already Exists":
+                existing = result.get("ExistingJobStatus")
+                if existing == "FINISHED":
+                    logging.info("Stream Load %s already committed; skipping duplicate batch", label)
+                    return result
+                if existing == "RUNNING" and attempt < self._max_retries:
+                    # A previous attempt is still in flight; wait for it instead of double loading.
+                    attempt += 1
+                    time.sleep(2 ** attempt)
+                    continue
+            raise StreamLoadError(
+                f"Stream Load {label} into {table} returned {status}: "
+                f"{result.get('Message', '')} {result.get('ErrorURL', '')}".strip()
+            )
+
+    def make_label(self, table: str, body: bytes) -> str:
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        scope = f"{self._label_scope}_" if self._label_scope else ""
+        return f"{self._label_prefix}_{table}_{scope}{digest}"
+
+    def close(self) -> None:
+        self._session.close()
+
+    def _put(self, url: str, headers: Dict[str, str], body: bytes) -> Dict[str, Any]:
+        # The FE answers with a 307 to a BE; requests drops credentials on cross-host
+        # redirects, so the redirect is followed by hand with auth re-attached.
+        for _ in range(3):
+            resp = self._session.put(
+                url,
+                data=body,
+                headers=headers,
+                auth=self._auth,
+                timeout=self._timeout,
+                allow_redirects=False,
+            )
+            if resp.status_code in (301, 302, 307, 308) and resp.headers.get("Location"):
+                url = urljoin(url, resp.headers["Location"])
+                continue
+            resp.raise_for_status()
+            return resp.json()
+        raise StreamLoadError(f"Too many redirects for {url}")
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .metrics import METRICS
+from .models import CandidateReview, LLMPayload
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    items: int = 0
+    chunks: int = 0
+    busy_seconds: float = 0.0
+
+
+@dataclass
+class StreamingReport:
+    wall_seconds: float = 0.0
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+
+    def log(self) -> None:
+        for name, stats in self.stages.items():
+            logging.info(
+                "Stage %-8s %6d items in %4d chunks, busy %.1fs (%.0f%% of wall)",
+                name,
+                stats.items,
+                stats.chunks,
+                stats.busy_seconds,
+                100 * stats.busy_seconds / self.wall_seconds if self.wall_seconds else 0,
+            )
+        logging.info("Streaming pipeline finished in %.1fs", self.wall_seconds)
+
+
+@dataclass
+class AnnotatedChunk:
+    """Annotate-stage output: the payloads plus (review_id, ledger status) of the
+    reviews the LLM failed on."""
+
+    payloads: List[LLMPayload]
+    failures: List[Tuple[str, str]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def __bool__(self) -> bool:
+        # A chunk of failures only still has to reach the raw stage's ledger write.
+        return bool(self.payloads or self.failures)
+
+
+class _Aborted(Exception):
+    pass
+
+
+def run_streaming_pipeline(
+    candidate_chunks: Iterable[List[CandidateReview]],
+    annotate_chunk: Callable[[List[CandidateReview]], Union[AnnotatedChunk, List[LLMPayload]]],
+    write_raw: Callable[[List[LLMPayload]], Any],
+    write_details: Callable[[List[LLMPayload]], Any],
+    buffer_chunks: int = 2,
+    record_failed: Optional[Callable[[List[Tuple[str, str]]], Any]] = None,
+) -> StreamingReport:
+    """Run fetch -> annotate -> raw upsert -> detail parse as overlapping stages.
+
+    Each stage is a thread connected to the next by a bounded queue holding at most
+    ``buffer_chunks`` chunks, so a slow stage back-pressures the ones before it and
+    memory stays proportional to chunk size rather than to the run. Each stage
+    callable runs on its own thread and must own its connections. The first stage
+    error stops the pipeline and is re-raised here.
+
+    ``annotate_chunk`` may return an ``AnnotatedChunk``; its failures are handed to
+    ``record_failed`` on the raw stage, after the chunk's payloads.
+    """
+    report = StreamingReport(stages={name: StageStats() for name in ("fetch", "annotate", "raw", "details")})
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    to_annotate: "queue.Queue[Any]" = queue.Queue(maxsize=buffer_chunks)
+    to_raw: "queue.Queue[Any]" = queue.Queue(maxsize=buffer_chunks)
+    to_details: "queue.Queue[Any]" = queue.Queue(maxsize=buffer_chunks)
+
+    def _put(q: "queue.Queue[Any]", item: Any) -> None:
+        while True:
+            if stop.is_set():
+                raise _Aborted()
+            try:
+                q.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def _get(q: "queue.Queue[Any]") -> Any:
+        while True:
+            if stop.is_set():
+                raise _Aborted()
+            try:
+                return q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+    def _source() -> None:
+        stats = report.stages["fetch"]
+        iterator = iter(candidate_chunks)
+        while True:
+            started = time.monotonic()
+            chunk = next(iterator, None)
+            elapsed = time.monotonic() - started
+            stats.busy_seconds += elapsed
+            if chunk is None:
+                break
+            METRICS.observe("streaming_chunk_seconds", elapsed, stage="fetch")
+            if not chunk:
+                continue
+            stats.items += len(chunk)
+            stats.chunks += 1
+            _put(to_annotate, chunk)
+        _put(to_annotate, _DONE)
+
+    def _stage(
+        name: str,
+        inbox: "queue.Queue[Any]",
+        func: Callable[[List[Any]], Any],
+        outbox: Optional["queue.Queue[Any]"],
+        forward_result: bool,
+    ) -> Callable[[], None]:
+        stats = report.stages[name]
+
+        def _loop() -> None:
+            while True:
+                chunk = _get(inbox)
+                if chunk is _DONE:
+                    break
+                started = time.monotonic()
+                result = func(chunk)
+                elapsed = time.monotonic() - started
+                stats.busy_seconds += elapsed
+                METRICS.observe("streaming_chunk_seconds", elapsed, stage=name)
+                forwarded = result if forward_result else chunk
+                stats.items += len(forwarded)
+                stats.chunks += 1
+                if outbox is not None and forwarded:
+                    _put(outbox, forwarded)
+            if outbox is not None:
+                _put(outbox, _DONE)
+
+        return _loop
+
+    def _guard(name: str, target: Callable[[], None]) -> Callable[[], None]:
+        def _run() -> None:
+            try:
+                target()
+            except _Aborted:
+                pass
+            except BaseException as exc:  # surface the first failure, stop everyone else
+                logging.error("Stage %s failed: %s", name, exc)
+                errors.append(exc)
+                stop.set()
+
+        return _run
+
+    def _annotate(chunk: List[CandidateReview]) -> AnnotatedChunk:
+        result = annotate_chunk(chunk)
+        return result if isinstance(result, AnnotatedChunk) else AnnotatedChunk(list(result))
+
+    def _write_raw(chunk: AnnotatedChunk) -> List[LLMPayload]:
+        if chunk.payloads:
+            write_raw(chunk.payloads)
+        if chunk.failures and record_failed is not None:
+            record_failed(chunk.failures)
+        return chunk.payloads
+
+    stages = [
+        ("fetch", _source),
+        ("annotate", _stage("annotate", to_annotate, _annotate, to_raw, forward_result=True)),
+        ("raw", _stage("raw", to_raw, _write_raw, to_details, forward_result=True)),
+        ("details", _stage("details", to_details, write_details, None, forward_result=False)),
+    ]
+    threads = [
+        threading.Thread(target=_guard(name, target), name=f"pipeline-{name}", daemon=True)
+        for name, target in stages
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        raise
+    report.wall_seconds = time.monotonic() - started
+    if errors:
+        raise errors[0]
+    return report
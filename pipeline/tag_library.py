@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Bump when the cached entry layout or the prompt serialization changes.
+CACHE_FORMAT = 1
+
+
+def format_tag_library(tag_library: Dict[str, Dict[str, str]]) -> List[Dict[str, str]]:
+    result: List[Dict[str, str]] = []
+    # Sorted by tag_code so the serialization does not depend on DB row order.
+    for code, meta in sorted(tag_library.items()):
+        result.append(
+            {
+                "tag_code": code,
+                "tag_name_cn": meta.get("tag_name_cn", ""),
+                "category_name_cn": meta.get("category_name_cn", ""),
+                "definition": meta.get("definition", ""),
+                "boundary_note": meta.get("boundary_note", ""),
+            }
+        )
+    return result
+
+
+def serialize_tag_library(tag_library: Dict[str, Dict[str, str]]) -> str:
+    """The ``tag_library`` array exactly as embedded in the system message."""
+    if isinstance(tag_library, TagLibrary):
+        return tag_library.prompt_json
+    return json.dumps(format_tag_library(tag_library), ensure_ascii=False, separators=(",", ":"))
+
+
+def tag_library_fingerprint(tag_library: Dict[str, Dict[str, str]]) -> str:
+    """Stable hash of the prompt-relevant tag fields, independent of DB row order."""
+    if isinstance(tag_library, TagLibrary):
+        return tag_library.fingerprint
+    return _fingerprint(serialize_tag_library(tag_library))
+
+
+def _fingerprint(prompt_json: str) -> str:
+    return hashlib.sha256(prompt_json.encode("utf-8")).hexdigest()[:16]
+
+
+class TagLibrary(dict):
+    """tag_code -> return_dim_tag row, carrying its prompt serialization and fingerprint.
+
+    Both are computed once (or restored from the local cache) instead of on every
+    system message and cache key; treat the mapping as read-only.
+    """
+
+    def __init__(
+        self,
+        rows: Dict[str, Dict[str, Any]] | Iterable[Tuple[str, Dict[str, Any]]] = (),
+        prompt_json: Optional[str] = None,
+        fingerprint: Optional[str] = None,
+    ):
+        super().__init__(rows)
+        self.prompt_json = prompt_json or json.dumps(
+            format_tag_library(self), ensure_ascii=False, separators=(",", ":")
+        )
+        self.fingerprint = fingerprint or _fingerprint(self.prompt_json)
+
+
+class TagLibraryCache:
+    """One JSON file per tag filter set, holding the dimension rows, their prompt
+    serialization and fingerprint, and the change probe they were fetched under."""
+
+    def __init__(self, directory: Path | str):
+        self._dir = Path(directory)
+
+    @staticmethod
+    def filter_key(filters: List[Dict[str, Any]] | None) -> str:
+        canonical = json.dumps(filters or [], ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(f"{CACHE_FORMAT}:{canonical}".encode("utf-8")).hexdigest()[:16]
+
+    def path(self, key: str) -> Path:
+        return self._dir / f"tag_library-{key}.json"
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self.path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logging.warning("Ignoring unreadable tag library cache %s", path)
+            return None
+        return entry if entry.get("format") == CACHE_FORMAT else None
+
+    def store(self, key: str, filters: List[Dict[str, Any]] | None, probe: Dict[str, Any], library: TagLibrary) -> None:
+        self._dir.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "format": CACHE_FORMAT,
+            "filters": filters or [],
+            "probe": probe,
+            "fetched_at": time.time(),
+            "fingerprint": library.fingerprint,
+            "prompt_json": library.prompt_json,
+            "tags": library,
+        }
+        path = self.path(key)
+        # Shard workers may refresh the same entry at once; each writes its own temp file.
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(entry, ensure_ascii=False, default=str), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def load_tag_library(doris: Any, filters: List[Dict[str, Any]] | None, cache: Optional[TagLibraryCache]) -> TagLibrary:
+    """Tag library for ``filters``, served from ``cache`` while ``doris.probe_dim_tag``
+    (row count, active count, version sum, max(updated_at)) is unchanged."""
+    if cache is None:
+        return TagLibrary(doris.fetch_dim_tag_map(filters=filters))
+    key = cache.filter_key(filters)
+    probe = doris.probe_dim_tag(filters=filters)
+    entry = cache.load(key)
+    if entry is not None and entry["probe"] == probe:
+        library = TagLibrary(entry["tags"], prompt_json=entry["prompt_json"], fingerprint=entry["fingerprint"])
+        logging.info(
+            "Tag library unchanged (%d tags, updated_at %s, fingerprint %s); using %s",
+            len(library),
+            probe.get("updated_at") or "-",
+            library.fingerprint,
+            cache.path(key),
+        )
+        return library
+    library = TagLibrary(doris.fetch_dim_tag_map(filters=filters))
+    cache.store(key, filters, probe, library)
+    logging.info(
+        "Fetched %d tags from return_dim_tag (%s, fingerprint %s)",
+        len(library),
+        "cache was empty" if entry is None else "dimension changed",
+        library.fingerprint,
+    )
+    return library
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .models import LLMPayload
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CJK_RUN = re.compile("[\u3400-\u9fff\uf900-\ufaff]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be been but by for from had has have i in is it its me my of on or so "
+    "than that the this to too was were will with you your they them then there very just not "
+    "no do did does".split()
+)
+# Historical evidence is the only English text on the tag side, so it gets extra weight.
+_FIELD_WEIGHTS = (("tag_name_cn", 2.0), ("definition", 1.0), ("boundary_note", 0.5))
+_EVIDENCE_WEIGHT = 1.5
+
+
+def tokenize(text: str) -> List[str]:
+    """English word stems plus CJK character bigrams (Chinese has no spaces)."""
+    terms: List[str] = []
+    for word in _WORD.findall(text.lower()):
+        if word in _STOPWORDS or len(word) < 2:
+            continue
+        # Cheap plural folding keeps "zippers"/"zipper" together without a stemmer.
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        terms.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+@dataclass
+class PruneEvaluation:
+    reviews: int = 0
+    assigned_tags: int = 0
+    dropped_tags: int = 0
+    reviews_with_drop: int = 0
+    library_size: int = 0
+    pruned_size_total: int = 0
+
+    @property
+    def tag_recall(self) -> float:
+        return 1 - self.dropped_tags / self.assigned_tags if self.assigned_tags else 1.0
+
+    @property
+    def review_recall(self) -> float:
+        return 1 - self.reviews_with_drop / self.reviews if self.reviews else 1.0
+
+    @property
+    def mean_pruned_size(self) -> float:
+        return self.pruned_size_total / self.reviews if self.reviews else 0.0
+
+
+class TagPruner:
+    """TF-IDF retrieval of the tags a review can plausibly match.
+
+    Each tag is a document built from ``tag_name_cn``, ``definition``, ``boundary_note``
+    and historical English ``evidence`` from return_fact_details. ``prune`` keeps the
+    ``top_k`` best scoring tags, widened by ``margin``: any tag scoring at least
+    ``(1 - margin)`` of the K-th score is kept too. A review that matches nothing gets
+    the full library. Pruned libraries are interned per tag set, so identical subsets
+    share one dict and one cached system message.
+    """
+
+    def __init__(
+        self,
+        tag_library: Dict[str, Dict[str, str]],
+        evidence: Iterable[Tuple[str, str, str]] = (),
+        top_k: int = 12,
+        margin: float = 0.2,
+        exclude_review_ids: Optional[Set[str]] = None,
+    ):
+        self._library = tag_library
+        self.top_k = top_k
+        self.margin = margin
+        self._subsets: Dict[FrozenSet[str], Dict[str, Dict[str, str]]] = {}
+
+        term_weights: Dict[str, Counter] = {code: Counter() for code in tag_library}
+        for code, meta in tag_library.items():
+            for field, weight in _FIELD_WEIGHTS:
+                for term in tokenize(str(meta.get(field) or "")):
+                    term_weights[code][term] += weight
+        for review_id, code, text in evidence:
+            if code in term_weights and text and not (exclude_review_ids and review_id in exclude_review_ids):
+                for term in tokenize(text):
+                    term_weights[code][term] += _EVIDENCE_WEIGHT
+
+        doc_freq: Counter = Counter()
+        for counts in term_weights.values():
+            doc_freq.update(counts.keys())
+        n_docs = max(1, len(term_weights))
+        self._idf = {term: math.log((1 + n_docs) / (1 + df)) + 1 for term, df in doc_freq.items()}
+
+        # Inverted index of L2-normalised, sublinear-tf document vectors.
+        self._postings: Dict[str, List[Tuple[str, float]]] = defaultdict(list)
+        for code, counts in term_weights.items():
+            vector = {term: (1 + math.log(tf)) * self._idf[term] for term, tf in counts.items() if tf > 0}
+            norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+            for term, value in vector.items():
+                self._postings[term].append((code, value / norm))
+
+    @property
+    def signature(self) -> str:
+        """Folded into annotation cache keys: pruned prompts may yield different tags."""
+        return f"prune:k={self.top_k}:m={self.margin:g}"
+
+    def scores(self, text: str) -> List[Tuple[str, float]]:
+        query = Counter(term for term in tokenize(text) if term in self._postings)
+        totals: Dict[str, float] = defaultdict(float)
+        for term, tf in query.items():
+            weight = (1 + math.log(tf)) * self._idf[term]
+            for code, value in self._postings[term]:
+                totals[code] += weight * value
+        return sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+
+    def select(self, text: str) -> FrozenSet[str]:
+        ranked = self.scores(text)
+        if not ranked or len(self._library) <= self.top_k:
+            return frozenset(self._library)
+        cutoff = ranked[min(self.top_k, len(ranked)) - 1][1] * (1 - self.margin)
+        return frozenset(code for rank, (code, score) in enumerate(ranked) if rank < self.top_k or score >= cutoff)
+
+    def prune(self, text: str) -> Dict[str, Dict[str, str]]:
+        codes = self.select(text)
+        if len(codes) == len(self._library):
+            return self._library
+        subset = self._subsets.get(codes)
+        if subset is None:
+            subset = {code: self._library[code] for code in sorted(codes)}
+            self._subsets[codes] = subset
+        return subset
+
+    def evaluate(self, payloads: Sequence[LLMPayload]) -> PruneEvaluation:
+        """How often pruning would have hidden a tag the LLM actually assigned."""
+        result = PruneEvaluation(library_size=len(self._library))
+        for payload in payloads:
+            assigned = {tag.tag_code for tag in payload.tags if tag.tag_code in self._library}
+            kept = self.select(payload.review_en)
+            dropped = assigned - kept
+            result.reviews += 1
+            result.assigned_tags += len(assigned)
+            result.dropped_tags += len(dropped)
+            result.reviews_with_drop += bool(dropped)
+            result.pruned_size_total += len(kept)
+        return result
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .codec import dumps_bytes
+from .metrics import METRICS
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without touching the network while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures, then lets a single
+    probe through once ``reset_seconds`` have passed (half-open)."""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self._threshold = failure_threshold
+        self._reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_request(self) -> bool:
+        """Raise while open; return True when this call is the half-open probe."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            remaining = self._opened_at + self._reset_seconds - time.monotonic()
+            if remaining > 0 or self._probing:
+                raise CircuitOpenError(
+                    f"circuit open after {self._failures} consecutive failures; retry in {max(remaining, 0):.0f}s"
+                )
+            self._probing = True
+            return True
+
+    def release_probe(self) -> None:
+        """End a probe that settled neither way (e.g. a 429), so the next call probes again."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logging.info("Circuit breaker closed")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self._threshold:
+                if self._opened_at is None:
+                    logging.warning("Circuit breaker opened after %d consecutive failures", self._failures)
+                self._opened_at = time.monotonic()
+
+
+class HttpTransport:
+    """Pooled keep-alive session with jittered exponential backoff.
+
+    Retries timeouts, connection errors and 429/5xx responses up to
+    ``max_retries`` times, honoring ``Retry-After`` when the server sends one.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 16,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.throttled = 0
+
+    def post_json(
+        self, url: str, headers: Dict[str, str], body: object, timeout: float
+    ) -> requests.Response:
+        # Encoded once for all attempts, as UTF-8 rather than requests' ASCII-escaped JSON.
+        data = dumps_bytes(body)
+        headers = {"Content-Type": "application/json", **headers}
+        attempt = 0
+        while True:
+            probe = self._breaker.before_request()
+            try:
+                started = time.perf_counter()
+                try:
+                    resp = self._session.post(url, headers=headers, data=data, timeout=timeout)
+                except (requests.Timeout, requests.ConnectionError) as exc:
+                    METRICS.observe("http_attempt_seconds", time.perf_counter() - started, status=type(exc).__name__)
+                    self._breaker.record_failure()
+                    if attempt >= self._max_retries:
+                        raise
+                    delay = self._backoff(attempt, None)
+                    reason = type(exc).__name__
+                else:
+                    METRICS.observe("http_attempt_seconds", time.perf_counter() - started, status=resp.status_code)
+                    if resp.status_code not in RETRY_STATUSES:
+                        self._breaker.record_success()
+                        resp.raise_for_status()
+                        return resp
+                    if resp.status_code == 429:
+                        # Throttling means the service is up; it should not trip the breaker.
+                        # A throttled probe only frees its slot (below), so the next call probes.
+                        with self._lock:
+                            self.throttled += 1
+                    else:
+                        self._breaker.record_failure()
+                    if attempt >= self._max_retries:
+                        resp.raise_for_status()
+                    delay = self._backoff(attempt, resp.headers.get("Retry-After"))
+                    reason = f"HTTP {resp.status_code}"
+                    resp.close()
+            finally:
+                # Whatever the outcome (429, 4xx, an unexpected exception), never leave
+                # the probe slot taken, or the breaker could not close again.
+                if probe:
+                    self._breaker.release_probe()
+            attempt += 1
+            with self._lock:
+                self.retries += 1
+            METRICS.inc("http_retries_total", reason=reason)
+            logging.info("Retrying %s in %.1fs after %s (attempt %d/%d)", url, delay, reason, attempt, self._max_retries)
+            time.sleep(delay)
+
+    def close(self) -> None:
+        self._session.close()
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        server_delay = _parse_retry_after(retry_after)
+        if server_delay is not None:
+            return min(server_delay, self._backoff_max)
+        # Full jitter keeps concurrent workers from retrying in lockstep.
+        return random.uniform(0, min(self._backoff_max, self._backoff_base * (2 ** attempt)))
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,18 @@
+-- AMZ 退货分析 --
+-- 下推解析（python -m scripts.pipeline --step parse --parse-mode pushdown）的暂存表：
+-- 每次运行先用一条反连接 INSERT ... SELECT 把范围内 payload 中已不存在的旧标签键写入本表（按 run_id 区分），
+-- 再以 DELETE FROM return_fact_details USING return_fact_details_stale 删除，最后按 run_id 清空本次暂存。
+-- Doris 的 DELETE 不支持 WHERE 中的子查询；USING 写法需 Doris 2.0 及以上，
+-- 且 return_fact_details 为开启 merge-on-write 的 Unique Key 表。
+CREATE TABLE IF NOT EXISTS hyy.return_fact_details_stale (
+    run_id             varchar(32)  NOT NULL COMMENT '单次下推解析的运行 ID',
+    review_id          varchar(64)  NOT NULL,
+    tag_code           varchar(64)  NOT NULL,
+    created_at         datetime     NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+UNIQUE KEY(run_id, review_id, tag_code)
+DISTRIBUTED BY HASH(run_id) BUCKETS 1
+PROPERTIES (
+    "replication_num" = "1",
+    "enable_unique_key_merge_on_write" = "true"
+);
@@ -0,0 +1,27 @@
+-- AMZ 退货分析 --
+-- 打标状态台账：每个 review_id 一行，由 pipeline 写 return_fact_llm 时同步维护，
+-- 候选视图按主键反连接本表，替代对 return_fact_llm.payload 的全量 LIKE 扫描。
+CREATE TABLE IF NOT EXISTS hyy.return_llm_status (
+    review_id          varchar(64)  NOT NULL COMMENT '留言 ID（评论 ID / 订单号）',
+    status             varchar(16)  NOT NULL COMMENT 'ok / empty_tags / empty_cn / failed / error / auto',
+    attempt_count      int          NOT NULL DEFAULT "1" COMMENT '累计打标次数（临时故障 error 不计）',
+    model              varchar(64)  NULL COMMENT '最近一次使用的模型',
+    prompt_fingerprint varchar(32)  NULL COMMENT '提示词 + 标签库指纹',
+    updated_at         datetime     NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+UNIQUE KEY(review_id)
+DISTRIBUTED BY HASH(review_id) BUCKETS 8
+PROPERTIES (
+    "replication_num" = "1",
+    "enable_unique_key_merge_on_write" = "true"
+);
+
+-- 一次性回填：从已有 return_fact_llm 生成台账（也可执行 python -m scripts.pipeline --step ledger-backfill）
+-- INSERT INTO hyy.return_llm_status (review_id, status, attempt_count, model, prompt_fingerprint, updated_at)
+-- SELECT review_id,
+--        CASE WHEN coalesce(get_json_string(payload, '$.review_cn'), '') = '' THEN 'empty_cn'
+--             WHEN coalesce(json_length(payload, '$.tags'), 0) = 0 THEN 'empty_tags'
+--             ELSE 'ok' END,
+--        1, '', '', now()
+-- FROM hyy.return_fact_llm
+-- WHERE review_id NOT IN (SELECT review_id FROM hyy.return_llm_status);
@@ -0,0 +1,92 @@
+-- AMZ 退货分析 --
+-- 标签汇总表：按 (国家, 父 ASIN, 周, 来源) 预聚合 return_fact_details，供看板直接查询，
+-- 不再每次刷新都全量扫描明细表。由 pipeline 在 parse 时按本次涉及的 review_id 增量维护
+-- （--refresh-rollups），也可执行 python -m scripts.rollup refresh --all 全量重建。
+-- 维护方式：先把本批留言的属性同步到 return_review_attr，再找出受影响的
+-- (country, fasin, week_start) 分组，删除后按明细整组重算。
+
+-- 留言属性视图：与 view_return_review_snapshot 同源（raw 子查询与快照视图保持一致），但不反连接打标台账
+-- （快照视图会排除已打标留言，汇总需要的恰恰是已打标留言的国家/ASIN/日期）。
+-- 只在同步留言属性表时按 review_id 过滤读取，汇总重算不直接连接本视图。
+CREATE OR REPLACE VIEW hyy.view_return_review_attr AS
+with raw as
+(select country_name country,fasin,asin,STR_TO_DATE(review_date,'%Y-%m-%d') review_date,STR_TO_DATE(purchase_date,'%Y-%m-%d') purchase_date,STR_TO_DATE(purchase_date,'%Y-%m-%d') +interval 45 day return_deadline,
+review_id,2 review_source,content review_en
+from HYY_DW_MYSQL.hyy.jj_review
+where star <= 3
+
+union all 
+select distinct b.country,c.parent_asin fasin,a.asin,return_date review_date,purchase_date,purchase_date +interval 45 day return_deadline,
+order_id review_id,0 review_source,concat(reason,": ",customer_comments) review_en
+from HYY_DW_MYSQL.hyy.jj_return_orders a
+left join basic_account b on a.market_id = b.gg_marketid
+left join hyy.view_asin_mid_new_info c on a.asin = c.asin and b.country = c.marketplace_id
+where customer_comments <> ''
+
+union all
+select distinct c.country,d.parent_asin fasin,a.asin,STR_TO_DATE(a.timestamp,'%Y-%m-%d') review_date,b.purchase_date,b.purchase_date +interval 45 day return_deadline,
+a.order_id review_id,1 review_source,a.comment review_en
+from HYY_DW_MYSQL.hyy.t_jj_buyer_voice_comment_incremental a
+left join (select order_id,asin,max(market_id) market_id,min(purchase_date) purchase_date from HYY_DW_MYSQL.hyy.jj_all_orders group by order_id,asin) b 
+on a.order_id = b.order_id and a.asin = b.asin
+left join basic_account c on b.market_id = c.gg_marketid
+left join hyy.view_asin_mid_new_info d on a.asin = d.asin and c.country = d.marketplace_id
+where ((NOT EXISTS
+(SELECT 1 FROM (select distinct order_id review_id,customer_comments review_en from HYY_DW_MYSQL.hyy.jj_return_orders where customer_comments <> '') b 
+WHERE a.order_id = b.review_id and a.comment = b.review_en))))
+select review_id, review_source, country, fasin, asin, review_date from raw;
+
+-- 留言属性表：已解析留言的国家/父 ASIN/日期。parse 时只按本批 review_id 从上面的视图同步，
+-- 汇总的分组查找与整组重算都连接本表，不再每次重新计算外部表的 union。
+CREATE TABLE IF NOT EXISTS hyy.return_review_attr (
+    review_id          varchar(64)  NOT NULL COMMENT '留言 ID（评论 ID / 订单号）',
+    review_source      tinyint      NOT NULL COMMENT '0 退货留言 / 1 买家之声 / 2 评论',
+    country            varchar(16)  NULL,
+    fasin              varchar(32)  NULL,
+    review_date        date         NULL,
+    updated_at         datetime     NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+UNIQUE KEY(review_id, review_source)
+DISTRIBUTED BY HASH(review_id) BUCKETS 8
+PROPERTIES (
+    "replication_num" = "1",
+    "enable_unique_key_merge_on_write" = "true"
+);
+
+-- 标签粒度：每个分组内打上该标签的留言数
+CREATE TABLE IF NOT EXISTS hyy.return_tag_rollup_weekly (
+    country            varchar(16)  NOT NULL COMMENT '国家，缺失为空串',
+    fasin              varchar(32)  NOT NULL COMMENT '父 ASIN，缺失为空串',
+    week_start         date         NOT NULL COMMENT 'review_date 所在周的周一',
+    review_source      tinyint      NOT NULL COMMENT '0 退货留言 / 1 买家之声 / 2 评论',
+    tag_code           varchar(64)  NOT NULL,
+    tag_name_cn        varchar(128) NULL,
+    category_name_cn   varchar(128) NULL COMMENT '取自 return_dim_tag',
+    reviews            int          NOT NULL COMMENT '打上该标签的留言数',
+    negative_reviews   int          NOT NULL COMMENT '其中 sentiment = -1 的留言数',
+    updated_at         datetime     NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+UNIQUE KEY(country, fasin, week_start, review_source, tag_code)
+DISTRIBUTED BY HASH(fasin) BUCKETS 8
+PROPERTIES (
+    "replication_num" = "1",
+    "enable_unique_key_merge_on_write" = "true"
+);
+
+-- 分组粒度：已解析留言总数，作为标签占比的分母
+CREATE TABLE IF NOT EXISTS hyy.return_review_rollup_weekly (
+    country            varchar(16)  NOT NULL,
+    fasin              varchar(32)  NOT NULL,
+    week_start         date         NOT NULL,
+    review_source      tinyint      NOT NULL,
+    reviews            int          NOT NULL COMMENT '已解析留言数（含无标签）',
+    tagged_reviews     int          NOT NULL COMMENT '至少有一个标签的留言数',
+    negative_reviews   int          NOT NULL COMMENT 'sentiment = -1 的留言数',
+    updated_at         datetime     NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+UNIQUE KEY(country, fasin, week_start, review_source)
+DISTRIBUTED BY HASH(fasin) BUCKETS 8
+PROPERTIES (
+    "replication_num" = "1",
+    "enable_unique_key_merge_on_write" = "true"
+);
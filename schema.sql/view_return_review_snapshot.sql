@@ -26,13 +26,23 @@ where ((NOT EXISTS
 (SELECT 1 FROM (select distinct order_id review_id,customer_comments review_en from HYY_DW_MYSQL.hyy.jj_return_orders where customer_comments <> '') b 
 WHERE a.order_id = b.review_id and a.comment = b.review_en))))
 
-select * from raw
+select raw.* from raw
+-- 按主键反连接打标状态台账（见 return_llm_status.sql），不再扫描 return_fact_llm.payload
+left join hyy.return_llm_status s on raw.review_id = s.review_id
 where 
 -- review_id in (select review_id from hyy.return_fact_llm where payload like '%"review_cn":""%' or payload like '%"tags":[]%')
 -- and review_source = 0
 -- review_id = 'R384TSBX2ZQOS'
 
-review_id not in (select review_id from hyy.return_fact_llm where payload not like '%"review_cn":""%' and payload not like '%"tags":[]%')
+-- 旧写法：review_id not in (select review_id from hyy.return_fact_llm where payload not like '%"review_cn":""%' and payload not like '%"tags":[]%')
+-- 未打标，或上次结果为空/失败且重试次数未达上限
+-- （auto = 本地分类器或近似重复代表条目已打标，不再送 LLM）
+-- 重试上限：结果为空或失败（含 --step all 中请求失败）的留言累计 3 次后不再进入候选。
+-- 上限以 pipeline/ledger.py 的 MAX_ATTEMPTS 为准，修改后执行 python test/check_ledger.py 核对此处。
+-- 熔断、超时、429/5xx 等临时故障记为 error，不计入 attempt_count，故障恢复后照常进入候选。
+-- 需要重新送审时执行 python -m scripts.pipeline --step ledger-backfill --reset-attempts，
+-- 将已达上限的 empty_tags / empty_cn / failed 记录的 attempt_count 清零。
+(s.review_id is null or (s.status not in ('ok', 'auto') and s.attempt_count < 3))
 -- and country = 'US' and fasin = 'B0BGHGXYJX'
 
 and date_format(purchase_date,'%Y%m%d') >= 20250901
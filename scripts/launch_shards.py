@@ -0,0 +1,149 @@
+"""
+Run one pipeline step as N local worker processes, one per review_id shard.
+
+Every worker is a separate `python -m scripts.pipeline ... --shard i/N` process with its
+own Doris connection and DeepSeek session. Per-shard output files get a `.shard-i-of-N`
+suffix, each worker writes its own run report, and the launcher merges them.
+
+    python -m scripts.launch_shards --shards 4 --step llm --page-size 1000 --limit 0 --concurrency 8
+
+On several hosts, run `python -m scripts.pipeline --shard i/N --run-report ...` on each
+one instead, then merge the collected reports:
+
+    python -m scripts.launch_shards --merge host*/report.json --report-dir runs/merged
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+from pipeline.run_report import RunReport
+
+# Pipeline flags whose files would collide between shards.
+_PER_SHARD_OUTPUTS = ("--candidate-output", "--payload-output", "--llm-request-output", "--metrics-textfile")
+
+
+def _shard_path(path: str, index: int, count: int) -> str:
+    p = Path(path)
+    return str(p.with_name(f"{p.stem}.shard-{index}-of-{count}{p.suffix}"))
+
+
+def shard_args(pipeline_args: List[str], index: int, count: int) -> List[str]:
+    """Rewrite per-shard output paths in a copy of ``pipeline_args``."""
+    result: List[str] = []
+    rewrite_next = False
+    for arg in pipeline_args:
+        if rewrite_next:
+            result.append(_shard_path(arg, index, count))
+            rewrite_next = False
+            continue
+        flag, sep, value = arg.partition("=")
+        if flag in _PER_SHARD_OUTPUTS:
+            if sep:
+                result.append(f"{flag}={_shard_path(value, index, count)}")
+            else:
+                result.append(arg)
+                rewrite_next = True
+            continue
+        result.append(arg)
+    return result
+
+
+def launch(shards: int, pipeline_args: List[str], report_dir: Path) -> int:
+    if any(arg.split("=")[0] in ("--shard", "--run-report") for arg in pipeline_args):
+        raise ValueError("--shard/--run-report are set by the launcher; do not pass them")
+    if any(arg.split("=")[0] == "--resume" for arg in pipeline_args):
+        # Every shard journals under its own run id (<id>-shard{i}of{N}, in the shard
+        # reports), so no single id resumes a whole launch.
+        raise ValueError(
+            "--resume is not supported by the launcher; resume each unfinished shard with "
+            "python -m scripts.pipeline --shard i/N --resume <its run_id from shard-i-of-N.json>"
+        )
+    report_dir.mkdir(parents=True, exist_ok=True)
+    workers = []
+    for index in range(shards):
+        report_path = report_dir / f"shard-{index}-of-{shards}.json"
+        cmd = [
+            sys.executable,
+            "-m",
+            "scripts.pipeline",
+            *shard_args(pipeline_args, index, shards),
+            "--shard",
+            f"{index}/{shards}",
+            "--run-report",
+            str(report_path),
+        ]
+        logging.info("Starting shard %d/%d: %s", index, shards, " ".join(cmd[2:]))
+        workers.append((index, report_path, subprocess.Popen(cmd)))
+
+    failed = []
+    try:
+        for index, _, proc in workers:
+            if proc.wait() != 0:
+                failed.append(index)
+                logging.error("Shard %d/%d exited with code %d", index, shards, proc.returncode)
+    except KeyboardInterrupt:
+        # Workers share the terminal's process group and got the same SIGINT; let them
+        # close their journals before we leave.
+        for _, _, proc in workers:
+            proc.wait()
+        raise
+
+    reports = [RunReport.load(path) for _, path, _ in workers if path.exists()]
+    if reports:
+        merged = RunReport.merge(reports)
+        merged.write(report_dir / "report.json")
+        merged.log()
+        logging.info("Merged %d shard reports into %s", len(reports), report_dir / "report.json")
+    if failed:
+        logging.error(
+            "Shards %s failed; resume each with --shard i/%d --resume <run_id logged by that shard>",
+            failed,
+            shards,
+        )
+        return 1
+    return 0
+
+
+def merge(report_paths: List[Path], report_dir: Path) -> int:
+    merged = RunReport.merge(RunReport.load(path) for path in report_paths)
+    merged.write(report_dir / "report.json")
+    merged.log()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Fan a pipeline step out over N shard worker processes and merge their reports. "
+        "Unrecognised arguments are passed through to scripts.pipeline."
+    )
+    parser.add_argument("--shards", type=int, help="Number of worker processes / shards.")
+    parser.add_argument(
+        "--report-dir",
+        type=Path,
+        help="Where per-shard and merged run reports go (default: runs/shards-<timestamp>).",
+    )
+    parser.add_argument(
+        "--merge",
+        nargs="+",
+        type=Path,
+        metavar="REPORT",
+        help="Only merge existing run reports (e.g. collected from several hosts).",
+    )
+    args, pipeline_args = parser.parse_known_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [launcher] %(message)s")
+    report_dir = args.report_dir or Path("runs") / f"shards-{datetime.now():%Y%m%d-%H%M%S}"
+    if args.merge:
+        return merge(args.merge, report_dir)
+    if not args.shards or args.shards < 1:
+        parser.error("--shards N (N >= 1) is required unless --merge is given")
+    return launch(args.shards, pipeline_args, report_dir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
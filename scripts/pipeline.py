@@ -4,71 +4,90 @@ Modular CLI for running the return analytics pipeline step-by-step.
 Steps:
 1. candidates - fetch data from view_return_review_snapshot and optionally dump to JSONL.
 2. llm        - call DeepSeek on candidates (from DB or JSONL) and upsert into return_fact_llm.
-3. parse      - parse payloads (from DB or JSONL) into return_fact_details.
-4. all        - run the full chain (fetch -> LLM -> parse) without intermediate files.
+3. parse      - parse payloads (from DB or JSONL) into return_fact_details; --parse-mode pushdown
+                explodes the stored payloads inside Doris with one INSERT ... SELECT.
+4. all        - run the full chain (fetch -> LLM -> raw -> parse) as overlapping streaming
+                stages with bounded buffers, without intermediate files.
+5. ledger-backfill - one-shot: populate return_llm_status from existing return_fact_llm rows.
+6. prune-eval - offline check of --prune-tags: how often pruning would drop a tag the LLM assigned.
 """
 from __future__ import annotations
 
 import argparse
-import json
+import functools
+import itertools
 import logging
+import time
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Tuple
 
-from pipeline.config import load_config
-from pipeline.deepseek_client import DeepSeekClient
-from pipeline.doris_client import DorisClient
-from pipeline.models import CandidateReview, LLMPayload, TagFragment
+from pipeline.annotation_cache import AnnotationCache
+from pipeline.classifier import TagClassifier
+from pipeline import codec, columnar
+from pipeline.config import AppConfig, load_config
+from pipeline.deepseek_client import DeepSeekClient, prompt_fingerprint
+from pipeline.doris_client import DorisClient, chunks
+from pipeline.journal import RunJournal
+from pipeline.ledger import MAX_ATTEMPTS, LedgerStamp
+from pipeline.metrics import METRICS, write_prometheus
+from pipeline.request_log import RequestLog
+from pipeline.models import CandidateReview, LLMPayload
+from pipeline.run_report import RunReport
+from pipeline.scheduler import RunPlan, TokenScheduler
+from pipeline.sharding import Shard
+from pipeline.stream_load import StreamLoadWriter
+from pipeline.streaming import AnnotatedChunk, run_streaming_pipeline
+from pipeline.tag_library import TagLibrary, TagLibraryCache, load_tag_library
+from pipeline.tag_pruning import TagPruner
 from pipeline.steps import (
+    batched,
+    parse_resume_key,
+    record_status,
+    step_backfill_status,
     step_call_llm,
+    step_evaluate_pruning,
     step_fetch_candidates,
     step_parse_payloads,
+    step_parse_pushdown,
+    step_plan_llm,
+    step_refresh_rollups,
+    step_stream_candidates,
     step_write_raw_from_cache,
 )
 
 
-def _write_jsonl(path: Path, records: Iterable[dict]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as fp:
-        for record in records:
-            fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+# Intermediate files are JSONL unless the extension says Parquet (.parquet/.pq) or Arrow IPC
+# (.arrow/.feather/.ipc); the function names predate the columnar formats.
+# Columnar readers skip rows outside the shard before building objects.
+def _read_candidates_from_jsonl(path: Path, shard: Shard | None = None) -> List[CandidateReview]:
+    if columnar.is_columnar(path):
+        return list(columnar.read_candidates(path, shard))
+    return [review for review in codec.read_candidates(path) if shard is None or shard.owns(review.review_id)]
 
 
-def _read_candidates_from_jsonl(path: Path) -> List[CandidateReview]:
-    with path.open("r", encoding="utf-8") as fp:
-        return [
-            CandidateReview(
-                review_id=obj["review_id"],
-                review_source=obj["review_source"],
-                review_en=obj["review_en"],
-            )
-            for obj in map(json.loads, fp)
-        ]
-
-
-def _read_payloads_from_jsonl(path: Path) -> List[LLMPayload]:
-    payloads: List[LLMPayload] = []
-    with path.open("r", encoding="utf-8") as fp:
-        for line in fp:
-            obj = json.loads(line)
-            payloads.append(
-                LLMPayload(
-                    review_id=obj["review_id"],
-                    review_source=obj["review_source"],
-                    review_en=obj["review_en"],
-                    review_cn=obj.get("review_cn", ""),
-                    sentiment=obj.get("sentiment", 0),
-                    tags=[
-                        TagFragment(
-                            tag_code=item["tag_code"],
-                            tag_name_cn=item["tag_name_cn"],
-                            evidence=item["evidence"],
-                        )
-                        for item in obj.get("tags", [])
-                    ],
-                )
-            )
-    return payloads
+def _read_payloads_from_jsonl(path: Path, shard: Shard | None = None) -> List[LLMPayload]:
+    if columnar.is_columnar(path):
+        return list(columnar.read_payloads(path, shard))
+    return [payload for payload in codec.read_payloads(path) if shard is None or shard.owns(payload.review_id)]
+
+
+def _write_candidates(path: Path, reviews: Iterable[CandidateReview]) -> int:
+    if columnar.is_columnar(path):
+        return columnar.write_candidates(path, reviews)
+    return codec.write_candidates(path, reviews)
+
+
+def _write_payloads(path: Path, payloads: Iterable[LLMPayload]) -> int:
+    if columnar.is_columnar(path):
+        return columnar.write_payloads(path, payloads)
+    return codec.write_payloads(path, payloads)
+
+
+def _make_writer(writer_kind: str, cfg: AppConfig, doris: DorisClient, run_id: str = ""):
+    if writer_kind == "stream-load":
+        # Scoped by run id: a --resume run regenerates the labels of batches it already loaded.
+        return StreamLoadWriter(cfg.doris, doris=doris, label_scope=run_id)
+    return doris
 
 
 def run_step(
@@ -84,84 +103,377 @@ def run_step(
     prompt_text: str | None,
     llm_request_output: Path | None,
     skip_db_write: bool,
+    concurrency: int = 1,
+    batch_size: int = 1,
+    batch_token_budget: int = 8000,
+    cache_mode: str = "off",
+    cache_path: Path | None = None,
+    dedup_threshold: float | None = None,
+    log_level: str = "INFO",
+    write_batch_size: int = 500,
+    writer_kind: str = "sql",
+    chunk_size: int = 200,
+    buffer_chunks: int = 2,
+    page_size: int | None = None,
+    resume_after: tuple | None = None,
+    resume: str | None = None,
+    runs_dir: Path = Path("runs"),
+    shard: Shard | None = None,
+    run_report: Path | None = None,
+    plan: bool = False,
+    tokens_per_minute: int | None = None,
+    prune_top_k: int | None = None,
+    prune_margin: float = 0.2,
+    prune_evidence_per_tag: int = 200,
+    classifier_path: Path | None = None,
+    request_log_max_mb: int = 256,
+    metrics_textfile: Path | None = None,
+    tag_cache_dir: Path | None = Path("cache/tag_library"),
+    refresh_rollups: bool = False,
+    parse_mode: str = "python",
+    parse_since: str | None = None,
+    review_id_from: str | None = None,
+    review_id_to: str | None = None,
+    verify_sample: int = 0,
+    reset_attempts: bool = False,
 ) -> None:
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    log_format = "%(asctime)s %(levelname)s %(message)s"
+    if shard:
+        log_format = f"%(asctime)s %(levelname)s [shard {shard}] %(message)s"
+    logging.basicConfig(level=log_level, format=log_format)
+    started = time.monotonic()
+    METRICS.reset()
+    report = RunReport(step=step, shard=str(shard or ""))
+    succeeded = False
     cfg = load_config(config_path, tag_filter_path="config/tag_filters.yaml")
+    if resume and not (runs_dir / resume).is_dir():
+        raise ValueError(f"No journal for run {resume!r} under {runs_dir}")
+    run_id = resume or RunJournal.new_run_id()
+    if shard and not resume:
+        run_id += f"-shard{shard.index}of{shard.count}"
     doris = DorisClient(cfg.doris)
     deepseek = DeepSeekClient(cfg.deepseek)
+    writer = _make_writer(writer_kind, cfg, doris, run_id) if writer_kind != "sql" else None
+    if writer_kind == "stream-load":
+        logging.info("Stream Load labels scoped to run %s", run_id)
+    cache = None
+    if cache_mode != "off" and step in ("llm", "all"):
+        cache = AnnotationCache(cache_path or Path("cache/annotations.sqlite"))
+    scheduler = TokenScheduler(batch_size, batch_token_budget, tokens_per_minute)
+    request_log = None
+    if llm_request_output and step in ("llm", "all") and not plan:
+        request_log = RequestLog(llm_request_output, max_bytes=request_log_max_mb * 1024 * 1024)
+        logging.info("Logging DeepSeek requests to %s", request_log.segment)
+    classifier = None
+    if classifier_path and step in ("llm", "all"):
+        classifier = TagClassifier.load(classifier_path)
+        logging.info("Loaded local classifier %s (%d tag models)", classifier_path, len(classifier.tags))
+
+    def _counted(items: Iterable[CandidateReview]) -> Iterable[CandidateReview]:
+        for item in items:
+            report.candidates += 1
+            yield item
+
+    def _make_pruner(tag_library, exclude_review_ids=None) -> TagPruner | None:
+        if not prune_top_k:
+            return None
+        evidence = doris.fetch_tag_evidence(per_tag=prune_evidence_per_tag) if prune_evidence_per_tag else []
+        logging.info("Built tag pruning index from %d tags and %d evidence snippets", len(tag_library), len(evidence))
+        return TagPruner(
+            tag_library,
+            evidence,
+            top_k=prune_top_k,
+            margin=prune_margin,
+            exclude_review_ids=exclude_review_ids,
+        )
+
+    def _llm_pages(after: tuple | None) -> Iterable[List[CandidateReview]]:
+        if candidate_input:
+            candidates = _read_candidates_from_jsonl(candidate_input, shard)
+            logging.info("Loaded %d candidates from %s", len(candidates), candidate_input)
+            return [candidates]
+        if page_size:
+            return step_stream_candidates(
+                doris,
+                page_size,
+                limit or None,
+                country=country,
+                fasin=fasin,
+                after=after,
+                shard=shard,
+            )
+        return [step_fetch_candidates(doris, limit, country=country, fasin=fasin, shard=shard)]
+
+    tag_cache = TagLibraryCache(tag_cache_dir) if tag_cache_dir else None
+
+    def _tag_library() -> TagLibrary:
+        return load_tag_library(doris, [f.__dict__ for f in cfg.tag_filters], tag_cache)
 
     try:
-        if step == "candidates":
-            candidates = step_fetch_candidates(doris, limit, country=country, fasin=fasin)
-            if candidate_output:
-                _write_jsonl(
-                    candidate_output,
-                    (
-                        {
-                            "review_id": c.review_id,
-                            "review_source": c.review_source,
-                            "review_en": c.review_en,
-                        }
-                        for c in candidates
-                    ),
+        if plan:
+            if step not in ("llm", "all"):
+                raise ValueError("--plan only applies to --step llm or --step all")
+            tag_library = _tag_library()
+            pruner = _make_pruner(tag_library)
+            run_plan = RunPlan()
+            for page in _llm_pages(resume_after):
+                run_plan.add(
+                    step_plan_llm(
+                        page,
+                        deepseek,
+                        tag_library,
+                        prompt_text,
+                        scheduler,
+                        cache=cache,
+                        dedup_threshold=dedup_threshold,
+                        pruner=pruner,
+                        classifier=classifier,
+                    )
+                )
+            run_plan.log(cfg.deepseek, concurrency, tokens_per_minute)
+            report.candidates = run_plan.reviews
+
+        elif step == "candidates":
+            if page_size:
+                candidates = itertools.chain.from_iterable(
+                    step_stream_candidates(
+                        doris,
+                        page_size,
+                        limit or None,
+                        country=country,
+                        fasin=fasin,
+                        after=resume_after,
+                        shard=shard,
+                    )
                 )
+            else:
+                candidates = step_fetch_candidates(doris, limit, country=country, fasin=fasin, shard=shard)
+            candidates = _counted(candidates)
+            if candidate_output:
+                _write_candidates(candidate_output, candidates)
                 logging.info("Saved candidates to %s", candidate_output)
+            else:
+                # Drain the pages so the final resume key (and the count) is logged.
+                for _ in candidates:
+                    pass
 
         elif step == "llm":
-            tag_library = doris.fetch_dim_tag_map(filters=[f.__dict__ for f in cfg.tag_filters])
-            if candidate_input:
-                candidates = _read_candidates_from_jsonl(candidate_input)
-                logging.info("Loaded %d candidates from %s", len(candidates), candidate_input)
-            else:
-                candidates = step_fetch_candidates(doris, limit, country=country, fasin=fasin)
-            payloads = step_call_llm(
-                candidates,
-                deepseek,
-                doris,
-                tag_library,
-                prompt_text,
-                request_log_path=llm_request_output,
-                write_to_db=not skip_db_write,
-            )
+            tag_library = _tag_library()
+            journal = RunJournal(runs_dir, run_id, resume=bool(resume))
+            report.run_id = journal.run_id
+            pruner = _make_pruner(tag_library)
+            logging.info("Run id %s (continue after a crash with --resume %s)", journal.run_id, journal.run_id)
+            pages = _llm_pages(resume_after if resume_after is not None else journal.resume_key)
+            finished = False
+            try:
+                for page in pages:
+                    report.candidates += len(page)
+                    annotated = step_call_llm(
+                        page,
+                        deepseek,
+                        doris,
+                        tag_library,
+                        prompt_text,
+                        request_log=request_log,
+                        write_to_db=not skip_db_write,
+                        concurrency=concurrency,
+                        batch_size=batch_size,
+                        batch_token_budget=batch_token_budget,
+                        cache=cache,
+                        cache_only=cache_mode == "only",
+                        dedup_threshold=dedup_threshold,
+                        write_batch_size=write_batch_size,
+                        writer=writer,
+                        journal=journal,
+                        scheduler=scheduler,
+                        pruner=pruner,
+                        classifier=classifier,
+                    )
+                    report.payloads += len(annotated)
+                    if page_size and page:
+                        journal.mark_resume_key((page[-1].review_date, page[-1].review_id))
+                finished = True
+            finally:
+                journal.close(finished=finished)
             if payload_output:
-                _write_jsonl(
-                    payload_output,
-                    (json.loads(payload.to_json()) for payload in payloads),
-                )
-                logging.info("Saved payloads to %s", payload_output)
+                count = _write_payloads(payload_output, journal.iter_payloads())
+                logging.info("Saved %d payloads to %s", count, payload_output)
 
         elif step == "parse":
-            if payload_input:
-                payloads = _read_payloads_from_jsonl(payload_input)
+            if parse_mode == "pushdown":
+                if payload_input:
+                    raise ValueError("--parse-mode pushdown parses return_fact_llm; drop --payload-input")
+                report.payloads = step_parse_pushdown(
+                    doris,
+                    shard=shard,
+                    since=parse_since,
+                    review_id_from=review_id_from,
+                    review_id_to=review_id_to,
+                    refresh_rollups=refresh_rollups,
+                    verify_sample=verify_sample,
+                    batch_size=write_batch_size,
+                )
+            elif payload_input:
+                payloads = _read_payloads_from_jsonl(payload_input, shard)
                 logging.info("Loaded %d payloads from %s", len(payloads), payload_input)
-                step_parse_payloads(doris, payloads=payloads)
+                report.payloads = step_parse_payloads(
+                    doris,
+                    payloads=payloads,
+                    batch_size=write_batch_size,
+                    writer=writer,
+                    refresh_rollups=refresh_rollups,
+                )
             else:
-                step_parse_payloads(doris, payloads=None, limit_from_db=limit)
+                report.payloads = step_parse_payloads(
+                    doris,
+                    payloads=None,
+                    limit_from_db=limit,
+                    batch_size=write_batch_size,
+                    writer=writer,
+                    shard=shard,
+                    refresh_rollups=refresh_rollups,
+                )
 
         elif step == "raw":
             if not payload_input:
                 raise ValueError("--payload-input is required for --step raw")
-            payloads = _read_payloads_from_jsonl(payload_input)
+            payloads = _read_payloads_from_jsonl(payload_input, shard)
             logging.info("Loaded %d payloads from %s", len(payloads), payload_input)
-            step_write_raw_from_cache(doris, payloads)
+            report.payloads = step_write_raw_from_cache(
+                doris,
+                payloads,
+                batch_size=write_batch_size,
+                writer=writer,
+                stamp=LedgerStamp(model=cfg.deepseek.model),
+            )
+
+        elif step == "ledger-backfill":
+            step_backfill_status(doris, reset_attempts=reset_attempts)
+
+        elif step == "prune-eval":
+            tag_library = _tag_library()
+            if payload_input:
+                payloads = _read_payloads_from_jsonl(payload_input, shard)
+            else:
+                payloads = doris.fetch_payloads(limit=limit, shard=shard)
+            prune_top_k = prune_top_k or 12
+            # Keep the evaluated reviews' own evidence out of the index.
+            pruner = _make_pruner(tag_library, exclude_review_ids={p.review_id for p in payloads})
+            step_evaluate_pruning(pruner, payloads)
+            report.payloads = len(payloads)
 
         elif step == "all":
-            candidates = step_fetch_candidates(doris, limit, country=country, fasin=fasin)
-            tag_library = doris.fetch_dim_tag_map(filters=[f.__dict__ for f in cfg.tag_filters])
-            payloads = step_call_llm(
-                candidates,
-                deepseek,
-                doris,
-                tag_library,
-                prompt_text,
-                request_log_path=llm_request_output,
+            tag_library = _tag_library()
+            if page_size:
+                candidate_chunks = batched(
+                    itertools.chain.from_iterable(
+                        step_stream_candidates(
+                            doris,
+                            page_size,
+                            limit or None,
+                            country=country,
+                            fasin=fasin,
+                            after=resume_after,
+                            shard=shard,
+                        )
+                    ),
+                    chunk_size,
+                )
+            else:
+                candidate_chunks = chunks(
+                    step_fetch_candidates(doris, limit, country=country, fasin=fasin, shard=shard), chunk_size
+                )
+            # Writer stages run on their own threads, so each gets its own connection.
+            raw_doris = DorisClient(cfg.doris)
+            details_doris = DorisClient(cfg.doris)
+            raw_writer = _make_writer(writer_kind, cfg, raw_doris, run_id)
+            details_writer = _make_writer(writer_kind, cfg, details_doris, run_id)
+            stamp = LedgerStamp(deepseek.model, prompt_fingerprint(prompt_text, tag_library))
+
+            def _write_raw(payloads: List[LLMPayload]) -> None:
+                raw_writer.upsert_return_fact_llm_bulk(payloads, batch_size=write_batch_size)
+                record_status(raw_doris, payloads, stamp, batch_size=write_batch_size)
+
+            def _record_failed(failures: List[Tuple[str, str]]) -> None:
+                # "failed" counts toward MAX_ATTEMPTS; transient "error"s do not.
+                raw_doris.upsert_llm_status_bulk(
+                    failures,
+                    stamp.model,
+                    stamp.prompt_fingerprint,
+                    batch_size=write_batch_size,
+                )
+
+            def _write_details(payloads: List[LLMPayload]) -> None:
+                details_writer.insert_return_fact_details_bulk(payloads, batch_size=write_batch_size)
+                if refresh_rollups:
+                    step_refresh_rollups(details_doris, payloads)
+
+            call_llm = functools.partial(
+                step_call_llm,
+                deepseek=deepseek,
+                doris=doris,
+                tag_library=tag_library,
+                prompt_text=prompt_text,
+                request_log=request_log,
+                write_to_db=False,
+                concurrency=concurrency,
+                batch_size=batch_size,
+                batch_token_budget=batch_token_budget,
+                cache=cache,
+                cache_only=cache_mode == "only",
+                dedup_threshold=dedup_threshold,
+                scheduler=scheduler,
+                pruner=_make_pruner(tag_library),
+                classifier=classifier,
             )
-            step_parse_payloads(doris, payloads=payloads)
+
+            def annotate_chunk(chunk: List[CandidateReview]) -> AnnotatedChunk:
+                failures: List[Tuple[str, str]] = []
+                payloads = call_llm(chunk, failures=failures)
+                return AnnotatedChunk(payloads, failures)
+
+            try:
+                streaming_report = run_streaming_pipeline(
+                    candidate_chunks,
+                    annotate_chunk,
+                    _write_raw,
+                    _write_details,
+                    buffer_chunks=buffer_chunks,
+                    record_failed=_record_failed,
+                )
+                streaming_report.log()
+                report.candidates = streaming_report.stages["fetch"].items
+                report.payloads = streaming_report.stages["annotate"].items
+            finally:
+                # With the SQL writer, the writer *is* the connection; close each object once.
+                for client in {id(c): c for c in (raw_writer, details_writer, raw_doris, details_doris)}.values():
+                    client.close()
 
         else:
             raise ValueError(f"Unsupported step: {step}")
 
+        report.add_usage(deepseek.usage_snapshot())
+        report.wall_seconds = time.monotonic() - started
+        METRICS.observe("run_seconds", report.wall_seconds)
+        report.metrics = METRICS.snapshot()
+        report.log()
+        if run_report:
+            report.write(run_report)
+        succeeded = True
+
     finally:
+        if metrics_textfile:
+            # Failed runs are exported too, so an alert can fire on runs_total{outcome="error"}.
+            METRICS.inc("runs_total", outcome="ok" if succeeded else "error")
+            labels = {"step": step, **({"shard": str(shard)} if shard else {})}
+            write_prometheus(metrics_textfile, METRICS.snapshot(), extra_labels=labels)
+        if request_log is not None:
+            request_log.close()
+        if cache is not None:
+            cache.close()
+        if writer is not None:
+            writer.close()
+        deepseek.close()
         doris.close()
 
 
@@ -174,7 +486,7 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "--step",
-        choices=["candidates", "llm", "parse", "raw", "all"],
+        choices=["candidates", "llm", "parse", "raw", "all", "ledger-backfill", "prune-eval"],
         required=True,
         help="Which step to run.",
     )
@@ -192,22 +504,22 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--candidate-output",
         type=Path,
-        help="When running 'candidates' step, optional JSONL destination.",
+        help="When running 'candidates' step, optional JSONL (or .parquet/.arrow) destination.",
     )
     parser.add_argument(
         "--candidate-input",
         type=Path,
-        help="When running 'llm' step, optional JSONL source of candidates.",
+        help="When running 'llm' step, optional JSONL (or .parquet/.arrow) source of candidates.",
     )
     parser.add_argument(
         "--payload-output",
         type=Path,
-        help="When running 'llm' step, optional JSONL destination for payloads.",
+        help="When running 'llm' step, optional JSONL (or .parquet/.arrow) destination for payloads.",
     )
     parser.add_argument(
         "--payload-input",
         type=Path,
-        help="When running 'parse' step, optional JSONL source of payloads.",
+        help="When running 'parse' step, optional JSONL (or .parquet/.arrow) source of payloads.",
     )
     parser.add_argument(
         "--prompt-file",
@@ -218,13 +530,233 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--llm-request-output",
         type=Path,
-        help="Optional JSONL file to log request bodies sent to DeepSeek.",
+        help="Optional log of request bodies sent to DeepSeek. Each distinct system message is stored "
+        "once per segment; end the path in .gz or .zst to compress. Segments are numbered "
+        "(requests.00001.jsonl.gz, ...); read them back with scripts.rehydrate_requests.",
+    )
+    parser.add_argument(
+        "--request-log-max-mb",
+        type=int,
+        default=256,
+        help="Start a new --llm-request-output segment once the current one reaches this size.",
     )
     parser.add_argument(
         "--skip-db-write",
         action="store_true",
         help="When running --step llm, avoid writing payloads into Doris (only emit JSONL).",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Max DeepSeek requests in flight; the limit adapts down on 429/5xx/latency spikes.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Max reviews packed into one DeepSeek request (shares a single tag_library).",
+    )
+    parser.add_argument(
+        "--batch-token-budget",
+        type=int,
+        default=8000,
+        help="Cap on estimated input + output tokens of the reviews packed into one request "
+        "(excluding the shared system prefix).",
+    )
+    parser.add_argument(
+        "--tokens-per-minute",
+        type=int,
+        help="Pace requests so estimated tokens (system prefix + reviews + output) stay under this per minute.",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="For --step llm/all: dry run that prints request count, token, cost and time "
+        "estimates without calling DeepSeek or writing anything.",
+    )
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument(
+        "--cache",
+        dest="cache_mode",
+        action="store_const",
+        const="on",
+        help="Reuse and store annotations in the local cache. Off by default, so a re-run with "
+        "a changed prompt or model always fetches fresh labels unless asked otherwise.",
+    )
+    cache_group.add_argument(
+        "--no-cache",
+        dest="cache_mode",
+        action="store_const",
+        const="off",
+        help="Always call DeepSeek and leave the local cache untouched (default).",
+    )
+    cache_group.add_argument(
+        "--cache-only",
+        dest="cache_mode",
+        action="store_const",
+        const="only",
+        help="Never call DeepSeek; only emit reviews already in the local cache.",
+    )
+    parser.set_defaults(cache_mode="off")
+    parser.add_argument(
+        "--cache-path",
+        type=Path,
+        default=Path("cache/annotations.sqlite"),
+        help="SQLite file backing the annotation cache.",
+    )
+    parser.add_argument(
+        "--refresh-rollups",
+        action="store_true",
+        help="After writing return_fact_details (--step parse/all), re-aggregate the tag rollup "
+        "groups touched by the parsed reviews (tables in schema.sql/return_tag_rollup.sql).",
+    )
+    parser.add_argument(
+        "--reset-attempts",
+        action="store_true",
+        help=f"With --step ledger-backfill: zero attempt_count of empty/failed reviews that reached "
+        f"{MAX_ATTEMPTS} attempts, so the snapshot view offers them to the LLM again.",
+    )
+    parser.add_argument(
+        "--parse-mode",
+        choices=["python", "pushdown"],
+        default="python",
+        help="For --step parse: 'python' decodes payloads locally and writes rows back; 'pushdown' "
+        "explodes the return_fact_llm payloads in scope inside Doris with one INSERT ... SELECT "
+        "(--limit does not apply; scope with --parse-since / --review-id-from / --review-id-to / --shard).",
+    )
+    parser.add_argument(
+        "--parse-since",
+        type=str,
+        help="With --parse-mode pushdown: only payloads with return_fact_llm.created_at >= this "
+        "watermark (the run logs the next one).",
+    )
+    parser.add_argument("--review-id-from", type=str, help="With --parse-mode pushdown: lowest review_id.")
+    parser.add_argument("--review-id-to", type=str, help="With --parse-mode pushdown: highest review_id.")
+    parser.add_argument(
+        "--verify-sample",
+        type=int,
+        default=0,
+        help="With --parse-mode pushdown: re-parse N payloads of the scope in Python and report "
+        "return_fact_details rows that differ.",
+    )
+    parser.add_argument(
+        "--tag-cache-dir",
+        type=Path,
+        default=Path("cache/tag_library"),
+        help="Local cache of the filtered return_dim_tag library; reused while a cheap "
+        "count/version/max(updated_at) probe shows the dimension unchanged.",
+    )
+    parser.add_argument(
+        "--no-tag-cache",
+        action="store_true",
+        help="Always query the full tag dimension and leave the tag library cache untouched.",
+    )
+    parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        help="Collapse exact and near-duplicate reviews (MinHash Jaccard >= threshold, "
+        "e.g. 0.9; 1.0 = exact only) and annotate one representative per group.",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        default="INFO",
+        help="Logging level; DEBUG also logs DeepSeek response previews.",
+    )
+    parser.add_argument(
+        "--write-batch-size",
+        type=int,
+        default=500,
+        help="Payloads per multi-row INSERT into return_fact_llm / return_fact_details.",
+    )
+    parser.add_argument(
+        "--writer",
+        choices=["sql", "stream-load"],
+        default="sql",
+        help="Write path for return_fact_llm/return_fact_details: MySQL-protocol INSERTs "
+        "or Doris HTTP Stream Load (uses doris.http_port).",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=200,
+        help="For --step all: reviews per chunk flowing between the overlapped stages.",
+    )
+    parser.add_argument(
+        "--buffer-chunks",
+        type=int,
+        default=2,
+        help="For --step all: max chunks queued between two stages (backpressure bound).",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        help="Stream candidates with keyset pagination on (review_date, review_id) in pages "
+        "of this size instead of a single LIMIT query; with it, --limit 0 means the whole snapshot.",
+    )
+    parser.add_argument(
+        "--resume-after",
+        type=parse_resume_key,
+        help="With --page-size, continue strictly after this key: '<review_date>,<review_id>' "
+        "(as logged by a previous run).",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        help="For --step llm: continue a previous run, skipping review_ids already in its journal.",
+    )
+    parser.add_argument(
+        "--runs-dir",
+        type=Path,
+        default=Path("runs"),
+        help="Where --step llm keeps per-run journals and checkpoints.",
+    )
+    parser.add_argument(
+        "--shard",
+        type=Shard.parse,
+        help="Only handle reviews with crc32(review_id) %% N == i, given as 'i/N' (0-based); "
+        "applied to the candidate/payload queries and JSONL inputs so parallel workers never overlap.",
+    )
+    parser.add_argument(
+        "--run-report",
+        type=Path,
+        help="Write a JSON summary of this invocation (counts, token usage, wall time, and per-stage "
+        "latency histograms, retries, DB statements and rows written under 'metrics').",
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        type=Path,
+        help="Also write the metrics in Prometheus text format (e.g. into the node exporter "
+        "textfile collector directory as amz_return.prom); written atomically at exit.",
+    )
+    parser.add_argument(
+        "--prune-tags",
+        type=int,
+        metavar="K",
+        help="Send each review only its top-K tags by local TF-IDF retrieval (plus near ties, "
+        "see --prune-margin) instead of the full tag library.",
+    )
+    parser.add_argument(
+        "--prune-margin",
+        type=float,
+        default=0.2,
+        help="Recall safety margin for --prune-tags: also keep tags scoring within this fraction "
+        "of the K-th best score (0 = strict top-K).",
+    )
+    parser.add_argument(
+        "--prune-evidence-per-tag",
+        type=int,
+        default=200,
+        help="Historical evidence snippets per tag from return_fact_details used by the pruning index "
+        "(0 = tag definitions only).",
+    )
+    parser.add_argument(
+        "--classifier",
+        type=Path,
+        help="Local classifier artifact (see scripts.tag_classifier): reviews it is confident about "
+        "are auto-labelled without calling DeepSeek.",
+    )
     return parser.parse_args()
 
 
@@ -246,4 +778,37 @@ if __name__ == "__main__":
         prompt_text=prompt_text,
         llm_request_output=args.llm_request_output,
         skip_db_write=args.skip_db_write,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        batch_token_budget=args.batch_token_budget,
+        cache_mode=args.cache_mode,
+        cache_path=args.cache_path,
+        dedup_threshold=args.dedup_threshold,
+        log_level=args.log_level,
+        write_batch_size=args.write_batch_size,
+        writer_kind=args.writer,
+        chunk_size=args.chunk_size,
+        buffer_chunks=args.buffer_chunks,
+        page_size=args.page_size,
+        resume_after=args.resume_after,
+        resume=args.resume,
+        runs_dir=args.runs_dir,
+        shard=args.shard,
+        run_report=args.run_report,
+        plan=args.plan,
+        tokens_per_minute=args.tokens_per_minute,
+        prune_top_k=args.prune_tags,
+        prune_margin=args.prune_margin,
+        prune_evidence_per_tag=args.prune_evidence_per_tag,
+        classifier_path=args.classifier,
+        request_log_max_mb=args.request_log_max_mb,
+        metrics_textfile=args.metrics_textfile,
+        tag_cache_dir=None if args.no_tag_cache else args.tag_cache_dir,
+        refresh_rollups=args.refresh_rollups,
+        parse_mode=args.parse_mode,
+        parse_since=args.parse_since,
+        review_id_from=args.review_id_from,
+        review_id_to=args.review_id_to,
+        verify_sample=args.verify_sample,
+        reset_attempts=args.reset_attempts,
     )
@@ -0,0 +1,68 @@
+"""
+Rebuild full DeepSeek request bodies from a compact `--llm-request-output` log.
+
+    python -m scripts.rehydrate_requests runs/requests.jsonl.gz --output audit/requests.jsonl
+    python -m scripts.rehydrate_requests runs/requests.jsonl.gz --review-id R384TSBX2ZQOS
+    python -m scripts.rehydrate_requests runs/requests.jsonl.gz --stats
+
+The path is the one given to `--llm-request-output` (all its segments are read) or a
+single segment file. Output is one complete request body per line, exactly as sent.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from pipeline.codec import dumps_bytes, write_jsonl
+from pipeline.request_log import iter_requests, request_review_ids, segment_paths
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rehydrate full request bodies from a compact request log.")
+    parser.add_argument("path", type=Path, help="--llm-request-output path or one of its segments.")
+    parser.add_argument("--output", type=Path, help="JSONL destination (default: stdout).")
+    parser.add_argument(
+        "--review-id",
+        action="append",
+        help="Only requests that carry this review_id (repeatable).",
+    )
+    parser.add_argument("--limit", type=int, help="Stop after this many requests.")
+    parser.add_argument("--stats", action="store_true", help="Only print request/system message counts.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if not args.path.exists() and not segment_paths(args.path):
+        parser.error(f"No request log at {args.path}")
+    wanted = set(args.review_id or ())
+
+    def _selected():
+        count = 0
+        for body in iter_requests(args.path):
+            if wanted and not wanted.intersection(request_review_ids(body)):
+                continue
+            yield body
+            count += 1
+            if args.limit and count >= args.limit:
+                return
+
+    if args.stats:
+        requests = reviews = 0
+        systems = set()
+        for body in _selected():
+            requests += 1
+            reviews += len(request_review_ids(body))
+            systems.update(m["content"] for m in body["messages"] if m.get("role") == "system")
+        logging.info("%d requests, %d reviews, %d distinct system messages", requests, reviews, len(systems))
+    elif args.output:
+        count = write_jsonl(args.output, _selected())
+        logging.info("Wrote %d request bodies to %s", count, args.output)
+    else:
+        for body in _selected():
+            sys.stdout.buffer.write(dumps_bytes(body) + b"\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
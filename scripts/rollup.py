@@ -0,0 +1,133 @@
+"""
+Maintain and query the weekly tag rollups (schema.sql/return_tag_rollup.sql).
+
+refresh  - rebuild the rollup groups of given review_ids, or of every parsed review
+           (--all, optionally --since); parse runs keep them current with --refresh-rollups.
+top-tags - most frequent tags (or categories) and their share of parsed reviews.
+trend    - weekly count and share of one tag, one category or all tags.
+
+    python -m scripts.rollup refresh --all --since 2025-09-01
+    python -m scripts.rollup top-tags --country US --fasin B0BGHGXYJX --since 2025-10-01
+    python -m scripts.rollup trend --tag FIT_COMPAT --fasin B0BGHGXYJX --json
+
+Queries read only the rollup tables, never return_fact_details.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+from typing import Any, Dict, List
+
+from pipeline.config import load_config
+from pipeline.doris_client import DorisClient
+
+
+def _print_table(rows: List[Dict[str, Any]], columns: List[str]) -> None:
+    cells = [[_cell(row.get(column)) for column in columns] for row in rows]
+    widths = [max([len(column)] + [len(line[index]) for line in cells]) for index, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for line in cells:
+        print("  ".join(value.ljust(width) for value, width in zip(line, widths)))
+
+
+def _cell(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:.1%}"
+    return "" if value is None else str(value)
+
+
+def cmd_refresh(args: argparse.Namespace, doris: DorisClient) -> None:
+    if args.all:
+        synced = doris.sync_review_attrs(since=args.since)
+        groups = doris.rollup_groups(since=args.since)
+    else:
+        synced = doris.sync_review_attrs(args.review_id)
+        groups = doris.rollup_groups(args.review_id)
+    logging.info("Synced attributes of %d reviews into return_review_attr", synced)
+    rebuilt = doris.rebuild_rollup_groups(groups, batch_size=args.batch_size)
+    logging.info("Rebuilt %d rollup groups (country, fasin, week)", rebuilt)
+
+
+def cmd_top_tags(args: argparse.Namespace, doris: DorisClient) -> None:
+    rows = doris.rollup_top_tags(
+        country=args.country,
+        fasin=args.fasin,
+        since=args.since,
+        until=args.until,
+        review_source=args.review_source,
+        category=args.category,
+        by=args.by,
+        limit=args.limit,
+    )
+    columns = ["tag_code", "tag_name_cn", "category_name_cn"] if args.by == "tag" else ["category_name_cn"]
+    _emit(args, rows, columns + ["reviews", "negative_reviews", "share"])
+
+
+def cmd_trend(args: argparse.Namespace, doris: DorisClient) -> None:
+    rows = doris.rollup_tag_trend(
+        tag_code=args.tag,
+        category=args.category,
+        country=args.country,
+        fasin=args.fasin,
+        since=args.since,
+        until=args.until,
+        review_source=args.review_source,
+    )
+    _emit(args, rows, ["week_start", "reviews", "negative_reviews", "parsed_reviews", "share"])
+
+
+def _emit(args: argparse.Namespace, rows: List[Dict[str, Any]], columns: List[str]) -> None:
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, default=str))
+    else:
+        _print_table(rows, columns)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Maintain and query the weekly tag rollups.")
+    parser.add_argument("--config", default="config/environment.yaml", help="Path to YAML config file.")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    refresh = sub.add_parser("refresh", help="Rebuild rollup groups from return_fact_details.")
+    target = refresh.add_mutually_exclusive_group(required=True)
+    target.add_argument("--review-id", action="append", help="Rebuild the groups of this review (repeatable).")
+    target.add_argument("--all", action="store_true", help="Rebuild every group with parsed reviews.")
+    refresh.add_argument("--since", help="With --all: only reviews dated on or after YYYY-MM-DD.")
+    refresh.add_argument("--batch-size", type=int, default=200, help="Groups per DELETE/INSERT statement.")
+
+    def _filter_args(p: argparse.ArgumentParser) -> None:
+        p.add_argument("--country", help="Country filter, e.g. US.")
+        p.add_argument("--fasin", help="Parent ASIN filter.")
+        p.add_argument("--since", help="First week (week_start >= YYYY-MM-DD).")
+        p.add_argument("--until", help="Last week (week_start <= YYYY-MM-DD).")
+        p.add_argument(
+            "--review-source",
+            type=int,
+            choices=[0, 1, 2],
+            help="0 return comments, 1 buyer voice, 2 reviews.",
+        )
+        p.add_argument("--category", help="Only tags of this category_name_cn.")
+        p.add_argument("--json", action="store_true", help="Print rows as JSON instead of a table.")
+
+    top = sub.add_parser("top-tags", help="Most frequent tags and their share of parsed reviews.")
+    _filter_args(top)
+    top.add_argument("--by", choices=["tag", "category"], default="tag", help="Rank tags or categories.")
+    top.add_argument("--limit", type=int, default=10)
+
+    trend = sub.add_parser("trend", help="Weekly count and share of a tag or category.")
+    _filter_args(trend)
+    trend.add_argument("--tag", help="tag_code to follow (default: all tags).")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(message)s")
+    commands = {"refresh": cmd_refresh, "top-tags": cmd_top_tags, "trend": cmd_trend}
+    doris = DorisClient(load_config(args.config).doris)
+    try:
+        commands[args.command](args, doris)
+    finally:
+        doris.close()
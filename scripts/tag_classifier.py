@@ -0,0 +1,201 @@
+"""
+Local fast-path tag classifier: train / evaluate / serve.
+
+train    - fit hashed n-gram logistic models on historical return_fact_details rows (or a
+           payload JSONL) and save the artifact with per-tag precision thresholds.
+evaluate - compare auto-labels with the LLM's labels on the held-out test split.
+serve    - split candidates into auto-labelled payloads and the uncertain rest, which can be
+           fed to `scripts.pipeline --step llm --candidate-input`.
+
+The same artifact plugs into the pipeline directly with `--classifier PATH`.
+Requires the optional extras: pip install numpy scikit-learn
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, List
+
+from pipeline.classifier import TagClassifier, split_of
+from pipeline.config import load_config
+from pipeline.doris_client import DorisClient
+from pipeline.ledger import LedgerStamp
+from pipeline.models import LLMPayload
+from pipeline.steps import record_status
+from scripts.pipeline import (
+    _read_candidates_from_jsonl,
+    _read_payloads_from_jsonl,
+    _write_candidates,
+    _write_payloads,
+)
+
+DEFAULT_MODEL_PATH = Path("models/tag_classifier.pkl")
+
+
+def _parse_overrides(items: List[str] | None) -> Dict[str, float]:
+    overrides: Dict[str, float] = {}
+    for item in items or []:
+        code, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Expected TAG_CODE=VALUE, got {item!r}")
+        overrides[code] = float(value)
+    return overrides
+
+
+def _load_payloads(args: argparse.Namespace, doris_factory) -> List[LLMPayload]:
+    if args.payload_input:
+        payloads = _read_payloads_from_jsonl(args.payload_input)
+        logging.info("Loaded %d payloads from %s", len(payloads), args.payload_input)
+        return payloads
+    doris = doris_factory()
+    try:
+        payloads = doris.fetch_labelled_payloads(limit=args.max_rows)
+    finally:
+        doris.close()
+    logging.info("Loaded %d labelled reviews from return_fact_details", len(payloads))
+    return payloads
+
+
+def cmd_train(args: argparse.Namespace, doris_factory) -> None:
+    payloads = _load_payloads(args, doris_factory)
+    model = TagClassifier.train(
+        payloads,
+        target_precision=args.target_precision,
+        min_support=args.min_support,
+        regularization=args.regularization,
+        n_features=2**args.hash_bits,
+        tag_precision=_parse_overrides(args.tag_precision),
+    )
+    model.reject_probability = args.reject_probability
+    model.min_sentiment_confidence = args.min_sentiment_confidence
+    model.save(args.model)
+    for code in model.tags:
+        threshold = model.thresholds[code]
+        logging.info(
+            "  %-24s support %5d  threshold %s",
+            code,
+            model.metadata["support"][code],
+            f"{threshold:.3f}" if threshold <= 1 else "disabled",
+        )
+    logging.info("Saved classifier to %s", args.model)
+    model.evaluate([p for p in payloads if split_of(p.review_id) == "test"]).log()
+
+
+def cmd_evaluate(args: argparse.Namespace, doris_factory) -> None:
+    model = TagClassifier.load(args.model)
+    model.set_thresholds(_parse_overrides(args.threshold))
+    payloads = _load_payloads(args, doris_factory)
+    if not args.all_rows:
+        payloads = [p for p in payloads if split_of(p.review_id) == "test"]
+    model.evaluate(payloads).log()
+
+
+def cmd_serve(args: argparse.Namespace, doris_factory) -> None:
+    model = TagClassifier.load(args.model)
+    model.set_thresholds(_parse_overrides(args.threshold))
+    doris = doris_factory()
+    try:
+        cfg = load_config(args.config, tag_filter_path="config/tag_filters.yaml")
+        tag_library = doris.fetch_dim_tag_map(filters=[f.__dict__ for f in cfg.tag_filters])
+        if args.candidate_input:
+            candidates = _read_candidates_from_jsonl(args.candidate_input)
+        else:
+            candidates = doris.fetch_candidates(limit=args.limit, country=args.country, fasin=args.fasin)
+        predictions = model.predict(candidates, tag_library)
+        labelled = [payload for payload in predictions if payload is not None]
+        uncertain = [review for review, payload in zip(candidates, predictions) if payload is None]
+        logging.info(
+            "Auto-labelled %d of %d candidates; %d uncertain", len(labelled), len(candidates), len(uncertain)
+        )
+        if args.write_db and labelled:
+            doris.upsert_return_fact_llm_bulk(labelled)
+            record_status(doris, labelled, LedgerStamp(model="local-classifier"))
+            doris.insert_return_fact_details_bulk(labelled)
+    finally:
+        doris.close()
+    if args.payload_output:
+        _write_payloads(args.payload_output, labelled)
+        logging.info("Saved %d auto-labelled payloads to %s", len(labelled), args.payload_output)
+    if args.candidate_output:
+        _write_candidates(args.candidate_output, uncertain)
+        logging.info("Saved %d uncertain candidates to %s", len(uncertain), args.candidate_output)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Train, evaluate and serve the local tag classifier.")
+    parser.add_argument("--config", default="config/environment.yaml", help="Path to YAML config file.")
+    parser.add_argument("--model", type=Path, default=DEFAULT_MODEL_PATH, help="Classifier artifact path.")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def _data_args(p: argparse.ArgumentParser) -> None:
+        p.add_argument(
+            "--payload-input",
+            type=Path,
+            help="Labelled payload JSONL instead of reading return_fact_details.",
+        )
+        p.add_argument(
+            "--max-rows",
+            type=int,
+            default=200_000,
+            help="Max return_fact_details rows to read.",
+        )
+
+    train = sub.add_parser("train", help="Fit the model and save the artifact.")
+    _data_args(train)
+    train.add_argument(
+        "--target-precision",
+        type=float,
+        default=0.95,
+        help="Per-tag precision the auto-label thresholds are calibrated for.",
+    )
+    train.add_argument(
+        "--tag-precision",
+        action="append",
+        metavar="TAG_CODE=P",
+        help="Override --target-precision for one tag (repeatable).",
+    )
+    train.add_argument("--min-support", type=int, default=20, help="Min training reviews for a tag to get a model.")
+    train.add_argument("--regularization", type=float, default=4.0, help="Inverse L2 strength (C).")
+    train.add_argument("--hash-bits", type=int, default=16, help="log2 of hashed features per n-gram family.")
+    train.add_argument(
+        "--reject-probability",
+        type=float,
+        default=0.3,
+        help="A review is uncertain if any non-selected tag scores at least this.",
+    )
+    train.add_argument(
+        "--min-sentiment-confidence",
+        type=float,
+        default=0.7,
+        help="A review is uncertain if its sentiment probability is below this.",
+    )
+
+    evaluate = sub.add_parser("evaluate", help="Measure coverage and precision against LLM labels.")
+    _data_args(evaluate)
+    evaluate.add_argument("--all-rows", action="store_true", help="Evaluate on every row, not only the test split.")
+    evaluate.add_argument("--threshold", action="append", metavar="TAG_CODE=T", help="Override a tag threshold.")
+
+    serve = sub.add_parser("serve", help="Auto-label candidates and emit the uncertain rest.")
+    serve.add_argument("--candidate-input", type=Path, help="Candidate JSONL instead of the snapshot view.")
+    serve.add_argument("--limit", type=int, default=200, help="Max candidates read from the view.")
+    serve.add_argument("--country", type=str, help="Optional country filter.")
+    serve.add_argument("--fasin", type=str, help="Optional parent ASIN filter.")
+    serve.add_argument("--payload-output", type=Path, help="JSONL destination for auto-labelled payloads.")
+    serve.add_argument("--candidate-output", type=Path, help="JSONL destination for uncertain candidates.")
+    serve.add_argument(
+        "--write-db",
+        action="store_true",
+        help="Also write auto-labelled payloads to return_fact_llm/return_fact_details.",
+    )
+    serve.add_argument("--threshold", action="append", metavar="TAG_CODE=T", help="Override a tag threshold.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(message)s")
+    commands = {"train": cmd_train, "evaluate": cmd_evaluate, "serve": cmd_serve}
+    # Connect lazily: training and evaluation from --payload-input need no database.
+    commands[args.command](args, lambda: DorisClient(load_config(args.config).doris))
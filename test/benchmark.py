@@ -0,0 +1,293 @@
+"""
+Offline throughput benchmark: runs pipeline steps against local stand-ins for DeepSeek
+(test/fake_deepseek.py) and Doris (test/fake_doris.py, SQLite) at several data sizes.
+
+    python test/benchmark.py --sizes 1000 10000 --steps candidates llm parse all \
+        --latency 0.05 --concurrency 16 --output runs/bench-baseline.json
+    python test/benchmark.py --sizes 1000 10000 --compare runs/bench-baseline.json
+
+Every (step, size) scenario runs in a fresh worker process on a freshly seeded SQLite
+database, so peak RSS and statement counts belong to that scenario alone. Reported per
+scenario: reviews/sec, wall time, p50/p95 DeepSeek request latency, HTTP retries, peak
+RSS, DB statements by verb and rows in the output tables. Results are saved as JSON;
+with --compare, throughput or p95 regressions beyond --tolerance exit non-zero.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+HERE = Path(__file__).resolve().parent
+for path in (ROOT, HERE):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+from fake_doris import SQLiteDorisClient, create_database  # noqa: E402
+
+# parse-pushdown: --step parse --parse-mode pushdown
+STEPS = ("candidates", "llm", "parse", "parse-pushdown", "all")
+_OUTPUT_TABLES = ("return_fact_llm", "return_fact_details", "return_llm_status")
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+# ----------------------------------------------------------------------
+# Worker: one scenario in this process
+# ----------------------------------------------------------------------
+def run_worker(args: argparse.Namespace) -> Dict[str, Any]:
+    import scripts.pipeline as cli
+    from pipeline.transport import HttpTransport
+
+    workdir = args.workdir
+    config_path = workdir / "environment.yaml"
+    config_path.write_text(
+        json.dumps(
+            {
+                "doris": {
+                    "host": "sqlite",
+                    "port": 0,
+                    "database": str(workdir / "doris.sqlite"),
+                    "username": "bench",
+                    "password": "bench",
+                },
+                "deepseek": {
+                    "base_url": args.base_url,
+                    "api_key": "bench",
+                    "model": "fake-chat",
+                    "timeout": 30,
+                    "max_retries": 5,
+                    "pool_size": max(16, args.concurrency),
+                },
+            }
+        ),
+        encoding="utf-8",
+    )
+    cli.DorisClient = SQLiteDorisClient
+
+    latencies: List[float] = []
+    transports = set()
+    post_json = HttpTransport.post_json
+
+    def _timed_post_json(self, *call_args, **call_kwargs):
+        started = time.perf_counter()
+        try:
+            return post_json(self, *call_args, **call_kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+            transports.add(self)
+
+    HttpTransport.post_json = _timed_post_json
+    step, _, parse_mode = args.worker.partition("-")
+    SQLiteDorisClient.reset_statements()
+    started = time.perf_counter()
+    cli.run_step(
+        step=step,
+        config_path=str(config_path),
+        limit=args.size,
+        country=None,
+        fasin=None,
+        candidate_output=workdir / "candidates.jsonl" if args.worker == "candidates" else None,
+        candidate_input=None,
+        payload_output=None,
+        payload_input=None,
+        prompt_text=None,
+        llm_request_output=None,
+        skip_db_write=False,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        cache_mode="off",
+        log_level="WARNING",
+        page_size=args.page_size,
+        runs_dir=workdir / "runs",
+        # Per scenario, so every run measures a cold tag library load and the checkout stays clean.
+        tag_cache_dir=workdir / "tag_cache",
+        parse_mode=parse_mode or "python",
+    )
+    wall = time.perf_counter() - started
+
+    with sqlite3.connect(str(workdir / "doris.sqlite")) as conn:
+        rows = {table: conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in _OUTPUT_TABLES}
+    statements = dict(SQLiteDorisClient.statements)
+    return {
+        "step": args.worker,
+        "size": args.size,
+        "wall_seconds": round(wall, 3),
+        "reviews_per_second": round(args.size / wall, 1) if wall else None,
+        "llm_requests": len(latencies),
+        "latency_p50_ms": _ms(percentile(latencies, 50)),
+        "latency_p95_ms": _ms(percentile(latencies, 95)),
+        "http_retries": sum(t.retries for t in transports),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "db_statements": sum(statements.values()),
+        "db_statements_by_verb": statements,
+        "rows": rows,
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+# ----------------------------------------------------------------------
+# Driver
+# ----------------------------------------------------------------------
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_fake_deepseek(args: argparse.Namespace) -> tuple:
+    port = _free_port()
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            str(HERE / "fake_deepseek.py"),
+            "--port",
+            str(port),
+            "--latency",
+            str(args.latency),
+            "--jitter",
+            str(args.jitter),
+            "--error-rate",
+            str(args.error_rate),
+            "--throttle-rate",
+            str(args.throttle_rate),
+            "--response-chars",
+            str(args.response_chars),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    proc.stdout.readline()  # "Fake DeepSeek listening on ..."
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def run_scenario(args: argparse.Namespace, step: str, size: int, base_url: str) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        workdir = Path(tmp)
+        create_database(workdir / "doris.sqlite", reviews=size, with_payloads=step.startswith("parse"))
+        cmd = [
+            sys.executable,
+            str(Path(__file__).resolve()),
+            "--worker",
+            step,
+            "--size",
+            str(size),
+            "--workdir",
+            str(workdir),
+            "--base-url",
+            base_url,
+            "--concurrency",
+            str(args.concurrency),
+            "--batch-size",
+            str(args.batch_size),
+        ]
+        if args.page_size:
+            cmd += ["--page-size", str(args.page_size)]
+        proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{step} x {size} failed:\n{proc.stderr[-4000:]}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: Path, tolerance: float) -> int:
+    baseline = {(r["step"], r["size"]): r for r in json.loads(baseline_path.read_text(encoding="utf-8"))["results"]}
+    regressions = 0
+    print(f"\nCompared with {baseline_path} (tolerance {tolerance:.0%}):")
+    for result in results:
+        old = baseline.get((result["step"], result["size"]))
+        if old is None:
+            continue
+        notes = []
+        throughput = result["reviews_per_second"] / old["reviews_per_second"] - 1 if old["reviews_per_second"] else 0.0
+        notes.append(f"reviews/s {throughput:+.1%}")
+        if throughput < -tolerance:
+            notes[-1] += " REGRESSION"
+            regressions += 1
+        if result["latency_p95_ms"] and old.get("latency_p95_ms"):
+            p95 = result["latency_p95_ms"] / old["latency_p95_ms"] - 1
+            notes.append(f"p95 {p95:+.1%}" + (" REGRESSION" if p95 > tolerance else ""))
+            regressions += p95 > tolerance
+        notes.append(f"statements {result['db_statements'] - old['db_statements']:+d}")
+        print(f"  {result['step']:<14} {result['size']:>8}  " + ", ".join(notes))
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark pipeline steps against local DeepSeek/Doris stand-ins.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="Review counts to run.")
+    parser.add_argument("--steps", nargs="+", choices=STEPS, default=list(STEPS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--page-size", type=int, help="Pass --page-size to the pipeline (keyset paging).")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake DeepSeek seconds per request.")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake 503 responses.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of fake 429 responses.")
+    parser.add_argument("--response-chars", type=int, default=40, help="Fake review_cn/evidence length.")
+    parser.add_argument("--output", type=Path, help="Results JSON (default: runs/bench-<timestamp>.json).")
+    parser.add_argument("--compare", type=Path, help="Earlier results JSON to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression for --compare.")
+    # Internal: run one scenario in this process.
+    parser.add_argument("--worker", choices=STEPS, help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        return 0
+
+    server, base_url = _start_fake_deepseek(args)
+    results = []
+    try:
+        for size in args.sizes:
+            for step in args.steps:
+                result = run_scenario(args, step, size, base_url)
+                results.append(result)
+                print(
+                    f"{step:<14} {size:>8}  {result['reviews_per_second']:>9} reviews/s  "
+                    f"p50 {result['latency_p50_ms']} ms  p95 {result['latency_p95_ms']} ms  "
+                    f"rss {result['peak_rss_mb']} MB  statements {result['db_statements']}",
+                    flush=True,
+                )
+    finally:
+        server.terminate()
+        server.wait()
+
+    output = args.output or ROOT / "runs" / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    settings = {k: v for k, v in vars(args).items() if k not in ("worker", "size", "workdir", "base_url")}
+    output.write_text(
+        json.dumps(
+            {"created_at": datetime.now().isoformat(timespec="seconds"), "settings": settings, "results": results},
+            ensure_ascii=False,
+            indent=2,
+            default=str,
+        ),
+        encoding="utf-8",
+    )
+    print(f"Saved results to {output}")
+    return compare(results, args.compare, args.tolerance) if args.compare else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Ledger checks: the snapshot views' retry cap against pipeline.ledger.MAX_ATTEMPTS, and
+attempt counting of return_llm_status writes on the SQLite stand-in (test/fake_doris.py).
+
+    python test/check_ledger.py
+
+Run after changing MAX_ATTEMPTS or the `attempt_count < N` condition of
+schema.sql/view_return_review_snapshot.sql.
+"""
+from __future__ import annotations
+
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+for path in (ROOT, ROOT / "test"):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+from fake_doris import SCHEMA, SQLiteDorisClient, create_database
+from pipeline.config import DorisConfig
+from pipeline.ledger import MAX_ATTEMPTS, STATUS_ERROR, STATUS_FAILED
+
+_CAP = re.compile(r"attempt_count\s*<\s*(\d+)")
+
+
+def check_view_caps() -> None:
+    """Every `attempt_count < N` in the snapshot views equals MAX_ATTEMPTS."""
+    sources = {
+        "schema.sql/view_return_review_snapshot.sql": (ROOT / "schema.sql/view_return_review_snapshot.sql").read_text(
+            encoding="utf-8"
+        ),
+        "test/fake_doris.py": SCHEMA,
+    }
+    for name, text in sources.items():
+        caps = {int(cap) for cap in _CAP.findall(text)}
+        assert caps, f"{name}: no attempt_count cap found"
+        assert caps == {MAX_ATTEMPTS}, f"{name}: attempt_count cap {sorted(caps)} != MAX_ATTEMPTS {MAX_ATTEMPTS}"
+
+
+def check_error_status_keeps_attempts() -> None:
+    """A transient error never uses up an attempt; a failure does, up to the cap."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "ledger.sqlite"
+        create_database(path, reviews=2)
+        doris = SQLiteDorisClient(DorisConfig(host="", port=0, username="", password="", database=str(path)))
+        try:
+            review_id = doris.fetch_candidates(limit=1)[0].review_id
+            for _ in range(MAX_ATTEMPTS + 2):
+                doris.upsert_llm_status_bulk([(review_id, STATUS_ERROR)])
+            assert _attempts(doris, review_id) == 0
+            assert review_id in {review.review_id for review in doris.fetch_candidates(limit=10)}
+            for _ in range(MAX_ATTEMPTS):
+                doris.upsert_llm_status_bulk([(review_id, STATUS_FAILED)])
+            assert _attempts(doris, review_id) == MAX_ATTEMPTS
+            assert review_id not in {review.review_id for review in doris.fetch_candidates(limit=10)}
+        finally:
+            doris.close()
+
+
+def _attempts(doris: SQLiteDorisClient, review_id: str) -> int:
+    with doris._conn.cursor() as cur:
+        cur.execute("SELECT attempt_count FROM return_llm_status WHERE review_id = %s", (review_id,))
+        return cur.fetchall()[0]["attempt_count"]
+
+
+def main() -> int:
+    for check in (check_view_caps, check_error_status_keeps_attempts):
+        check()
+        print(f"ok   {check.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Circuit breaker checks for pipeline.transport.HttpTransport against a scripted local server.
+
+    python test/check_transport.py
+
+Each check queues the status codes the server answers with, then asserts on what the
+transport raised and how many requests actually reached the server.
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List
+
+import requests
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from pipeline.transport import CircuitBreaker, CircuitOpenError, HttpTransport
+
+RESET_SECONDS = 0.2
+
+
+class ScriptedServer(ThreadingHTTPServer):
+    """Answers POSTs with the queued status codes in order, then with 200."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.statuses: List[int] = []
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/chat/completions"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: ScriptedServer
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server naming
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.lock:
+            self.server.requests += 1
+            status = self.server.statuses.pop(0) if self.server.statuses else 200
+        body = b"{}"
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002 - http.server signature
+        pass
+
+
+def _transport() -> HttpTransport:
+    return HttpTransport(max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_seconds=RESET_SECONDS))
+
+
+def _post(transport: HttpTransport, server: ScriptedServer) -> requests.Response:
+    return transport.post_json(server.url, {}, {"ping": 1}, timeout=5)
+
+
+def _open_breaker(transport: HttpTransport, server: ScriptedServer) -> None:
+    server.statuses.append(503)
+    try:
+        _post(transport, server)
+    except requests.HTTPError:
+        pass
+    try:
+        _post(transport, server)
+    except CircuitOpenError:
+        pass
+    else:
+        raise AssertionError("breaker should be open after a 503")
+    time.sleep(RESET_SECONDS * 1.5)
+
+
+def check_throttled_probe_releases_breaker(server: ScriptedServer) -> None:
+    """half-open -> probe gets 429 -> the next call still reaches the server."""
+    transport = _transport()
+    _open_breaker(transport, server)
+    server.statuses.append(429)
+    before = server.requests
+    try:
+        _post(transport, server)
+    except requests.HTTPError as exc:
+        assert exc.response.status_code == 429
+    else:
+        raise AssertionError("a 429 probe with max_retries=0 should raise")
+    assert server.requests == before + 1, "the probe should have reached the server"
+    resp = _post(transport, server)
+    assert resp.status_code == 200
+    assert server.requests == before + 2, "the call after a 429 probe should reach the server"
+    # The 200 closed the breaker: further calls go straight through.
+    _post(transport, server)
+    assert server.requests == before + 3
+
+
+def check_client_error_probe_closes_breaker(server: ScriptedServer) -> None:
+    """half-open -> probe gets a non-retried 4xx -> the service is up, the breaker closes."""
+    transport = _transport()
+    _open_breaker(transport, server)
+    server.statuses.append(400)
+    try:
+        _post(transport, server)
+    except requests.HTTPError as exc:
+        assert exc.response.status_code == 400
+    else:
+        raise AssertionError("a 400 should raise")
+    assert _post(transport, server).status_code == 200
+
+
+def check_failed_probe_reopens_breaker(server: ScriptedServer) -> None:
+    """half-open -> probe gets a 503 -> open again until the next reset window."""
+    transport = _transport()
+    _open_breaker(transport, server)
+    server.statuses.append(503)
+    try:
+        _post(transport, server)
+    except requests.HTTPError:
+        pass
+    before = server.requests
+    try:
+        _post(transport, server)
+    except CircuitOpenError:
+        pass
+    else:
+        raise AssertionError("breaker should reopen after a failed probe")
+    assert server.requests == before, "an open breaker must not touch the network"
+
+
+def main() -> int:
+    server = ScriptedServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    checks = [
+        check_throttled_probe_releases_breaker,
+        check_client_error_probe_closes_breaker,
+        check_failed_probe_reopens_breaker,
+    ]
+    try:
+        for check in checks:
+            server.statuses.clear()
+            check(server)
+            print(f"ok   {check.__name__}")
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Local stand-in for the DeepSeek (OpenAI-compatible) chat completions endpoint.
+
+POST /chat/completions answers the pipeline's single-review and batch (`{"reviews": [...]}`)
+prompts with schema-valid payloads built from the tag_library in the system message:
+- `--latency` / `--jitter` seconds of simulated model time per request
+- `--error-rate` fraction of requests answered with 503 (exercises retries/backoff)
+- `--throttle-rate` fraction answered with 429 + Retry-After
+- `--response-chars` length of the generated review_cn / evidence text
+- a `usage` block with prompt, completion and prefix-cache hit token counts
+
+Run:
+    python test/fake_deepseek.py --port 8787 --latency 0.2 --error-rate 0.01
+then point config deepseek.base_url at http://127.0.0.1:8787.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+
+class FakeDeepSeekServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        response_chars: int = 40,
+    ):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.response_chars = response_chars
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        # sha256(system message) -> tag codes/names; also marks the prefix as cached.
+        self._libraries: Dict[str, List[Tuple[str, str]]] = {}
+
+    def library(self, system_message: str) -> Tuple[List[Tuple[str, str]], bool]:
+        digest = hashlib.sha256(system_message.encode("utf-8")).hexdigest()
+        with self.lock:
+            tags = self._libraries.get(digest)
+            cached = tags is not None
+            if tags is None:
+                try:
+                    library = json.loads(system_message).get("tag_library") or []
+                except (ValueError, AttributeError):
+                    library = []
+                tags = [(item["tag_code"], item.get("tag_name_cn", "")) for item in library]
+                self._libraries[digest] = tags
+        return tags, cached
+
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeDeepSeekServer
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server naming
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._reply(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        delay = max(0.0, server.latency + random.uniform(-server.jitter, server.jitter))
+        roll = random.random()
+        if roll < server.throttle_rate:
+            time.sleep(delay / 4)
+            self._error(429, "rate limited", {"Retry-After": "1"})
+            return
+        if roll < server.throttle_rate + server.error_rate:
+            time.sleep(delay / 4)
+            self._error(503, "injected failure")
+            return
+        try:
+            request = json.loads(body)
+            messages = {m["role"]: m["content"] for m in request["messages"]}
+            user = json.loads(messages["user"])
+        except (ValueError, KeyError, TypeError) as exc:
+            self._reply(400, {"error": {"message": f"bad request: {exc}"}})
+            return
+        tags, cached = server.library(messages.get("system", ""))
+        if isinstance(user, dict) and "reviews" in user:
+            content = {"results": [self._label(item, tags) for item in user["reviews"]]}
+        else:
+            content = self._label(user, tags)
+        text = json.dumps(content, ensure_ascii=False)
+        system_tokens = _tokens(messages.get("system", ""))
+        prompt_tokens = system_tokens + _tokens(messages["user"])
+        hit = system_tokens if cached else 0
+        time.sleep(delay)
+        self._reply(
+            200,
+            {
+                "id": f"fake-{server.requests}",
+                "object": "chat.completion",
+                "model": request.get("model", "fake"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": _tokens(text),
+                    "total_tokens": prompt_tokens + _tokens(text),
+                    "prompt_cache_hit_tokens": hit,
+                    "prompt_cache_miss_tokens": prompt_tokens - hit,
+                },
+            },
+        )
+
+    def _label(self, item: dict, tags: List[Tuple[str, str]]) -> dict:
+        review_en = str(item.get("review_en", ""))
+        rng = random.Random(str(item.get("review_id")))
+        filler = (review_en * (self.server.response_chars // max(1, len(review_en)) + 1))[: self.server.response_chars]
+        chosen = rng.sample(tags, min(len(tags), rng.randint(0, 3)))
+        return {
+            "review_id": item.get("review_id"),
+            "review_source": item.get("review_source"),
+            "review_en": review_en,
+            "review_cn": "译文：" + filler,
+            "sentiment": rng.choice((-1, 0, 1)),
+            "tags": [{"tag_code": code, "tag_name_cn": name, "evidence": filler} for code, name in chosen],
+        }
+
+    def _error(self, status: int, message: str, headers: Dict[str, str] | None = None) -> None:
+        with self.server.lock:
+            self.server.errors += 1
+        self._reply(status, {"error": {"message": message}}, headers)
+
+    def _reply(self, status: int, obj: dict, headers: Dict[str, str] | None = None) -> None:
+        data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:  # keep test output quiet
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake DeepSeek chat completions endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds of simulated model time per request.")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Uniform +/- jitter on --latency.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction answered with 429.")
+    parser.add_argument("--response-chars", type=int, default=40, help="Length of generated review_cn/evidence.")
+    args = parser.parse_args()
+    server = FakeDeepSeekServer(
+        (args.host, args.port),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        response_chars=args.response_chars,
+    )
+    print(f"Fake DeepSeek listening on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
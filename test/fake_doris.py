@@ -0,0 +1,361 @@
+"""
+SQLite-backed stand-in for pipeline.doris_client.DorisClient.
+
+`SQLiteDorisClient` subclasses the real client and only swaps the pymysql connection
+for an adapter over a SQLite file, so every DorisClient method runs its real SQL:
+- `%s` placeholders become `?`, INSERT becomes INSERT OR REPLACE (Unique Key semantics)
+- crc32 / MOD / now / to_monday / get_json_string / get_json_int / json_length are registered
+  as SQL functions; LATERAL VIEW explode_json_array_json_outer becomes a json_each join and
+  DELETE ... USING a correlated EXISTS
+- view_return_review_snapshot is a view over a `reviews` table anti-joined on the ledger,
+  view_return_review_attr the same table without the anti-join (copied into return_review_attr
+  for the tag rollups)
+Every executed statement is counted in `SQLiteDorisClient.statements` and recorded
+in pipeline.metrics like the real cursors do.
+
+The SQLite path comes from `doris.database` in the config, so the pipeline can be
+pointed at it without code changes other than the client class:
+
+    from fake_doris import SQLiteDorisClient, create_database   # with test/ on sys.path
+    create_database(Path("bench.sqlite"), reviews=10_000)
+"""
+from __future__ import annotations
+
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Sequence
+
+from pipeline.codec import encode_payload
+from pipeline.config import DorisConfig
+from pipeline.doris_client import DorisClient, record_statement
+from pipeline.models import LLMPayload, TagFragment
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    review_id TEXT PRIMARY KEY,
+    review_source INTEGER NOT NULL,
+    review_en TEXT NOT NULL,
+    review_date TEXT,
+    country TEXT,
+    fasin TEXT
+);
+CREATE TABLE IF NOT EXISTS return_fact_llm (
+    review_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS return_fact_details (
+    review_id TEXT NOT NULL,
+    tag_code TEXT NOT NULL,
+    review_source INTEGER,
+    review_en TEXT,
+    review_cn TEXT,
+    sentiment INTEGER,
+    tag_name_cn TEXT,
+    evidence TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (review_id, tag_code)
+);
+CREATE TABLE IF NOT EXISTS return_fact_details_stale (
+    run_id TEXT NOT NULL,
+    review_id TEXT NOT NULL,
+    tag_code TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (run_id, review_id, tag_code)
+);
+CREATE TABLE IF NOT EXISTS return_llm_status (
+    review_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    attempt_count INTEGER NOT NULL DEFAULT 1,
+    model TEXT,
+    prompt_fingerprint TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS return_dim_tag (
+    tag_code TEXT PRIMARY KEY,
+    tag_name_cn TEXT,
+    category_name_cn TEXT,
+    definition TEXT,
+    boundary_note TEXT,
+    level INTEGER,
+    applicable_scope TEXT,
+    is_active INTEGER DEFAULT 1,
+    version INTEGER DEFAULT 1,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE VIEW IF NOT EXISTS view_return_review_snapshot AS
+SELECT r.*
+FROM reviews r
+LEFT JOIN return_llm_status s ON s.review_id = r.review_id
+WHERE s.review_id IS NULL OR (s.status NOT IN ('ok', 'auto') AND s.attempt_count < 3);
+CREATE VIEW IF NOT EXISTS view_return_review_attr AS
+SELECT review_id, review_source, country, fasin, review_date FROM reviews;
+CREATE TABLE IF NOT EXISTS return_review_attr (
+    review_id TEXT NOT NULL,
+    review_source INTEGER NOT NULL,
+    country TEXT,
+    fasin TEXT,
+    review_date TEXT,
+    updated_at TEXT,
+    PRIMARY KEY (review_id, review_source)
+);
+CREATE TABLE IF NOT EXISTS return_tag_rollup_weekly (
+    country TEXT NOT NULL,
+    fasin TEXT NOT NULL,
+    week_start TEXT NOT NULL,
+    review_source INTEGER NOT NULL,
+    tag_code TEXT NOT NULL,
+    tag_name_cn TEXT,
+    category_name_cn TEXT,
+    reviews INTEGER NOT NULL,
+    negative_reviews INTEGER NOT NULL,
+    updated_at TEXT,
+    PRIMARY KEY (country, fasin, week_start, review_source, tag_code)
+);
+CREATE TABLE IF NOT EXISTS return_review_rollup_weekly (
+    country TEXT NOT NULL,
+    fasin TEXT NOT NULL,
+    week_start TEXT NOT NULL,
+    review_source INTEGER NOT NULL,
+    reviews INTEGER NOT NULL,
+    tagged_reviews INTEGER NOT NULL,
+    negative_reviews INTEGER NOT NULL,
+    updated_at TEXT,
+    PRIMARY KEY (country, fasin, week_start, review_source)
+);
+"""
+
+_INSERT = re.compile(r"^\s*INSERT\s+INTO", re.IGNORECASE)
+_LATERAL_VIEW = re.compile(r"LATERAL VIEW explode_json_array_json_outer\((.*)\) (\w+) AS (\w+)", re.IGNORECASE)
+
+
+_DELETE_USING = re.compile(r"DELETE\s+FROM\s+(\w+)\s+USING\s+(\w+)\s+(\w+)\s+WHERE\s+(.*)", re.IGNORECASE | re.DOTALL)
+
+
+def _delete_using(sql: str) -> str:
+    """Doris ``DELETE FROM t USING s x WHERE ...`` as ``DELETE FROM t WHERE EXISTS (...)``."""
+    return _DELETE_USING.sub(r"DELETE FROM \1 WHERE EXISTS (SELECT 1 FROM \2 \3 WHERE \4)", sql, count=1)
+
+
+def _lateral_view(sql: str) -> str:
+    """Doris ``LATERAL VIEW explode_json_array_json_outer(arr) t AS col`` as a SQLite
+    ``LEFT JOIN json_each(arr) AS t``, with ``col`` read from ``t.value``."""
+    match = _LATERAL_VIEW.search(sql)
+    while match:
+        array, alias, column = match.groups()
+        sql = sql[: match.start()] + f"LEFT JOIN json_each({array}) AS {alias} ON 1" + sql[match.end() :]
+        sql = re.sub(rf"\b{column}\b", f"{alias}.value", sql)
+        match = _LATERAL_VIEW.search(sql)
+    return sql
+
+
+def _json_path(payload: str, path: str) -> Any:
+    value: Any = json.loads(payload)
+    for part in path.lstrip("$").strip(".").split("."):
+        if part:
+            value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def _json_int(value: Any) -> Optional[int]:
+    try:
+        return None if value is None else int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_monday(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    day = date.fromisoformat(str(value)[:10])
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path), timeout=30.0, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.create_function("crc32", 1, lambda text: zlib.crc32(str(text).encode("utf-8")), deterministic=True)
+    conn.create_function("MOD", 2, lambda a, b: a % b, deterministic=True)
+    conn.create_function("to_monday", 1, _to_monday, deterministic=True)
+    conn.create_function("now", 0, lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    conn.create_function(
+        "get_json_string",
+        2,
+        lambda payload, path: None if payload is None else _json_path(payload, path),
+    )
+    conn.create_function(
+        "get_json_int",
+        2,
+        lambda payload, path: None if payload is None else _json_int(_json_path(payload, path)),
+    )
+    conn.create_function(
+        "json_length",
+        2,
+        lambda payload, path: None if payload is None else len(_json_path(payload, path) or []),
+    )
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class _Cursor:
+    """The slice of the pymysql DictCursor API that DorisClient uses."""
+
+    def __init__(self, owner: "_Connection"):
+        self._owner = owner
+        self._cur = owner.conn.cursor()
+
+    def __enter__(self) -> "_Cursor":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._cur.close()
+
+    def __iter__(self):
+        return (dict(row) for row in self._cur)
+
+    def execute(self, sql: str, params: Optional[Sequence[Any]] = None) -> int:
+        self._owner.count(sql)
+        started = time.perf_counter()
+        self._cur.execute(self._owner.translate(sql), list(params or ()))
+        record_statement(sql, time.perf_counter() - started, self._cur.rowcount)
+        return self._cur.rowcount
+
+    def executemany(self, sql: str, seq: Iterable[Sequence[Any]]) -> int:
+        self._owner.count(sql)
+        started = time.perf_counter()
+        self._cur.executemany(self._owner.translate(sql), [list(params) for params in seq])
+        record_statement(sql, time.perf_counter() - started, self._cur.rowcount)
+        return self._cur.rowcount
+
+    def fetchall(self) -> List[dict]:
+        return [dict(row) for row in self._cur.fetchall()]
+
+
+class _Connection:
+    def __init__(self, path: Path, statements: Counter, lock: threading.Lock):
+        self.conn = _connect(path)
+        self._statements = statements
+        self._lock = lock
+
+    def cursor(self, cursor_class: Any = None) -> _Cursor:
+        return _Cursor(self)
+
+    def count(self, sql: str) -> None:
+        verb = sql.lstrip().split(None, 1)[0].upper()
+        with self._lock:
+            self._statements[verb] += 1
+
+    @staticmethod
+    def translate(sql: str) -> str:
+        return _INSERT.sub("INSERT OR REPLACE INTO", _delete_using(_lateral_view(sql.replace("%s", "?"))), count=1)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class SQLiteDorisClient(DorisClient):
+    """DorisClient over a local SQLite file (``config.database``)."""
+
+    # Shared by every instance, e.g. the three connections of --step all.
+    statements: Counter = Counter()
+    _lock = threading.Lock()
+
+    def __init__(self, config: DorisConfig):
+        self._conn = _Connection(Path(config.database), self.statements, self._lock)
+
+    @classmethod
+    def reset_statements(cls) -> None:
+        with cls._lock:
+            cls.statements.clear()
+
+
+# ----------------------------------------------------------------------
+# Synthetic data
+# ----------------------------------------------------------------------
+_WORDS = (
+    "zipper broke after two days lid does not close the basket is too small for my freezer "
+    "arrived damaged wrong color cheap plastic cracked handle wobbly smells bad too big "
+    "returned because it did not fit the drawer great price but flimsy missing parts"
+).split()
+
+
+def synthetic_tags(count: int = 40) -> List[dict]:
+    return [
+        {
+            "tag_code": f"TAG_{index:03d}",
+            "tag_name_cn": f"标签{index}",
+            "category_name_cn": f"类别{index % 6}",
+            "definition": " ".join(random.Random(index).sample(_WORDS, 8)),
+            "boundary_note": "",
+            "level": 2,
+            "applicable_scope": "共享",
+        }
+        for index in range(count)
+    ]
+
+
+def synthetic_review(index: int, words: int = 40) -> str:
+    rng = random.Random(index)
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(words // 2, words * 3 // 2)))
+
+
+def synthetic_payload(review_id: str, review_source: int, review_en: str, tags: Sequence[dict]) -> LLMPayload:
+    rng = random.Random(review_id)
+    chosen = rng.sample(list(tags), rng.randint(0, 3))
+    return LLMPayload(
+        review_id=review_id,
+        review_source=review_source,
+        review_en=review_en,
+        review_cn="译文：" + review_en[:60],
+        sentiment=rng.choice((-1, 0, 1)),
+        tags=[TagFragment(tag["tag_code"], tag["tag_name_cn"], review_en[:40]) for tag in chosen],
+    )
+
+
+def create_database(path: Path, reviews: int, tags: int = 40, with_payloads: bool = False) -> None:
+    """Fresh SQLite database with ``reviews`` synthetic reviews, a tag dimension and,
+    with ``with_payloads``, one stored LLM payload per review (for --step parse)."""
+    if path.exists():
+        path.unlink()
+    conn = _connect(path)
+    conn.executescript(SCHEMA)
+    tag_rows = synthetic_tags(tags)
+    conn.executemany(
+        "INSERT INTO return_dim_tag (tag_code, tag_name_cn, category_name_cn, definition, boundary_note, "
+        "level, applicable_scope) VALUES (:tag_code, :tag_name_cn, :category_name_cn, :definition, "
+        ":boundary_note, :level, :applicable_scope)",
+        tag_rows,
+    )
+    start = datetime(2025, 9, 1)
+    rows = [
+        (
+            f"R{index:09d}",
+            index % 3,
+            synthetic_review(index),
+            (start + timedelta(minutes=index)).strftime("%Y-%m-%d %H:%M:%S"),
+            "US",
+            f"B0{index % 50:08d}",
+        )
+        for index in range(reviews)
+    ]
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO reviews VALUES (?, ?, ?, ?, ?, ?)", rows)
+    if with_payloads:
+        conn.executemany(
+            "INSERT INTO return_fact_llm (review_id, payload) VALUES (?, ?)",
+            (
+                (row[0], encode_payload(synthetic_payload(row[0], row[1], row[2], tag_rows)))
+                for row in rows
+            ),
+        )
+    conn.execute("COMMIT")
+    conn.close()
@@ -0,0 +1,147 @@
+"""
+Local stand-in for the Doris Stream Load HTTP endpoint.
+
+Mimics the response contract used by pipeline.stream_load.StreamLoadWriter:
+- PUT /api/{db}/{table}/_stream_load with a JSON array body and a `label` header
+- FE-style 307 redirect to a "BE" path (with --redirect)
+- "Label Already Exists" + ExistingJobStatus=FINISHED for a repeated label
+- optional injected 5xx failures (--fail-rate) to exercise retries
+
+Run:
+    python test/fake_stream_load.py --port 8030
+then point the pipeline at it (config doris.host=127.0.0.1, doris.http_port=8030):
+    python -m scripts.pipeline --step raw --payload-input test/payloads.jsonl --writer stream-load
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+
+class FakeStreamLoadServer(ThreadingHTTPServer):
+    """Keeps the loaded rows in memory, keyed by table and Unique Key columns."""
+
+    def __init__(self, address: Tuple[str, int], redirect: bool = False, fail_rate: float = 0.0):
+        super().__init__(address, _Handler)
+        self.redirect = redirect
+        self.fail_rate = fail_rate
+        self.labels: Dict[str, int] = {}
+        self.tables: Dict[str, Dict[tuple, dict]] = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def rows(self, table: str) -> List[dict]:
+        with self.lock:
+            return list(self.tables.get(table, {}).values())
+
+
+_UNIQUE_KEYS = {
+    "return_fact_llm": ("review_id",),
+    "return_fact_details": ("review_id", "tag_code"),
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeStreamLoadServer
+
+    def do_PUT(self) -> None:  # noqa: N802 - http.server naming
+        parts = self.path.strip("/").split("/")
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if len(parts) < 4 or parts[-1] != "_stream_load":
+            self._reply(404, {"Status": "Fail", "Message": f"unknown path {self.path}"})
+            return
+        if not self._authorized():
+            self._reply(401, {"Status": "Fail", "Message": "unauthorized"})
+            return
+        if self.server.redirect and parts[0] == "api":
+            self.send_response(307)
+            self.send_header("Location", "/be/" + "/".join(parts))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        table = parts[-2]
+        label = self.headers.get("label", "")
+        with self.server.lock:
+            self.server.requests += 1
+            if random.random() < self.server.fail_rate:
+                self._reply(503, {"Status": "Fail", "Message": "injected failure"})
+                return
+            if label and label in self.server.labels:
+                self._reply(
+                    200,
+                    {
+                        "Label": label,
+                        "Status": "Label Already Exists",
+                        "ExistingJobStatus": "FINISHED",
+                        "Message": f"Label [{label}] has already been used.",
+                    },
+                )
+                return
+            try:
+                rows = json.loads(body)
+                if not isinstance(rows, list):
+                    rows = [rows]
+            except ValueError as exc:
+                self._reply(200, {"Label": label, "Status": "Fail", "Message": f"bad json: {exc}"})
+                return
+            key_cols = _UNIQUE_KEYS.get(table, ())
+            store = self.server.tables.setdefault(table, {})
+            for row in rows:
+                store[tuple(row.get(col) for col in key_cols) or (len(store),)] = row
+            txn_id = len(self.server.labels) + 1
+            if label:
+                self.server.labels[label] = txn_id
+        self._reply(
+            200,
+            {
+                "TxnId": txn_id,
+                "Label": label,
+                "Status": "Success",
+                "Message": "OK",
+                "NumberTotalRows": len(rows),
+                "NumberLoadedRows": len(rows),
+                "NumberFilteredRows": 0,
+                "NumberUnselectedRows": 0,
+                "LoadBytes": len(body),
+            },
+        )
+
+    def _authorized(self) -> bool:
+        header = self.headers.get("Authorization", "")
+        if not header.startswith("Basic "):
+            return False
+        return ":" in base64.b64decode(header[6:]).decode("utf-8", "replace")
+
+    def _reply(self, status: int, obj: dict) -> None:
+        data = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:  # keep test output quiet
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Doris Stream Load endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8030)
+    parser.add_argument("--redirect", action="store_true", help="Answer like an FE with a 307 to a BE path.")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503.")
+    args = parser.parse_args()
+    server = FakeStreamLoadServer((args.host, args.port), redirect=args.redirect, fail_rate=args.fail_rate)
+    print(f"Fake Stream Load listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for table, rows in server.tables.items():
+            print(f"{table}: {len(rows)} rows")
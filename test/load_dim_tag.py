@@ -1,9 +1,29 @@
+"""
+Sync return_dim_tag with a tag JSON export.
+
+    python test/load_dim_tag.py chat/return_dim_tag_202512311659.json --dry-run
+    python test/load_dim_tag.py chat/return_dim_tag_202512311659.json
+
+Records are matched to the table by (applicable_scope, tag_code) and compared by a
+hash of their content, so only new, changed and removed tags are written:
+- new tags are inserted
+- changed tags are rewritten (created_at is kept)
+- active tags missing from the file are deactivated (is_active = 0), but only in the
+  scopes the file covers, so a single-scope export leaves other scopes alone
+return_dim_tag is a Unique Key table on (applicable_scope, tag_code), so all writes are
+one multi-row INSERT per batch that replaces rows in place. Nothing is deleted, so
+readers never see a tag missing mid-sync. Writes stamp updated_at, which the
+pipeline's tag library cache probes for changes.
+"""
 from __future__ import annotations
 
+import argparse
+import hashlib
 import json
+from datetime import datetime
 from pathlib import Path
 import sys
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import pymysql
 
@@ -13,6 +33,24 @@ if str(ROOT) not in sys.path:
     sys.path.append(str(ROOT))
 
 from pipeline.config import load_config
+from pipeline.doris_client import chunks, last_per_key
+
+KEY_FIELDS = ("applicable_scope", "tag_code")
+CONTENT_FIELDS = (
+    "tag_name_cn",
+    "category_code",
+    "category_name_cn",
+    "level",
+    "definition",
+    "boundary_note",
+    "is_active",
+    "version",
+    "effective_from",
+    "effective_to",
+)
+INSERT_FIELDS = KEY_FIELDS + CONTENT_FIELDS + ("created_at", "updated_at")
+
+Key = Tuple[str, str]
 
 
 def normalize_record(item: Dict[str, Any]) -> Dict[str, Any]:
@@ -45,12 +83,73 @@ def load_tags(json_path: Path) -> List[Dict[str, Any]]:
         raise ValueError("Expected a list of tag objects in JSON.")
     records = [normalize_record(item) for item in data]
     records = [r for r in records if r["applicable_scope"] and r["tag_code"]]
-    return records
+    # A tag listed twice in one export: the later entry wins.
+    return last_per_key(records, record_key)
+
+
+def record_key(record: Dict[str, Any]) -> Key:
+    return (str(record["applicable_scope"]), str(record["tag_code"]))
+
+
+def _canonical(value: Any) -> str:
+    # The export has strings where Doris returns ints and dates; compare as text.
+    return "" if value is None else str(value)
+
+
+def content_hash(record: Dict[str, Any]) -> str:
+    canonical = json.dumps([_canonical(record.get(f)) for f in CONTENT_FIELDS], ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SyncPlan:
+    def __init__(self) -> None:
+        self.inserts: List[Dict[str, Any]] = []
+        # (new record, current row, names of the changed fields)
+        self.updates: List[Tuple[Dict[str, Any], Dict[str, Any], List[str]]] = []
+        self.deactivations: List[Dict[str, Any]] = []
+        self.unchanged = 0
+
+    @property
+    def changes(self) -> int:
+        return len(self.inserts) + len(self.updates) + len(self.deactivations)
 
+    def summary(self) -> str:
+        lines = [
+            f"return_dim_tag: {len(self.inserts)} to insert, {len(self.updates)} to update, "
+            f"{len(self.deactivations)} to deactivate, {self.unchanged} unchanged"
+        ]
+        lines += [f"  + {scope}/{code}" for scope, code in sorted(map(record_key, self.inserts))]
+        lines += [
+            f"  ~ {scope}/{code} ({', '.join(changed)})"
+            for (scope, code), changed in sorted((record_key(new), changed) for new, _, changed in self.updates)
+        ]
+        lines += [f"  - {scope}/{code}" for scope, code in sorted(map(record_key, self.deactivations))]
+        return "\n".join(lines)
 
-def upsert_dim_tags(records: List[Dict[str, Any]]) -> None:
-    cfg = load_config("config/environment.yaml")
-    conn = pymysql.connect(
+
+def plan_sync(records: Sequence[Dict[str, Any]], current: Sequence[Dict[str, Any]]) -> SyncPlan:
+    plan = SyncPlan()
+    existing = {record_key(row): row for row in current}
+    for record in records:
+        row = existing.get(record_key(record))
+        if row is None:
+            plan.inserts.append(record)
+        elif content_hash(record) != content_hash(row):
+            changed = [f for f in CONTENT_FIELDS if _canonical(record.get(f)) != _canonical(row.get(f))]
+            plan.updates.append((record, row, changed))
+        else:
+            plan.unchanged += 1
+    scopes = {record_key(record)[0] for record in records}
+    listed = {record_key(record) for record in records}
+    for key, row in existing.items():
+        if key[0] in scopes and key not in listed and int(row.get("is_active") or 0) == 1:
+            plan.deactivations.append(dict(row, is_active=0))
+    return plan
+
+
+def connect(config_path: str) -> pymysql.connections.Connection:
+    cfg = load_config(config_path)
+    return pymysql.connect(
         host=cfg.doris.host,
         port=cfg.doris.port,
         user=cfg.doris.username,
@@ -60,52 +159,75 @@ def upsert_dim_tags(records: List[Dict[str, Any]]) -> None:
         autocommit=True,
         cursorclass=pymysql.cursors.DictCursor,
     )
-    delete_sql = "DELETE FROM return_dim_tag WHERE applicable_scope = %s AND tag_code = %s"
-    insert_sql = """
-    INSERT INTO return_dim_tag (
-        applicable_scope,
-        tag_code,
-        tag_name_cn,
-        category_code,
-        category_name_cn,
-        level,
-        definition,
-        boundary_note,
-        is_active,
-        version,
-        effective_from,
-        effective_to
-    ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-    """
+
+
+def fetch_current(conn: pymysql.connections.Connection) -> List[Dict[str, Any]]:
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT {', '.join(KEY_FIELDS + CONTENT_FIELDS + ('created_at',))} FROM return_dim_tag")
+        return cur.fetchall()
+
+
+def apply_sync(conn: pymysql.connections.Connection, plan: SyncPlan, batch_size: int = 200) -> int:
+    """Upsert new, changed and deactivated tags, one multi-row INSERT per batch."""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # (record, created_at to keep; None for new tags)
+    rows = [(record, row.get("created_at")) for record, row, _ in plan.updates]
+    rows += [(row, row.get("created_at")) for row in plan.deactivations]
+    rows += [(record, None) for record in plan.inserts]
+    placeholders = "(" + ",".join(["%s"] * len(INSERT_FIELDS)) + ")"
+    written = 0
+    with conn.cursor() as cur:
+        for chunk in chunks(rows, batch_size):
+            params: List[Any] = []
+            for record, created_at in chunk:
+                values = dict(record, created_at=created_at or now, updated_at=now)
+                params.extend(values.get(f) for f in INSERT_FIELDS)
+            cur.execute(
+                f"INSERT INTO return_dim_tag ({', '.join(INSERT_FIELDS)}) VALUES "
+                + ",".join([placeholders] * len(chunk)),
+                params,
+            )
+            written += len(chunk)
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Sync return_dim_tag with a tag JSON export.")
+    parser.add_argument(
+        "json_path",
+        nargs="?",
+        type=Path,
+        default=Path("chat/return_dim_tag_202512311659.json"),
+        help="Tag export: a list, or an object with a 'data' / 'return_dim_tag' list.",
+    )
+    parser.add_argument("--config", default="config/environment.yaml", help="Config with the Doris connection.")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the change summary.")
+    parser.add_argument("--batch-size", type=int, default=200, help="Tags per INSERT statement.")
+    parser.add_argument(
+        "--no-deactivate",
+        action="store_true",
+        help="Leave tags that are missing from the file active.",
+    )
+    args = parser.parse_args(argv)
+    if not args.json_path.exists():
+        raise SystemExit(f"File not found: {args.json_path}")
+
+    records = load_tags(args.json_path)
+    conn = connect(args.config)
     try:
-        with conn.cursor() as cur:
-            for rec in records:
-                cur.execute(delete_sql, (rec["applicable_scope"], rec["tag_code"]))
-                cur.execute(
-                    insert_sql,
-                    (
-                        rec["applicable_scope"],
-                        rec["tag_code"],
-                        rec["tag_name_cn"],
-                        rec["category_code"],
-                        rec["category_name_cn"],
-                        rec["level"],
-                        rec["definition"],
-                        rec["boundary_note"],
-                        rec["is_active"],
-                        rec["version"],
-                        rec["effective_from"],
-                        rec["effective_to"],
-                    ),
-                )
-        print(f"Upserted {len(records)} records into return_dim_tag")
+        plan = plan_sync(records, fetch_current(conn))
+        if args.no_deactivate:
+            plan.deactivations = []
+        print(plan.summary())
+        if args.dry_run or not plan.changes:
+            print("Dry run; nothing written." if args.dry_run else "Nothing to do.")
+            return 0
+        written = apply_sync(conn, plan, batch_size=args.batch_size)
+        print(f"Wrote {written} rows into return_dim_tag")
     finally:
         conn.close()
+    return 0
 
 
 if __name__ == "__main__":
-    json_file = Path("chat/return_dim_tag_202512311659.json")
-    if not json_file.exists():
-        raise SystemExit(f"File not found: {json_file}")
-    records = load_tags(json_file)
-    upsert_dim_tags(records)
+    sys.exit(main())